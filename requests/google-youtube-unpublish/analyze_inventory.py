@@ -6,84 +6,119 @@ with out-of-stock variants across styles and sizes.
 """
 
 import csv
-import json
-from collections import defaultdict, Counter
+import sys
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Iterable, Optional, Tuple
 from datetime import datetime
 
+from product_catalog import ProductGroup, group_products
+from export_chunks import export_dir_from_argv, iter_export_rows
+from instrumentation import Profiler
+from streaming_output import DEFAULT_REPORT_TOP, AnalysisJsonWriter, output_format, report_top, top_products, write_markdown
+from variant_store import VariantStore
+from stockout_cube import StockoutCube
+from catalog_db import open_catalog, inventory_stats, iter_products as iter_db_products
+from inventory_state import load_state, save_state, new_state, product_hash, variant_quantities, count_variant_changes
+
 # Path to products CSV (pre-filtered to Active products only)
 PRODUCTS_CSV = Path(__file__).parent / "AD_ACTIVE-PRODUCTS_Export_2025-11-04_141820" / "Products.csv"
 OUTPUT_DIR = Path(__file__).parent
 OUTPUT_JSON = OUTPUT_DIR / "inventory_analysis.json"
+OUTPUT_NDJSON = OUTPUT_DIR / "inventory_analysis.ndjson"
 OUTPUT_CSV = OUTPUT_DIR / "inventory_analysis.csv"
 OUTPUT_REPORT = OUTPUT_DIR / "inventory_analysis_report.md"
+STATE_FILE = OUTPUT_DIR / "inventory_state.json"
+OUTPUT_CUBE = OUTPUT_DIR / "stockout_cube.bin"
+OUTPUT_TIMING = OUTPUT_DIR / "inventory_analysis_timing.json"
 
 
-def read_products_csv(csv_path: Path) -> List[Dict[str, Any]]:
-    """Read and parse products CSV file."""
-    products = []
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:  # utf-8-sig handles BOM
-        reader = csv.DictReader(f)
-        for row in reader:
-            products.append(row)
-    return products
-
-
-def get_variant_inventory_qty(row: Dict[str, str]) -> int:
-    """Get variant inventory quantity from CSV row."""
-    qty_str = row.get('Variant Inventory Qty', '0').strip()
-    if not qty_str or qty_str == '':
-        return 0
-    try:
-        qty = int(float(qty_str))
-        return max(0, qty)
-    except (ValueError, TypeError):
-        return 0
-
-
-def analyze_inventory(products: List[Dict[str, str]]) -> Dict[str, Any]:
-    """Analyze inventory patterns across products."""
+class InventoryRecordBuilder:
+    """Accumulates grouped products one at a time and computes their inventory records.
     
-    # Group variants by product ID
-    product_variants = defaultdict(list)
+    Inactive products get {'product_id', 'active': False}. Active products also
+    carry variant counts and, when they have out-of-stock variants, the full
+    `product_info` entry used in the outputs (otherwise None).
+    """
     
-    for row in products:
-        product_id = row.get('ID', '').strip()
-        if not product_id:
-            continue
-            
-        variant_id = row.get('Variant ID', '').strip()
-        variant_sku = row.get('Variant SKU', '').strip()
-        option1_name = row.get('Option1 Name', '').strip()
-        option1_value = row.get('Option1 Value', '').strip()
-        option2_name = row.get('Option2 Name', '').strip()
-        option2_value = row.get('Option2 Value', '').strip()
-        option3_name = row.get('Option3 Name', '').strip()
-        option3_value = row.get('Option3 Value', '').strip()
-        
-        inventory_qty = get_variant_inventory_qty(row)
+    def __init__(self, use_numpy: Optional[bool] = None):
+        self.store = VariantStore(use_numpy)
+        self._records: List[Optional[Dict[str, Any]]] = []
+    
+    def add_product(self, product: ProductGroup) -> None:
+        """Add one product; active products are loaded into the columnar store."""
+        # Verify product is Active (CSV is pre-filtered, but double-check)
+        if product.row.status != 'Active':
+            self._records.append({'product_id': product.product_id, 'active': False})
+            return
+        self._records.append(None)  # Placeholder filled in by records(), keeps export order
+        self.store.add_product(product)
+    
+    def records(self) -> List[Dict[str, Any]]:
+        """Aggregate across the catalog at once and return records in export order."""
+        store = self.store
+        records = self._records
+        variant_counts = store.variant_counts()
+        in_stock_counts = store.in_stock_counts()
+        inventory_percentages = store.inventory_percentages()
+        style_oos_breakdowns = store.out_of_stock_breakdown(1)  # option1 (usually color/style) -> OOS count
+        size_oos_breakdowns = store.out_of_stock_breakdown(2)   # option2 (usually size) -> OOS count
         
-        variant_info = {
-            'variant_id': variant_id,
-            'variant_sku': variant_sku,
-            'option1_name': option1_name,
-            'option1_value': option1_value,
-            'option2_name': option2_name,
-            'option2_value': option2_value,
-            'option3_name': option3_name,
-            'option3_value': option3_value,
-            'inventory_qty': inventory_qty,
-            'is_in_stock': inventory_qty > 0,
-            'is_out_of_stock': inventory_qty <= 0
-        }
+        slots = [pos for pos, record in enumerate(records) if record is None]
+        for i, slot in enumerate(slots):
+            product_id = store.product_ids[i]
+            product_row = store.product_rows[i]
+            total_variants = variant_counts[i]
+            in_stock_count = in_stock_counts[i]
+            out_of_stock_count = total_variants - in_stock_count
+            
+            # Report style/size breakdown if product has out-of-stock variants
+            product_info = None
+            if out_of_stock_count > 0:
+                product_info = {
+                    'product_id': product_id,
+                    'handle': product_row.handle,
+                    'title': product_row.title,
+                    'url': product_row.url,
+                    'status': product_row.status,
+                    'published': product_row.published,
+                    'total_variants': total_variants,
+                    'in_stock_variants': in_stock_count,
+                    'out_of_stock_variants': out_of_stock_count,
+                    'inventory_percentage': inventory_percentages[i],
+                    'option1_name': store.option_name(i, 1),
+                    'option2_name': store.option_name(i, 2),
+                    'option1_values': store.option_values(i, 1),
+                    'option2_values': store.option_values(i, 2),
+                    'style_oos_breakdown': style_oos_breakdowns[i],
+                    'size_oos_breakdown': size_oos_breakdowns[i],
+                    'variants': store.variants(i)
+                }
+            
+            records[slot] = {
+                'product_id': product_id,
+                'active': True,
+                'total_variants': total_variants,
+                'in_stock_variants': in_stock_count,
+                'out_of_stock_variants': out_of_stock_count,
+                'product_info': product_info
+            }
         
-        product_variants[product_id].append(variant_info)
-    
-    # Analyze each product
+        return records
+
+
+def analyze_product_records(products: Iterable[ProductGroup], use_numpy: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Compute a per-product inventory record for each grouped product (see InventoryRecordBuilder)."""
+    builder = InventoryRecordBuilder(use_numpy)
+    for product in products:
+        builder.add_product(product)
+    return builder.records()
+
+
+def summarize_inventory(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Roll per-product records up into catalog stats and the OOS product list."""
     products_with_oos = []
     inventory_stats = {
-        'total_products': len(product_variants),
+        'total_products': 0,
         'products_analyzed': 0,
         'products_active': 0,
         'products_inactive': 0,
@@ -95,30 +130,20 @@ def analyze_inventory(products: List[Dict[str, str]]) -> Dict[str, Any]:
         'total_out_of_stock_variants': 0
     }
     
-    # Track patterns
-    style_size_patterns = defaultdict(lambda: {'total': 0, 'oos': 0})
-    
-    for product_id, variants in product_variants.items():
-        # Get product info from first variant row
-        product_row = next((r for r in products if r.get('ID', '').strip() == product_id), None)
-        if not product_row:
-            continue
-        
-        # Verify product is Active (CSV is pre-filtered, but double-check)
-        status = product_row.get('Status', '').strip()
-        if status != 'Active':
+    for record in records:
+        inventory_stats['total_products'] += 1
+        if not record['active']:
             inventory_stats['products_inactive'] += 1
             continue
         
         inventory_stats['products_active'] += 1
         
-        total_variants = len(variants)
-        in_stock_count = sum(1 for v in variants if v['is_in_stock'])
-        out_of_stock_count = sum(1 for v in variants if v['is_out_of_stock'])
+        total_variants = record['total_variants']
+        out_of_stock_count = record['out_of_stock_variants']
         
         inventory_stats['products_analyzed'] += 1
         inventory_stats['total_variants'] += total_variants
-        inventory_stats['total_in_stock_variants'] += in_stock_count
+        inventory_stats['total_in_stock_variants'] += record['in_stock_variants']
         inventory_stats['total_out_of_stock_variants'] += out_of_stock_count
         
         if out_of_stock_count == 0:
@@ -128,44 +153,8 @@ def analyze_inventory(products: List[Dict[str, str]]) -> Dict[str, Any]:
         else:
             inventory_stats['products_with_oos_variants'] += 1
         
-        # Analyze by style/size if product has out-of-stock variants
-        if out_of_stock_count > 0:
-            # Group by option combinations to find patterns
-            option1_values = set(v['option1_value'] for v in variants if v['option1_value'])
-            option2_values = set(v['option2_value'] for v in variants if v['option2_value'])
-            
-            # Analyze patterns
-            style_oos = defaultdict(int)  # option1 (usually color/style) -> OOS count
-            size_oos = defaultdict(int)   # option2 (usually size) -> OOS count
-            
-            for variant in variants:
-                if variant['is_out_of_stock']:
-                    if variant['option1_value']:
-                        style_oos[variant['option1_value']] += 1
-                    if variant['option2_value']:
-                        size_oos[variant['option2_value']] += 1
-            
-            product_info = {
-                'product_id': product_id,
-                'handle': product_row.get('Handle', '').strip(),
-                'title': product_row.get('Title', '').strip(),
-                'url': product_row.get('URL', '').strip(),
-                'status': product_row.get('Status', '').strip(),
-                'published': product_row.get('Published', '').strip(),
-                'total_variants': total_variants,
-                'in_stock_variants': in_stock_count,
-                'out_of_stock_variants': out_of_stock_count,
-                'inventory_percentage': round((in_stock_count / total_variants) * 100, 1) if total_variants > 0 else 0,
-                'option1_name': variants[0]['option1_name'] if variants else '',
-                'option2_name': variants[0]['option2_name'] if variants else '',
-                'option1_values': sorted(option1_values),
-                'option2_values': sorted(option2_values),
-                'style_oos_breakdown': dict(style_oos),
-                'size_oos_breakdown': dict(size_oos),
-                'variants': variants
-            }
-            
-            products_with_oos.append(product_info)
+        if record['product_info'] is not None:
+            products_with_oos.append(record['product_info'])
     
     # Sort by OOS count (descending) then by inventory percentage (ascending)
     products_with_oos.sort(key=lambda x: (x['out_of_stock_variants'], -x['inventory_percentage']), reverse=True)
@@ -176,10 +165,73 @@ def analyze_inventory(products: List[Dict[str, str]]) -> Dict[str, Any]:
     }
 
 
-def generate_json_output(analysis: Dict[str, Any]) -> None:
-    """Generate JSON output file."""
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, indent=2, ensure_ascii=False)
+def analyze_inventory(products: Iterable[ProductGroup], use_numpy: Optional[bool] = None) -> Dict[str, Any]:
+    """Analyze inventory patterns across grouped products (see product_catalog.iter_products)."""
+    return summarize_inventory(analyze_product_records(products, use_numpy=use_numpy))
+
+
+def analyze_inventory_incremental(products: Iterable[ProductGroup], state: Dict[str, Any],
+                                  use_numpy: Optional[bool] = None) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, int]]:
+    """Re-analyze only products whose content changed since the saved state.
+    
+    Returns (analysis, new_state, changes). Unchanged products reuse the record
+    stored in `state`; see inventory_state.py for the state layout.
+    """
+    previous = state.get('products', {})
+    entries: Dict[str, Dict[str, Any]] = {}
+    changed: List[ProductGroup] = []
+    changes = {'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0, 'variants_changed': 0}
+    
+    for product in products:
+        content_hash = product_hash(product)
+        entry = previous.get(product.product_id)
+        if entry is not None and entry['hash'] == content_hash:
+            entries[product.product_id] = entry
+            changes['unchanged'] += 1
+            continue
+        
+        variant_qty = variant_quantities(product)
+        if entry is None:
+            changes['added'] += 1
+            changes['variants_changed'] += len(variant_qty)
+        else:
+            changes['changed'] += 1
+            changes['variants_changed'] += count_variant_changes(entry['variants'], variant_qty)
+        entries[product.product_id] = {'hash': content_hash, 'variants': variant_qty, 'record': None}
+        changed.append(product)
+    
+    changes['removed'] = sum(1 for product_id in previous if product_id not in entries)
+    
+    for record in analyze_product_records(changed, use_numpy=use_numpy):
+        entries[record['product_id']]['record'] = record
+    
+    analysis = summarize_inventory(entry['record'] for entry in entries.values())
+    return analysis, new_state(entries), changes
+
+
+def analyze_inventory_db(conn, use_numpy: Optional[bool] = None) -> Dict[str, Any]:
+    """analyze_inventory() over a catalog database (see catalog_db.py).
+    
+    Stats are SQL aggregations; only active products with out-of-stock variants
+    are loaded to build their detailed entries.
+    """
+    oos_products = iter_db_products(conn, "c.status = 'Active' AND in_stock_variants < total_variants")
+    analysis = summarize_inventory(analyze_product_records(oos_products, use_numpy=use_numpy))
+    analysis['stats'] = inventory_stats(conn)
+    return analysis
+
+
+def json_output_path(fmt: str) -> Path:
+    """JSON output file for a format (NDJSON gets its own extension)."""
+    return OUTPUT_NDJSON if fmt == 'ndjson' else OUTPUT_JSON
+
+
+def generate_json_output(analysis: Dict[str, Any], fmt: str = 'pretty') -> None:
+    """Generate JSON output file, streaming products in report order."""
+    with AnalysisJsonWriter(json_output_path(fmt), 'products_with_oos', fmt) as writer:
+        for product in analysis['products_with_oos']:
+            writer.write_product(product)
+        writer.close(analysis['stats'])
 
 
 def generate_csv_output(analysis: Dict[str, Any]) -> None:
@@ -224,16 +276,20 @@ def generate_csv_output(analysis: Dict[str, Any]) -> None:
             })
 
 
-def generate_report(analysis: Dict[str, Any]) -> None:
-    """Generate markdown report."""
+def generate_report(analysis: Dict[str, Any], top: int = DEFAULT_REPORT_TOP) -> None:
+    """Generate markdown report listing the `top` products by OOS count (the CSV has all of them)."""
     stats = analysis['stats']
     products = analysis['products_with_oos']
     
     # Calculate some additional insights
-    partial_oos = [p for p in products if p['out_of_stock_variants'] > 0 and p['in_stock_variants'] > 0]
-    mostly_oos = [p for p in products if p['inventory_percentage'] < 50]
+    partial_oos = sum(1 for p in products if p['out_of_stock_variants'] > 0 and p['in_stock_variants'] > 0)
+    mostly_oos = sum(1 for p in products if p['inventory_percentage'] < 50)
     
-    report_lines = [
+    # Most OOS variants first, then lowest inventory percentage (same order as the CSV)
+    top_oos, total = top_products(products, top,
+                                  key=lambda x: (x['out_of_stock_variants'], -x['inventory_percentage']), largest=True)
+    
+    header = [
         "# Inventory Analysis Report - Active Products Only",
         "",
         f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
@@ -259,9 +315,9 @@ def generate_report(analysis: Dict[str, Any]) -> None:
         "",
         "## Products with Out-of-Stock Variants",
         "",
-        f"**Total Active Products with OOS Variants:** {len(products):,}",
-        f"- **Products with Partial Inventory:** {len(partial_oos):,} (have both in-stock and out-of-stock variants)",
-        f"- **Products Mostly Out of Stock (<50% inventory):** {len(mostly_oos):,}",
+        f"**Total Active Products with OOS Variants:** {total:,}",
+        f"- **Products with Partial Inventory:** {partial_oos:,} (have both in-stock and out-of-stock variants)",
+        f"- **Products Mostly Out of Stock (<50% inventory):** {mostly_oos:,}",
         "",
         "## Top Products by Out-of-Stock Count",
         "",
@@ -269,18 +325,18 @@ def generate_report(analysis: Dict[str, Any]) -> None:
         "|------------|--------|-------|-------|----------|-----|-------------|"
     ]
     
-    # Show top 50 products with most OOS variants
-    for product in products[:50]:
-        report_lines.append(
-            f"| {product['product_id']} | `{product['handle']}` | {product['title'][:40]} | "
-            f"{product['total_variants']} | {product['in_stock_variants']} | "
-            f"{product['out_of_stock_variants']} | {product['inventory_percentage']}% |"
-        )
+    rows = (
+        f"| {product['product_id']} | `{product['handle']}` | {product['title'][:40]} | "
+        f"{product['total_variants']} | {product['in_stock_variants']} | "
+        f"{product['out_of_stock_variants']} | {product['inventory_percentage']}% |"
+        for product in top_oos
+    )
     
-    if len(products) > 50:
-        report_lines.append(f"\n*... and {len(products) - 50} more products*")
+    footer = []
+    if total > len(top_oos):
+        footer.append(f"\n*... and {total - len(top_oos):,} more products (see `{OUTPUT_CSV.name}` for the full list)*")
     
-    report_lines.extend([
+    footer.extend([
         "",
         "## Analysis Notes",
         "",
@@ -295,24 +351,63 @@ def generate_report(analysis: Dict[str, Any]) -> None:
         f"- `{OUTPUT_REPORT.name}` - This report"
     ])
     
-    with open(OUTPUT_REPORT, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(report_lines))
+    write_markdown(OUTPUT_REPORT, header, rows, footer)
 
 
 def main():
     """Main execution function."""
-    print("Reading products CSV...")
-    if not PRODUCTS_CSV.exists():
-        print(f"ERROR: Products CSV not found at {PRODUCTS_CSV}")
+    # --export-dir reads a directory of partial export chunks as one catalog
+    export_dir = export_dir_from_argv(sys.argv)
+    source = export_dir or PRODUCTS_CSV
+    if not source.exists():
+        print(f"ERROR: Products CSV not found at {source}")
         return
+    if export_dir is not None and '--db' in sys.argv:
+        print("ERROR: --export-dir cannot be combined with --db")
+        sys.exit(1)
+    if '--db' in sys.argv and '--incremental' in sys.argv:
+        print("ERROR: --incremental cannot be combined with --db (the SQLite catalog is re-aggregated in full)")
+        sys.exit(1)
+    
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
     
-    products = read_products_csv(PRODUCTS_CSV)
-    print(f"Loaded {len(products):,} product variant rows")
+    profiler = Profiler.from_argv(sys.argv)
     
-    print("Analyzing inventory patterns...")
-    analysis = analyze_inventory(products)
+    # The stockout cube is built from the same product stream, so the export is parsed once
+    cube = StockoutCube()
+    
+    def with_cube(products: Iterable[ProductGroup]) -> Iterable[ProductGroup]:
+        for product in products:
+            cube.add_product(product)
+            yield product
+    
+    def products() -> Iterable[ProductGroup]:
+        rows = profiler.timed_iter('read_rows', iter_export_rows(source, use_cache, workers), parent='group_products')
+        grouped = profiler.timed_iter('group_products', group_products(rows), parent='build_cube')
+        return profiler.timed_iter('build_cube', with_cube(grouped), parent='analyze')
+    
+    with profiler.span('analyze'):
+        if '--db' in sys.argv:
+            cube = None  # The cube needs every variant; it is only rebuilt from the export
+            print("Analyzing inventory patterns (SQLite catalog)...")
+            conn = open_catalog(PRODUCTS_CSV, use_cache, workers)
+            analysis = analyze_inventory_db(conn)
+            conn.close()
+        elif '--incremental' in sys.argv:
+            state = load_state(STATE_FILE)
+            print(f"Analyzing inventory patterns incrementally (state: {len(state['products']):,} products)...")
+            analysis, state, changes = analyze_inventory_incremental(products(), state)
+            print(f"  Changed: {changes['changed']:,}  Added: {changes['added']:,}  "
+                  f"Removed: {changes['removed']:,}  Unchanged: {changes['unchanged']:,}  "
+                  f"Variants changed: {changes['variants_changed']:,}")
+            save_state(STATE_FILE, state)
+        else:
+            print("Analyzing inventory patterns (streaming)...")
+            analysis = analyze_inventory(products())
     
     stats = analysis['stats']
+    print(f"Processed {stats['total_products']:,} products")
     print(f"\nInventory Summary:")
     print(f"  Total Products: {stats['products_analyzed']:,}")
     print(f"  Products with OOS variants: {stats['products_with_oos_variants']:,}")
@@ -320,14 +415,27 @@ def main():
     print(f"  Products fully out of stock: {stats['products_fully_out_of_stock']:,}")
     
     print("\nGenerating output files...")
-    generate_json_output(analysis)
-    generate_csv_output(analysis)
-    generate_report(analysis)
+    fmt = output_format(sys.argv)
+    with profiler.span('write_json'):
+        generate_json_output(analysis, fmt)
+    with profiler.span('write_csv'):
+        generate_csv_output(analysis)
+    with profiler.span('write_report'):
+        generate_report(analysis, report_top(sys.argv))
+    if cube is not None:
+        with profiler.span('write_cube'):
+            cube.freeze()
+            cube.save(OUTPUT_CUBE)
     
     print(f"\n✅ Analysis complete!")
-    print(f"   - JSON: {OUTPUT_JSON}")
+    print(f"   - JSON: {json_output_path(fmt)}")
     print(f"   - CSV: {OUTPUT_CSV}")
     print(f"   - Report: {OUTPUT_REPORT}")
+    if cube is not None:
+        print(f"   - Stockout cube: {OUTPUT_CUBE} ({cube.num_cells:,} cells)")
+    if '--incremental' in sys.argv:
+        print(f"   - State: {STATE_FILE}")
+    profiler.finish(OUTPUT_TIMING, catalog={'products': stats['total_products'], 'variants_analyzed': stats['total_variants']})
 
 
 if __name__ == '__main__':
@@ -6,118 +6,114 @@ for unpublishing from Google & YouTube sales channel.
 """
 
 import csv
-import json
-from collections import defaultdict
+import sys
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Any, Callable, Iterable, Optional
 from datetime import datetime
 
+from product_catalog import CatalogRow, ProductGroup, group_products
+from export_chunks import export_dir_from_argv, iter_export_rows
+from catalog_db import open_catalog, unpublish_stats, iter_products as iter_db_products
+from instrumentation import Profiler
+from streaming_output import DEFAULT_REPORT_TOP, AnalysisJsonWriter, output_format, report_top, top_products, write_markdown
+from inventory_history import HISTORY_FILE, InventoryHistory
+from location_inventory import iter_sellable_rows
+from threshold_sweep import build_histogram, evaluate_rules, format_sweep_table, rules_from_argv, write_sweep_csv
+
 # Path to products CSV
 PRODUCTS_CSV = Path(__file__).parent.parent.parent / "data" / "AD_PRODUCTS_Export_2025-11-04_095613" / "Products.csv"
 OUTPUT_DIR = Path(__file__).parent
 OUTPUT_JSON = OUTPUT_DIR / "products_to_unpublish.json"
+OUTPUT_NDJSON = OUTPUT_DIR / "products_to_unpublish.ndjson"
 OUTPUT_CSV = OUTPUT_DIR / "products_to_unpublish.csv"
 OUTPUT_REPORT = OUTPUT_DIR / "unpublish_analysis_report.md"
+OUTPUT_SWEEP_CSV = OUTPUT_DIR / "threshold_sweep.csv"
+OUTPUT_TIMING = OUTPUT_DIR / "unpublish_analysis_timing.json"
 
 
-def read_products_csv(csv_path: Path) -> List[Dict[str, Any]]:
-    """Read and parse products CSV file."""
-    products = []
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:  # utf-8-sig handles BOM
-        reader = csv.DictReader(f)
-        for row in reader:
-            products.append(row)
-    return products
+def build_variant_info(row: CatalogRow) -> Dict[str, Any]:
+    """Build the per-variant record used in the unpublish analysis."""
+    variant_title = f"{row.option1_value} / {row.option2_value} / {row.option3_value}".strip(' / ')
+    inventory_qty = row.inventory_qty
+    
+    return {
+        'variant_id': row.variant_id,
+        'variant_sku': row.variant_sku,
+        'variant_title': variant_title or 'Default Title',
+        'inventory_qty': inventory_qty,
+        'is_in_stock': inventory_qty > 0
+    }
 
 
-def get_variant_inventory_qty(row: Dict[str, str]) -> int:
-    """Get variant inventory quantity from CSV row.
-    
-    Checks 'Variant Inventory Qty' field. If empty or invalid, returns 0.
-    """
-    qty_str = row.get('Variant Inventory Qty', '0').strip()
-    if not qty_str or qty_str == '':
-        return 0
-    try:
-        qty = int(float(qty_str))
-        return max(0, qty)  # Ensure non-negative
-    except (ValueError, TypeError):
-        return 0
-
-
-def analyze_products(products: List[Dict[str, str]]) -> Dict[str, Any]:
-    """Analyze products to find those with 5 or fewer in-stock variants."""
-    
-    # Group variants by product ID
-    product_variants = defaultdict(list)
-    
-    for row in products:
-        # Handle BOM in CSV header - utf-8-sig should handle it, but just in case
-        product_id = row.get('ID', '').strip()
-        if not product_id:
-            continue
-            
-        variant_id = row.get('Variant ID', '').strip()
-        variant_sku = row.get('Variant SKU', '').strip()
-        variant_title = f"{row.get('Option1 Value', '')} / {row.get('Option2 Value', '')} / {row.get('Option3 Value', '')}".strip(' / ')
-        
-        inventory_qty = get_variant_inventory_qty(row)
-        
-        variant_info = {
-            'variant_id': variant_id,
-            'variant_sku': variant_sku,
-            'variant_title': variant_title or 'Default Title',
-            'inventory_qty': inventory_qty,
-            'is_in_stock': inventory_qty > 0
-        }
-        
-        product_variants[product_id].append(variant_info)
-    
-    # Analyze each product
-    products_to_unpublish = []
-    product_stats = {
-        'total_products': len(product_variants),
+def new_product_stats() -> Dict[str, int]:
+    """Empty stats counters for analyze_products()."""
+    return {
+        'total_products': 0,
         'products_analyzed': 0,
         'products_with_5_or_fewer_in_stock': 0,
         'total_variants_analyzed': 0,
         'total_in_stock_variants': 0,
         'total_out_of_stock_variants': 0
     }
+
+
+def analyze_product(product: ProductGroup, product_stats: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """Count one product into `product_stats`; return its product_info if it should be unpublished."""
+    product_id, product_row, variant_rows = product
+    product_stats['total_products'] += 1
+    variants = [build_variant_info(row) for row in variant_rows]
+    
+    # Count in-stock variants
+    in_stock_count = sum(1 for v in variants if v['is_in_stock'])
+    out_of_stock_count = sum(1 for v in variants if not v['is_in_stock'])
+    total_variants = len(variants)
+    
+    product_stats['products_analyzed'] += 1
+    product_stats['total_variants_analyzed'] += total_variants
+    product_stats['total_in_stock_variants'] += in_stock_count
+    product_stats['total_out_of_stock_variants'] += out_of_stock_count
+    
+    # If 5 or fewer variants are in stock, mark for unpublish
+    if in_stock_count > 5:
+        return None
+    
+    product_stats['products_with_5_or_fewer_in_stock'] += 1
+    return {
+        'product_id': product_id,
+        'handle': product_row.handle,
+        'title': product_row.title,
+        'url': product_row.url,
+        'status': product_row.status,
+        'published': product_row.published,
+        'total_variants': total_variants,
+        'in_stock_variants': in_stock_count,
+        'out_of_stock_variants': out_of_stock_count,
+        'variants': variants
+    }
+
+
+def analyze_products(products: Iterable[ProductGroup],
+                     product_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Analyze grouped products to find those with 5 or fewer in-stock variants.
     
-    for product_id, variants in product_variants.items():
-        # Get product info from first variant row
-        product_row = next((r for r in products if r.get('ID', '').strip() == product_id), None)
-        if not product_row:
+    If `product_sink` is given, each flagged product is passed to it as soon as
+    it is finalized and only its summary (without `variants`) is kept in the result.
+    """
+    
+    # Analyze each product as it is streamed in
+    products_to_unpublish = []
+    product_stats = new_product_stats()
+    
+    for product in products:
+        product_info = analyze_product(product, product_stats)
+        if product_info is None:
             continue
         
-        # Count in-stock variants
-        in_stock_count = sum(1 for v in variants if v['is_in_stock'])
-        out_of_stock_count = sum(1 for v in variants if not v['is_in_stock'])
-        total_variants = len(variants)
+        if product_sink is not None:
+            product_sink(product_info)
+            del product_info['variants']
         
-        product_stats['products_analyzed'] += 1
-        product_stats['total_variants_analyzed'] += total_variants
-        product_stats['total_in_stock_variants'] += in_stock_count
-        product_stats['total_out_of_stock_variants'] += out_of_stock_count
-        
-        # If 5 or fewer variants are in stock, mark for unpublish
-        if in_stock_count <= 5:
-            product_stats['products_with_5_or_fewer_in_stock'] += 1
-            
-            product_info = {
-                'product_id': product_id,
-                'handle': product_row.get('Handle', '').strip(),
-                'title': product_row.get('Title', '').strip(),
-                'url': product_row.get('URL', '').strip(),
-                'status': product_row.get('Status', '').strip(),
-                'published': product_row.get('Published', '').strip(),
-                'total_variants': total_variants,
-                'in_stock_variants': in_stock_count,
-                'out_of_stock_variants': out_of_stock_count,
-                'variants': variants
-            }
-            
-            products_to_unpublish.append(product_info)
+        products_to_unpublish.append(product_info)
     
     return {
         'stats': product_stats,
@@ -125,10 +121,36 @@ def analyze_products(products: List[Dict[str, str]]) -> Dict[str, Any]:
     }
 
 
-def generate_json_output(analysis: Dict[str, Any]) -> None:
-    """Generate JSON output file."""
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, indent=2, ensure_ascii=False)
+def analyze_products_db(conn, product_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """analyze_products() over a catalog database (see catalog_db.py).
+    
+    Stats are SQL aggregations; only products with 5 or fewer in-stock variants are loaded.
+    """
+    analysis = analyze_products(iter_db_products(conn, "in_stock_variants <= ?", (5,)), product_sink=product_sink)
+    analysis['stats'] = unpublish_stats(conn, 5)
+    return analysis
+
+
+def with_trends(product_sink: Callable[[Dict[str, Any]], None],
+                trends: Dict[str, Dict[str, Any]]) -> Callable[[Dict[str, Any]], None]:
+    """Wrap a product sink so each flagged product carries its inventory trend (see inventory_history.py)."""
+    def sink(product_info: Dict[str, Any]) -> None:
+        product_info['trend'] = trends.get(product_info['product_id'])
+        product_sink(product_info)
+    return sink
+
+
+def json_output_path(fmt: str) -> Path:
+    """JSON output file for a format (NDJSON gets its own extension)."""
+    return OUTPUT_NDJSON if fmt == 'ndjson' else OUTPUT_JSON
+
+
+def generate_json_output(analysis: Dict[str, Any], fmt: str = 'pretty') -> None:
+    """Generate JSON output file from a completed analysis."""
+    with AnalysisJsonWriter(json_output_path(fmt), 'products_to_unpublish', fmt) as writer:
+        for product in analysis['products_to_unpublish']:
+            writer.write_product(product)
+        writer.close(analysis['stats'])
 
 
 def generate_csv_output(analysis: Dict[str, Any]) -> None:
@@ -163,12 +185,15 @@ def generate_csv_output(analysis: Dict[str, Any]) -> None:
             })
 
 
-def generate_report(analysis: Dict[str, Any]) -> None:
-    """Generate markdown report."""
+def generate_report(analysis: Dict[str, Any], top: int = DEFAULT_REPORT_TOP) -> None:
+    """Generate markdown report listing the `top` products with the fewest in-stock variants (the CSV has all of them)."""
     stats = analysis['stats']
-    products = analysis['products_to_unpublish']
     
-    report_lines = [
+    # Sort by in-stock count (ascending) then by total variants (descending)
+    top_unpublish, total = top_products(analysis['products_to_unpublish'], top,
+                                        key=lambda x: (x['in_stock_variants'], -x['total_variants']))
+    
+    header = [
         "# Google & YouTube Unpublish Analysis",
         "",
         f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
@@ -189,23 +214,24 @@ def generate_report(analysis: Dict[str, Any]) -> None:
         "",
         "## Products to Unpublish",
         "",
-        f"**Total Products:** {len(products)}",
+        f"**Total Products:** {total}",
         "",
         "| Product ID | Handle | Title | Total Variants | In Stock | Out of Stock | URL |",
         "|------------|--------|-------|----------------|----------|---------------|-----|"
     ]
     
-    # Sort by in-stock count (ascending) then by total variants (descending)
-    sorted_products = sorted(products, key=lambda x: (x['in_stock_variants'], -x['total_variants']))
+    rows = (
+        f"| {product['product_id']} | `{product['handle']}` | {product['title'][:50]} | "
+        f"{product['total_variants']} | {product['in_stock_variants']} | "
+        f"{product['out_of_stock_variants']} | [View]({product['url']}) |"
+        for product in top_unpublish
+    )
     
-    for product in sorted_products:
-        report_lines.append(
-            f"| {product['product_id']} | `{product['handle']}` | {product['title'][:50]} | "
-            f"{product['total_variants']} | {product['in_stock_variants']} | "
-            f"{product['out_of_stock_variants']} | [View]({product['url']}) |"
-        )
+    footer = []
+    if total > len(top_unpublish):
+        footer.append(f"\n*... and {total - len(top_unpublish):,} more products (see `{OUTPUT_CSV.name}` for the full list)*")
     
-    report_lines.extend([
+    footer.extend([
         "",
         "## Next Steps",
         "",
@@ -220,34 +246,110 @@ def generate_report(analysis: Dict[str, Any]) -> None:
         f"- `{OUTPUT_REPORT.name}` - This report"
     ])
     
-    with open(OUTPUT_REPORT, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(report_lines))
+    write_markdown(OUTPUT_REPORT, header, rows, footer)
 
 
-def main():
-    """Main execution function."""
-    print("Reading products CSV...")
-    if not PRODUCTS_CSV.exists():
-        print(f"ERROR: Products CSV not found at {PRODUCTS_CSV}")
-        return
-    
-    products = read_products_csv(PRODUCTS_CSV)
-    print(f"Loaded {len(products):,} product variant rows")
+def run_threshold_sweep(products: Iterable[ProductGroup]) -> None:
+    """Compare alternative unpublish rules from one pass over the products."""
+    histogram = build_histogram(products)
+    results = evaluate_rules(histogram, rules_from_argv(sys.argv))
     
-    print("Analyzing products...")
-    analysis = analyze_products(products)
+    print(f"\nThreshold sweep over {sum(histogram.values()):,} products ({len(histogram):,} histogram buckets):\n")
+    print('\n'.join(format_sweep_table(results)))
     
+    write_sweep_csv(results, OUTPUT_SWEEP_CSV)
+    print(f"\n✅ Sweep complete!")
+    print(f"   - CSV: {OUTPUT_SWEEP_CSV}")
+
+
+def write_outputs(analysis: Dict[str, Any], json_path: Path, profiler: Profiler) -> None:
+    """Print the summary and write the CSV and report (the JSON is already streamed)."""
+    print(f"Processed {analysis['stats']['total_products']:,} products")
     print(f"Found {analysis['stats']['products_with_5_or_fewer_in_stock']} products with ≤5 in-stock variants")
     
     print("Generating output files...")
-    generate_json_output(analysis)
-    generate_csv_output(analysis)
-    generate_report(analysis)
+    with profiler.span('write_csv'):
+        generate_csv_output(analysis)
+    with profiler.span('write_report'):
+        generate_report(analysis, report_top(sys.argv))
     
     print(f"\n✅ Analysis complete!")
-    print(f"   - JSON: {OUTPUT_JSON}")
+    print(f"   - JSON: {json_path}")
     print(f"   - CSV: {OUTPUT_CSV}")
     print(f"   - Report: {OUTPUT_REPORT}")
+    stats = analysis['stats']
+    profiler.finish(OUTPUT_TIMING, catalog={'products': stats['total_products'], 'variants_analyzed': stats['total_variants_analyzed']})
+
+
+def main():
+    """Main execution function."""
+    # --export-dir reads a directory of partial export chunks as one catalog
+    export_dir = export_dir_from_argv(sys.argv)
+    source = export_dir or PRODUCTS_CSV
+    if not source.exists():
+        print(f"ERROR: Products CSV not found at {source}")
+        return
+    if export_dir is not None and ('--db' in sys.argv or '--sellable' in sys.argv):
+        print("ERROR: --export-dir cannot be combined with --db or --sellable")
+        sys.exit(1)
+    
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+    fmt = output_format(sys.argv)
+    json_path = json_output_path(fmt)
+    profiler = Profiler.from_argv(sys.argv)
+    
+    # Optionally annotate flagged products with stockout velocity / sell-through from past exports
+    trends = None
+    if '--history' in sys.argv:
+        days = float(sys.argv[sys.argv.index('--days') + 1]) if '--days' in sys.argv else None
+        history = InventoryHistory.load(HISTORY_FILE)
+        print(f"Using inventory history ({history.num_snapshots} snapshots) for trends")
+        trends = history.product_trends(days)
+    
+    if '--db' in sys.argv:
+        if '--sellable' in sys.argv or '--sweep' in sys.argv:
+            print("ERROR: --db cannot be combined with --sellable or --sweep")
+            sys.exit(1)
+        print("Analyzing products (SQLite catalog)...")
+        with profiler.span('analyze'):
+            conn = open_catalog(PRODUCTS_CSV, use_cache, workers)
+            with AnalysisJsonWriter(json_path, 'products_to_unpublish', fmt) as writer:
+                sink = writer.write_product if trends is None else with_trends(writer.write_product, trends)
+                analysis = analyze_products_db(conn, product_sink=profiler.timed_func('write_json', sink, parent='analyze'))
+                writer.close(analysis['stats'])
+            conn.close()
+        write_outputs(analysis, json_path, profiler)
+        return
+    
+    print("Analyzing products (streaming)...")
+    # Optionally count only sellable stock (Available minus Safety Stock) at chosen locations,
+    # read from the per-location columns in the same pass as the rows
+    if '--sellable' in sys.argv:
+        locations = None
+        if '--locations' in sys.argv:
+            locations = [name.strip() for name in sys.argv[sys.argv.index('--locations') + 1].split(',')]
+        try:
+            sellable_rows = iter_sellable_rows(PRODUCTS_CSV, locations)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"Using sellable quantity at {', '.join(locations) if locations else 'all locations'} (minus safety stock)")
+        rows = profiler.timed_iter('read_rows', sellable_rows, parent='group_products')
+    else:
+        rows = profiler.timed_iter('read_rows', iter_export_rows(source, use_cache, workers), parent='group_products')
+    
+    if '--sweep' in sys.argv:
+        run_threshold_sweep(group_products(rows))
+        return
+    
+    # Flagged products are streamed to the JSON output as they are found
+    with profiler.span('analyze'), AnalysisJsonWriter(json_path, 'products_to_unpublish', fmt) as writer:
+        sink = writer.write_product if trends is None else with_trends(writer.write_product, trends)
+        products = profiler.timed_iter('group_products', group_products(rows), parent='analyze')
+        analysis = analyze_products(products, product_sink=profiler.timed_func('write_json', sink, parent='analyze'))
+        writer.close(analysis['stats'])
+    write_outputs(analysis, json_path, profiler)
 
 
 if __name__ == '__main__':
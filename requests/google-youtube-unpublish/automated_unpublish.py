@@ -6,6 +6,9 @@ unpublishes/republishes them from Google & YouTube sales channel.
 
 Designed to run as a scheduled job (cron, scheduled task, etc.)
 Works with Shopify Flow that sets: custom.google_ads_exclude = true/false
+
+Usage:
+    python3 automated_unpublish.py [--concurrency 8] [--graphql]
 """
 
 import json
@@ -13,17 +16,18 @@ import os
 import sys
 import requests
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Optional
+from collections import Counter
 from datetime import datetime
 
+from publication_mutations import PublicationBatcher
+from publication_snapshot import PublicationSnapshot
+from publish_executor import CallLimitBucket, ThrottledSession, concurrency_from_argv, run_operations
+from shopify_bulk import admin_url, iter_catalog_state
+
 # Shopify API configuration
 SHOPIFY_STORE = os.getenv('SHOPIFY_STORE', 'rudis.myshopify.com')
 SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN', '')
-SHOPIFY_API_VERSION = '2024-01'  # Update as needed
-
-# Metafield configuration (set by Shopify Flow)
-METAFIELD_NAMESPACE = 'custom'
-METAFIELD_KEY = 'google_ads_exclude'
 
 # Google & YouTube publication ID
 GOOGLE_YOUTUBE_PUBLICATION_ID = os.getenv('GOOGLE_YOUTUBE_PUBLICATION_ID', '')
@@ -32,22 +36,27 @@ GOOGLE_YOUTUBE_PUBLICATION_ID = os.getenv('GOOGLE_YOUTUBE_PUBLICATION_ID', '')
 LOG_FILE = Path(__file__).parent / "unpublish_log.json"
 
 
-def log_action(action: str, product_id: str, status: str, details: str = "") -> None:
-    """Log action to file."""
-    log_entry = {
+def log_entry(action: str, product_id: str, status: str, details: str = "") -> Dict[str, Any]:
+    return {
         'timestamp': datetime.now().isoformat(),
         'action': action,
         'product_id': product_id,
         'status': status,
         'details': details
     }
+
+
+def log_actions(entries: List[Dict[str, Any]]) -> None:
+    """Append entries to the log file (one read and one write for the whole batch)."""
+    if not entries:
+        return
     
     logs = []
     if LOG_FILE.exists():
         with open(LOG_FILE, 'r') as f:
             logs = json.load(f)
     
-    logs.append(log_entry)
+    logs.extend(entries)
     
     # Keep last 1000 entries
     logs = logs[-1000:]
@@ -56,18 +65,18 @@ def log_action(action: str, product_id: str, status: str, details: str = "") ->
         json.dump(logs, f, indent=2)
 
 
-def get_publication_id(store: str, token: str) -> str:
+def get_publication_id(store: str, token: str, http: Any = requests) -> str:
     """Get Google & YouTube sales channel publication ID."""
     if GOOGLE_YOUTUBE_PUBLICATION_ID:
         return GOOGLE_YOUTUBE_PUBLICATION_ID
     
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications.json"
+    url = f"{admin_url(store)}/publications.json"
     headers = {
         'X-Shopify-Access-Token': token,
         'Content-Type': 'application/json'
     }
     
-    response = requests.get(url, headers=headers)
+    response = http.get(url, headers=headers)
     response.raise_for_status()
     
     publications = response.json().get('publications', [])
@@ -80,148 +89,80 @@ def get_publication_id(store: str, token: str) -> str:
     raise ValueError("Google & YouTube publication not found")
 
 
-def get_product_metafield(store: str, token: str, product_id: str) -> Optional[bool]:
-    """Get google_ads_exclude metafield value for a product."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/products/{product_id}/metafields.json"
-    params = {
-        'namespace': METAFIELD_NAMESPACE,
-        'key': METAFIELD_KEY
-    }
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
-    
-    metafields = response.json().get('metafields', [])
-    if metafields:
-        value = metafields[0].get('value')
-        return value == 'true' or value is True
-    
-    return None
-
-
-def get_products_with_metafield(store: str, token: str, exclude: bool) -> List[Dict[str, Any]]:
-    """Get all products with google_ads_exclude metafield set to specific value."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/products.json"
-    params = {
-        'limit': 250,
-        'fields': 'id,handle,title'
-    }
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
-    
-    products = []
-    page_info = None
-    
-    while True:
-        if page_info:
-            params['page_info'] = page_info
-        
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        products_page = data.get('products', [])
-        
-        # Check metafield for each product
-        for product in products_page:
-            product_id = product['id']
-            metafield_value = get_product_metafield(store, token, str(product_id))
-            
-            if metafield_value == exclude:
-                products.append({
-                    'id': product_id,
-                    'handle': product.get('handle', ''),
-                    'title': product.get('title', '')
-                })
-        
-        # Check for next page
-        link_header = response.headers.get('Link', '')
-        if 'rel="next"' in link_header:
-            # Extract page_info from Link header
-            next_link = [l for l in link_header.split(',') if 'rel="next"' in l]
-            if next_link:
-                # Extract page_info from URL
-                import re
-                match = re.search(r'page_info=([^&>]+)', next_link[0])
-                if match:
-                    page_info = match.group(1)
-                else:
-                    break
+def partition_products(
+    products: Iterable[Dict[str, Any]],
+    snapshot: Optional[PublicationSnapshot] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Split catalog state into the work to do, in one pass.
+    
+    Publication status comes from the snapshot when one is given (otherwise
+    from each product's 'published' value). Each product keeps its 'published'
+    status; no-op products get a 'reason':
+        unpublish - google_ads_exclude = true and still published
+        republish - google_ads_exclude = false and not published
+        noop      - already in the flagged state, or the metafield is unset
+    """
+    partitions = {'unpublish': [], 'republish': [], 'noop': []}
+    for product in products:
+        if snapshot is not None:
+            product['published'] = snapshot.is_published(product['id'])
+        if product['exclude'] is None:
+            partitions['noop'].append({**product, 'reason': 'no_metafield'})
+        elif product['exclude']:
+            if product['published']:
+                partitions['unpublish'].append(product)
             else:
-                break
+                partitions['noop'].append({**product, 'reason': 'already_unpublished'})
+        elif not product['published']:
+            partitions['republish'].append(product)
         else:
-            break
+            partitions['noop'].append({**product, 'reason': 'already_published'})
     
-    return products
+    return partitions
 
 
-def is_product_published(store: str, token: str, product_id: str, publication_id: str) -> bool:
-    """Check if product is published to the publication."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications.json"
-    params = {'product_id': product_id}
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
-    
-    product_publications = response.json().get('product_publications', [])
-    return len(product_publications) > 0
-
-
-def unpublish_product(store: str, token: str, product_id: str, publication_id: str) -> bool:
-    """Unpublish a product from a publication."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications.json"
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
-    
-    # Get existing product publication
-    params = {'product_id': product_id}
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
-    
-    product_publications = response.json().get('product_publications', [])
-    if not product_publications:
-        return False  # Not published
-    
-    # Delete the product publication
-    product_pub_id = product_publications[0]['id']
-    delete_url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications/{product_pub_id}.json"
-    
-    response = requests.delete(delete_url, headers=headers)
-    response.raise_for_status()
-    
-    return True
+def get_catalog_partitions(store: str, token: str, snapshot: PublicationSnapshot) -> Dict[str, List[Dict[str, Any]]]:
+    """Read the catalog flags once (one bulk operation, see shopify_bulk.py) and partition them."""
+    return partition_products(iter_catalog_state(store, token), snapshot)
 
 
-def publish_product(store: str, token: str, product_id: str, publication_id: str) -> bool:
-    """Publish a product to a publication."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications.json"
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
+def apply_changes(
+    action: str,
+    products: List[Dict[str, Any]],
+    operation: Callable[[Dict[str, Any]], bool],
+    concurrency: int,
+    bucket: CallLimitBucket,
+    batcher: Optional[PublicationBatcher] = None
+) -> int:
+    """Run one publish/unpublish action, printing and logging each product. Returns the number changed.
     
-    payload = {
-        'product_publication': {
-            'product_id': product_id
-        }
-    }
+    Products go through `operation` concurrently, or through batched GraphQL
+    mutations when a batcher is given.
+    """
+    past = {'unpublish': 'Unpublished', 'republish': 'Republished'}[action]
+    entries = []
+    changed = 0
     
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
+    def on_result(product: Dict[str, Any], result: bool, error: Optional[BaseException]) -> None:
+        nonlocal changed
+        product_id = str(product['id'])
+        if error is not None:
+            print(f"❌ Error {action}ing {product['handle']}: {error}")
+            entries.append(log_entry(action, product_id, 'error', str(error)))
+        elif result:
+            print(f"✅ {past}: {product['handle']} ({product_id})")
+            entries.append(log_entry(action, product_id, 'success', product['handle']))
+            changed += 1
+        else:
+            print(f"⚠️  Already {past.lower()}: {product['handle']}")
     
-    return True
+    if batcher is not None:
+        graphql_action = {'unpublish': 'unpublish', 'republish': 'publish'}[action]
+        batcher.run(graphql_action, products, on_result, product_id=lambda product: product['id'], label=action)
+    else:
+        run_operations(products, operation, on_result, concurrency, action, bucket)
+    log_actions(entries)
+    return changed
 
 
 def main():
@@ -230,53 +171,46 @@ def main():
         print("ERROR: SHOPIFY_ACCESS_TOKEN not set")
         sys.exit(1)
     
+    # All REST calls share one rate-limit bucket (see publish_executor.py)
+    session = ThrottledSession()
+    
     print("Getting Google & YouTube publication ID...")
-    publication_id = get_publication_id(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN)
+    publication_id = get_publication_id(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, session)
     print(f"✅ Publication ID: {publication_id}")
     
-    print("\nFinding products to unpublish (google_ads_exclude = true)...")
-    products_to_unpublish = get_products_with_metafield(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, True)
-    print(f"Found {len(products_to_unpublish)} products to unpublish")
-    
-    print("\nFinding products to republish (google_ads_exclude = false)...")
-    products_to_republish = get_products_with_metafield(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, False)
-    print(f"Found {len(products_to_republish)} products to republish")
+    # Membership checks and unpublish targets come from this snapshot, kept current as products change
+    print("\nLoading Google & YouTube publication membership...")
+    snapshot = PublicationSnapshot(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, publication_id, session).load()
+    print(f"✅ {len(snapshot)} products published ({snapshot.stats['pages']} page(s))")
+    
+    print("\nReading catalog state (google_ads_exclude)...")
+    partitions = get_catalog_partitions(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, snapshot)
+    noop_reasons = Counter(product['reason'] for product in partitions['noop'])
+    print(f"Found {len(partitions['unpublish'])} products to unpublish, {len(partitions['republish'])} to republish")
+    print(f"   No change: {noop_reasons['already_unpublished']} already unpublished, "
+          f"{noop_reasons['already_published']} already published, {noop_reasons['no_metafield']} without the metafield")
+    
+    concurrency = concurrency_from_argv(sys.argv)
+    # --graphql packs many products into each request (see publication_mutations.py)
+    batcher = None
+    mode = f"{concurrency} concurrent requests"
+    if '--graphql' in sys.argv:
+        batcher = PublicationBatcher(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, publication_id, snapshot=snapshot)
+        mode = "batched GraphQL mutations"
     
     # Unpublish products
     print("\n" + "="*60)
-    print("Unpublishing products...")
-    unpublished_count = 0
-    for product in products_to_unpublish:
-        product_id = str(product['id'])
-        if is_product_published(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, product_id, publication_id):
-            try:
-                unpublish_product(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, product_id, publication_id)
-                print(f"✅ Unpublished: {product['handle']} ({product_id})")
-                log_action('unpublish', product_id, 'success', product['handle'])
-                unpublished_count += 1
-            except Exception as e:
-                print(f"❌ Error unpublishing {product['handle']}: {e}")
-                log_action('unpublish', product_id, 'error', str(e))
-        else:
-            print(f"⚠️  Already unpublished: {product['handle']}")
+    print(f"Unpublishing products ({mode})...")
+    unpublished_count = apply_changes('unpublish', partitions['unpublish'],
+                                      lambda product: snapshot.unpublish(product['id']), concurrency, session.bucket,
+                                      batcher)
     
     # Republish products
     print("\n" + "="*60)
-    print("Republishing products...")
-    republished_count = 0
-    for product in products_to_republish:
-        product_id = str(product['id'])
-        if not is_product_published(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, product_id, publication_id):
-            try:
-                publish_product(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, product_id, publication_id)
-                print(f"✅ Republished: {product['handle']} ({product_id})")
-                log_action('republish', product_id, 'success', product['handle'])
-                republished_count += 1
-            except Exception as e:
-                print(f"❌ Error republishing {product['handle']}: {e}")
-                log_action('republish', product_id, 'error', str(e))
-        else:
-            print(f"⚠️  Already published: {product['handle']}")
+    print(f"Republishing products ({mode})...")
+    republished_count = apply_changes('republish', partitions['republish'],
+                                      lambda product: snapshot.publish(product['id']), concurrency, session.bucket,
+                                      batcher)
     
     print("\n" + "="*60)
     print("Summary:")
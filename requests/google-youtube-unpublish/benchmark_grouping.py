@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Grouping Scaling Benchmark
+Times analyze_inventory() and analyze_products() on synthetic variant rows at
+doubling catalog sizes and checks that cost per row stays flat (linear scaling).
+
+Usage:
+    python3 benchmark_grouping.py [--max-products 16000]
+"""
+
+import random
+import sys
+import time
+from typing import List, Callable
+
+from analyze_inventory import analyze_inventory
+from analyze_products import analyze_products
+from product_catalog import CatalogRow, group_products
+
+START_PRODUCTS = 1000
+MAX_PRODUCTS = 16000
+VARIANTS_PER_PRODUCT = 7
+
+# Per-row cost at the largest size may not exceed this multiple of the smallest
+MAX_PER_ROW_GROWTH = 3.0
+
+
+def make_rows(num_products: int, seed: int = 42) -> List[CatalogRow]:
+    """Build projected variant rows for a synthetic catalog."""
+    rng = random.Random(seed)
+    sizes = ['XS', 'SM', 'MD', 'LG', 'XL', '2XL', '3XL']
+    rows = []
+    for p in range(num_products):
+        product_id = str(8000000000000 + p)
+        for i, size in enumerate(sizes[:VARIANTS_PER_PRODUCT]):
+            rows.append(CatalogRow(
+                product_id=product_id,
+                handle=f'product-{p}',
+                title=f'Product {p}',
+                url=f'https://www.rudis.com/products/product-{p}',
+                status='Active',
+                published='true',
+                vendor='RUDIS',
+                product_type=rng.choice(['Singlet', 'T-Shirt', 'Shorts']),
+                tags='Wrestling, Apparel',
+                top_row='TRUE' if i == 0 else '',
+                variant_id=str(40000000000000 + p * 10 + i),
+                variant_sku=f'SKU-{p}-{size}',
+                option1_name='Color',
+                option1_value=rng.choice(['Black', 'White', 'Navy']),
+                option2_name='Size',
+                option2_value=size,
+                option3_name='',
+                option3_value='',
+                price='44.99',
+                compare_at_price='',
+                inventory_qty=rng.choice([0, 0, 1, 4, 12]),
+            ))
+    return rows
+
+
+def time_call(func: Callable, rows: List[CatalogRow]) -> float:
+    """Return wall time in seconds for grouping plus a single analyzer call."""
+    start = time.perf_counter()
+    func(group_products(rows))
+    return time.perf_counter() - start
+
+
+def main():
+    """Main execution function."""
+    max_products = MAX_PRODUCTS
+    if '--max-products' in sys.argv:
+        max_products = int(sys.argv[sys.argv.index('--max-products') + 1])
+
+    results = {'analyze_inventory': [], 'analyze_products': []}
+
+    print(f"{'Products':>10} {'Rows':>10} {'Stage':<18} {'Seconds':>9} {'µs/row':>8}")
+    num_products = START_PRODUCTS
+    while num_products <= max_products:
+        rows = make_rows(num_products)
+        for name, func in (('analyze_inventory', analyze_inventory), ('analyze_products', analyze_products)):
+            seconds = time_call(func, rows)
+            per_row = seconds / len(rows) * 1e6
+            results[name].append(per_row)
+            print(f"{num_products:>10,} {len(rows):>10,} {name:<18} {seconds:>9.3f} {per_row:>8.2f}")
+        num_products *= 2
+
+    failed = False
+    for name, per_row in results.items():
+        growth = per_row[-1] / per_row[0] if per_row[0] else 0
+        status = '✅' if growth <= MAX_PER_ROW_GROWTH else '❌'
+        print(f"{status} {name}: per-row cost grew {growth:.2f}x from smallest to largest catalog")
+        failed = failed or growth > MAX_PER_ROW_GROWTH
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
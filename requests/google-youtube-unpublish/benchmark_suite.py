@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Analyzer Benchmark Suite
+Generates synthetic exports (see synthetic_export.py) and records wall time,
+peak RSS and rows/sec for each analyzer stage, optionally comparing against a
+stored baseline.
+
+Each stage runs in a fresh interpreter so its peak RSS is its own:
+    parse             - CSV parse and column projection (product_catalog)
+    retain_rows       - parse keeping every CatalogRow in memory (per-variant record footprint)
+    cache_build       - parse plus writing Products.csv.cache (export_cache)
+    cache_load        - reading rows back from the cache
+    analyze_inventory - analyze_inventory() over cached rows
+    analyze_products  - analyze_products() over cached rows
+
+Usage:
+    python3 benchmark_suite.py [--sizes 1k,10k,100k] [--seed 1] [--stages parse,analyze_inventory]
+                               [--save-baseline] [--baseline benchmark_baseline.json]
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from synthetic_export import OUTPUT_DIR as DATA_DIR, parse_size, write_export
+
+BASELINE_FILE = Path(__file__).parent / "benchmark_baseline.json"
+
+DEFAULT_SIZES = ['1k', '10k', '100k']
+STAGES = ['parse', 'retain_rows', 'cache_build', 'cache_load', 'analyze_inventory', 'analyze_products']
+
+# A stage regresses when it is this much slower / larger than the baseline
+TIME_TOLERANCE = 0.25
+RSS_TOLERANCE = 0.20
+# Timing differences below this are noise at small sizes and never count as regressions
+MIN_TIME_DELTA = 0.05
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def stage_function(stage: str, csv_path: Path) -> Callable[[], int]:
+    """Return a callable that runs one stage and returns the number of rows processed."""
+    from product_catalog import group_products, iter_catalog_rows
+    from export_cache import cache_path_for, load_cache, parse_and_cache, source_key
+
+    cache_path = cache_path_for(csv_path)
+
+    def count(rows) -> int:
+        return sum(1 for _ in rows)
+
+    if stage == 'parse':
+        return lambda: count(iter_catalog_rows(csv_path))
+    if stage == 'retain_rows':
+        return lambda: len(list(iter_catalog_rows(csv_path)))
+    if stage == 'cache_build':
+        if cache_path.exists():
+            cache_path.unlink()
+        return lambda: count(parse_and_cache(iter_catalog_rows(csv_path), cache_path, source_key(csv_path)))
+    if stage == 'cache_load':
+        if not cache_path.exists():
+            raise ValueError(f"No cache for {csv_path.name}; run the cache_build stage first")
+        return lambda: count(load_cache(cache_path))
+
+    if stage in ('analyze_inventory', 'analyze_products'):
+        from analyze_inventory import analyze_inventory
+        from analyze_products import analyze_products
+        analyze = analyze_inventory if stage == 'analyze_inventory' else analyze_products
+        # Rows are loaded before timing starts so only the analyzer is measured
+        rows = list(load_cache(cache_path)) if cache_path.exists() else list(iter_catalog_rows(csv_path))
+
+        def run() -> int:
+            analyze(group_products(rows))
+            return len(rows)
+        return run
+    raise ValueError(f"Unknown stage {stage!r}; expected one of {', '.join(STAGES)}")
+
+
+def run_stage(stage: str, csv_path: Path) -> Dict[str, Any]:
+    """Run one stage in this process and measure it."""
+    func = stage_function(stage, csv_path)
+    start = time.perf_counter()
+    rows = func()
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'rows_per_sec': round(rows / seconds) if seconds else 0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_stage_subprocess(stage: str, csv_path: Path) -> Dict[str, Any]:
+    """Run one stage in a fresh interpreter and return its measurements."""
+    result = subprocess.run(
+        [sys.executable, __file__, '--run-stage', stage, '--csv', str(csv_path)],
+        cwd=Path(__file__).parent, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {stage} failed on {csv_path.name}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def dataset_path(size: str, seed: int) -> Path:
+    """Generate (once) and return the synthetic export for a size and seed."""
+    path = DATA_DIR / f"Products_{size}_seed{seed}.csv"
+    if not path.exists():
+        print(f"Generating {path.name}...")
+        write_export(path, parse_size(size), seed)
+    return path
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Return a description of each stage that regressed against the baseline."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slower = result['seconds'] - base['seconds']
+        if slower > MIN_TIME_DELTA and result['seconds'] > base['seconds'] * (1 + TIME_TOLERANCE):
+            regressions.append(f"{key}: {result['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+        if base.get('peak_rss_mb') and result['peak_rss_mb'] and result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + RSS_TOLERANCE):
+            regressions.append(f"{key}: {result['peak_rss_mb']:.1f} MB vs baseline {base['peak_rss_mb']:.1f} MB peak RSS")
+    return regressions
+
+
+def format_change(value: float, base: Optional[float]) -> str:
+    if not base:
+        return ''
+    return f"{(value - base) / base * 100:+.0f}%"
+
+
+def main():
+    """Main execution function."""
+    if '--run-stage' in sys.argv:
+        stage = sys.argv[sys.argv.index('--run-stage') + 1]
+        csv_path = Path(sys.argv[sys.argv.index('--csv') + 1])
+        print(json.dumps(run_stage(stage, csv_path)))
+        return
+
+    sizes = DEFAULT_SIZES
+    if '--sizes' in sys.argv:
+        sizes = [size.strip() for size in sys.argv[sys.argv.index('--sizes') + 1].split(',') if size.strip()]
+    stages = STAGES
+    if '--stages' in sys.argv:
+        stages = [stage.strip() for stage in sys.argv[sys.argv.index('--stages') + 1].split(',') if stage.strip()]
+    seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else 1
+    baseline_path = Path(sys.argv[sys.argv.index('--baseline') + 1]) if '--baseline' in sys.argv else BASELINE_FILE
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if baseline_path.exists() and '--save-baseline' not in sys.argv:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'Size':>6} {'Stage':<18} {'Seconds':>9} {'Rows/sec':>12} {'Peak RSS MB':>12} {'Δ time':>8} {'Δ RSS':>7}")
+    for size in sizes:
+        csv_path = dataset_path(size, seed)
+        for stage in stages:
+            result = run_stage_subprocess(stage, csv_path)
+            key = f"{size}/{stage}"
+            results[key] = result
+            base = baseline.get(key, {})
+            rss = result['peak_rss_mb']
+            print(f"{size:>6} {stage:<18} {result['seconds']:>9.3f} {result['rows_per_sec']:>12,} "
+                  f"{rss if rss is not None else '-':>12} {format_change(result['seconds'], base.get('seconds')):>8} "
+                  f"{format_change(rss or 0, base.get('peak_rss_mb')) if rss else '':>7}")
+
+    if '--save-baseline' in sys.argv:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({'seed': seed, 'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"\n✅ Saved baseline: {baseline_path}")
+        return
+
+    if not baseline:
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to record one")
+        return
+
+    regressions = compare(results, baseline)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {baseline_path.name}:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        sys.exit(1)
+    print(f"\n✅ No regressions against {baseline_path.name} "
+          f"(tolerance: +{TIME_TOLERANCE:.0%} time, +{RSS_TOLERANCE:.0%} peak RSS)")
+
+
+if __name__ == '__main__':
+    main()
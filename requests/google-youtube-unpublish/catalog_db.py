@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+SQLite Catalog Store
+Bulk-loads a Products.csv export into a local SQLite database
+(`Products.csv.sqlite`, next to the export), so follow-up questions are SQL
+queries instead of another full CSV pass.
+
+Schema:
+    products(position, product_id, handle, title, url, status, published, vendor, product_type, tags)
+    variants(position, product_id, variant_id, variant_sku, option1_name .. option3_value, price,
+             compare_at_price, inventory_qty)
+    product_counts  - view: per-product total_variants / in_stock_variants
+    meta            - schema version and the export's size / mtime / hash
+
+Product fields come from each product's header row (the Matrixify Top Row).
+The database is rebuilt in a temporary file and swapped in, and reused while the
+export is unchanged (same freshness check as export_cache).
+
+Usage:
+    python3 catalog_db.py ingest [--csv PATH] [--no-cache] [--workers N]
+    python3 catalog_db.py query "SELECT size, COUNT(*) ..." [--csv PATH]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from product_catalog import ProductGroup, make_row_builder
+from export_cache import compare_source, iter_cached_products, source_key
+
+# Path to products CSV (full export; analyzers filter by status themselves)
+PRODUCTS_CSV = Path(__file__).parent.parent.parent / "data" / "AD_PRODUCTS_Export_2025-11-04_095613" / "Products.csv"
+
+SCHEMA_VERSION = 2
+DB_SUFFIX = '.sqlite'
+
+# Rows per executemany() call; the whole load is a single transaction
+BATCH_SIZE = 10000
+
+PRODUCT_FIELDS = ['product_id', 'handle', 'title', 'url', 'status', 'published', 'vendor', 'product_type', 'tags']
+VARIANT_FIELDS = [
+    'variant_id', 'variant_sku',
+    'option1_name', 'option1_value', 'option2_name', 'option2_value', 'option3_name', 'option3_value',
+    'price', 'compare_at_price', 'inventory_qty'
+]
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE products (
+    position INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE,
+    handle TEXT, title TEXT, url TEXT, status TEXT, published TEXT,
+    vendor TEXT, product_type TEXT, tags TEXT
+);
+CREATE TABLE variants (
+    position INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL REFERENCES products (product_id),
+    variant_id TEXT, variant_sku TEXT,
+    option1_name TEXT, option1_value TEXT,
+    option2_name TEXT, option2_value TEXT,
+    option3_name TEXT, option3_value TEXT,
+    price TEXT, compare_at_price TEXT,
+    inventory_qty INTEGER NOT NULL
+);
+CREATE VIEW product_counts AS
+    SELECT p.position, p.product_id, p.status,
+           COUNT(*) AS total_variants,
+           SUM(v.inventory_qty > 0) AS in_stock_variants
+    FROM products p JOIN variants v ON v.product_id = p.product_id
+    GROUP BY p.product_id;
+"""
+
+# Created after the bulk load, which is faster than maintaining them per insert
+INDEXES = """
+CREATE INDEX idx_products_handle ON products (handle);
+CREATE INDEX idx_products_status ON products (status);
+CREATE INDEX idx_variants_product ON variants (product_id);
+CREATE INDEX idx_variants_variant_id ON variants (variant_id);
+CREATE INDEX idx_variants_sku ON variants (variant_sku);
+CREATE INDEX idx_variants_option1 ON variants (option1_value);
+CREATE INDEX idx_variants_option2 ON variants (option2_value);
+CREATE INDEX idx_variants_option3 ON variants (option3_value);
+"""
+
+INVENTORY_STATS_SQL = """
+SELECT
+    (SELECT COUNT(*) FROM products) AS total_products,
+    COUNT(*) AS products_analyzed,
+    COUNT(*) AS products_active,
+    (SELECT COUNT(*) FROM products) - COUNT(*) AS products_inactive,
+    COALESCE(SUM(in_stock_variants > 0 AND in_stock_variants < total_variants), 0) AS products_with_oos_variants,
+    COALESCE(SUM(in_stock_variants = total_variants), 0) AS products_fully_in_stock,
+    COALESCE(SUM(in_stock_variants = 0), 0) AS products_fully_out_of_stock,
+    COALESCE(SUM(total_variants), 0) AS total_variants,
+    COALESCE(SUM(in_stock_variants), 0) AS total_in_stock_variants,
+    COALESCE(SUM(total_variants - in_stock_variants), 0) AS total_out_of_stock_variants
+FROM product_counts
+WHERE status = 'Active'
+"""
+
+UNPUBLISH_STATS_SQL = """
+SELECT
+    COUNT(*) AS total_products,
+    COUNT(*) AS products_analyzed,
+    COALESCE(SUM(in_stock_variants <= :threshold), 0) AS products_with_5_or_fewer_in_stock,
+    COALESCE(SUM(total_variants), 0) AS total_variants_analyzed,
+    COALESCE(SUM(in_stock_variants), 0) AS total_in_stock_variants,
+    COALESCE(SUM(total_variants - in_stock_variants), 0) AS total_out_of_stock_variants
+FROM product_counts
+"""
+
+
+def db_path_for(csv_path: Path) -> Path:
+    """Database location for an export (next to the CSV)."""
+    return csv_path.with_name(csv_path.name + DB_SUFFIX)
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open a catalog database with name-addressable rows."""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def read_meta(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Decoded meta table, or {} if the database has none."""
+    try:
+        return {row['key']: json.loads(row['value']) for row in conn.execute("SELECT key, value FROM meta")}
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def load_products(conn: sqlite3.Connection, products: Iterable[ProductGroup],
+                  batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """Insert grouped products and their variants in batches. Returns (products, variants)."""
+    product_sql = f"INSERT INTO products (position, {', '.join(PRODUCT_FIELDS)}) VALUES ({', '.join('?' * (len(PRODUCT_FIELDS) + 1))})"
+    variant_sql = f"INSERT INTO variants (product_id, {', '.join(VARIANT_FIELDS)}) VALUES ({', '.join('?' * (len(VARIANT_FIELDS) + 1))})"
+    product_batch = []
+    variant_batch = []
+    product_count = 0
+    variant_count = 0
+
+    for product in products:
+        row = product.row
+        product_batch.append((product_count,) + tuple(getattr(row, field) for field in PRODUCT_FIELDS))
+        product_count += 1
+        for variant in product.variants:
+            variant_batch.append((product.product_id,) + tuple(getattr(variant, field) for field in VARIANT_FIELDS))
+        variant_count += len(product.variants)
+
+        if len(variant_batch) >= batch_size:
+            conn.executemany(product_sql, product_batch)
+            conn.executemany(variant_sql, variant_batch)
+            product_batch = []
+            variant_batch = []
+
+    conn.executemany(product_sql, product_batch)
+    conn.executemany(variant_sql, variant_batch)
+    return product_count, variant_count
+
+
+def ingest(csv_path: Path, db_path: Optional[Path] = None, use_cache: bool = True, workers: int = 1,
+           content_hash: Optional[str] = None) -> Path:
+    """(Re)build the catalog database for an export and return its path.
+
+    The export is hashed once for the source key (unless `content_hash` is
+    given) and the hash is shared with the parsed-export cache check.
+    """
+    db_path = db_path or db_path_for(csv_path)
+    source = source_key(csv_path, content_hash)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = connect(tmp_path)
+    try:
+        # The file is rebuilt from the export on any failure, so skip journaling and fsyncs
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+        with conn:
+            products, variants = load_products(conn, iter_cached_products(csv_path, use_cache, workers, source['hash']))
+            conn.executescript(INDEXES)
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ('version', json.dumps(SCHEMA_VERSION)),
+                ('source', json.dumps(source)),
+                ('counts', json.dumps({'products': products, 'variants': variants})),
+            ])
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return db_path
+
+
+def is_fresh(conn: sqlite3.Connection, csv_path: Path) -> Tuple[bool, Optional[str]]:
+    """Check that a database was built by this schema from the current export.
+
+    Returns (fresh, the export's content hash if it had to be computed).
+    """
+    meta = read_meta(conn)
+    if meta.get('version') != SCHEMA_VERSION:
+        return False, None
+    return compare_source(csv_path, meta.get('source', {}))
+
+
+def open_catalog(csv_path: Path, use_cache: bool = True, workers: int = 1) -> sqlite3.Connection:
+    """Connect to the export's database, ingesting it first if missing or stale."""
+    db_path = db_path_for(csv_path)
+    content_hash = None
+    if db_path.exists():
+        conn = connect(db_path)
+        fresh, content_hash = is_fresh(conn, csv_path)
+        if fresh:
+            return conn
+        conn.close()
+    print(f"Loading {csv_path.name} into {db_path.name}...")
+    return connect(ingest(csv_path, db_path, use_cache, workers, content_hash))
+
+
+def inventory_stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Catalog stats in the shape of analyze_inventory's `stats`."""
+    return dict(conn.execute(INVENTORY_STATS_SQL).fetchone())
+
+
+def unpublish_stats(conn: sqlite3.Connection, threshold: int = 5) -> Dict[str, int]:
+    """Catalog stats in the shape of analyze_products' `stats`."""
+    return dict(conn.execute(UNPUBLISH_STATS_SQL, {'threshold': threshold}).fetchone())
+
+
+def iter_products(conn: sqlite3.Connection, where: str = '1', params: Sequence[Any] = ()) -> Iterator[ProductGroup]:
+    """Yield ProductGroups, in export order, for products matching a `product_counts` condition.
+
+    e.g. iter_products(conn, "in_stock_variants <= ?", (5,)). Every rebuilt row
+    carries its product's header fields.
+    """
+    sql = f"""
+        SELECT {', '.join('p.' + field for field in PRODUCT_FIELDS)}, {', '.join('v.' + field for field in VARIANT_FIELDS)}
+        FROM product_counts c
+        JOIN products p ON p.product_id = c.product_id
+        JOIN variants v ON v.product_id = c.product_id
+        WHERE {where}
+        ORDER BY v.position
+    """
+    build_row = make_row_builder()
+    rows = (
+        build_row([*record[:len(PRODUCT_FIELDS)], '', *record[len(PRODUCT_FIELDS):]])
+        for record in conn.execute(sql, params)
+    )
+    for product_id, variants in groupby(rows, key=lambda row: row.product_id):
+        variants = list(variants)
+        yield ProductGroup(product_id, variants[0], variants)
+
+
+def print_rows(cursor: sqlite3.Cursor) -> None:
+    """Print query results as a markdown table."""
+    headers = [column[0] for column in cursor.description or []]
+    if not headers:
+        return
+    print('| ' + ' | '.join(headers) + ' |')
+    print('|' + '|'.join('-' * (len(h) + 2) for h in headers) + '|')
+    count = 0
+    for row in cursor:
+        print('| ' + ' | '.join('' if value is None else str(value) for value in row) + ' |')
+        count += 1
+    print(f"\n{count:,} row(s)")
+
+
+def main():
+    """Ingest the export or run an ad-hoc SQL query against it."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'ingest'
+    csv_path = Path(sys.argv[sys.argv.index('--csv') + 1]) if '--csv' in sys.argv else PRODUCTS_CSV
+    if not csv_path.exists():
+        print(f"ERROR: Products CSV not found at {csv_path}")
+        return
+
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+
+    if command == 'ingest':
+        db_path = ingest(csv_path, use_cache=use_cache, workers=workers)
+        with connect(db_path) as conn:
+            counts = read_meta(conn)['counts']
+        print(f"✅ Loaded {counts['products']:,} products / {counts['variants']:,} variants into {db_path}")
+    elif command == 'query' and len(sys.argv) > 2:
+        conn = open_catalog(csv_path, use_cache, workers)
+        try:
+            print_rows(conn.execute(sys.argv[2]))
+        except sqlite3.Error as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        finally:
+            conn.close()
+    else:
+        print("Usage: catalog_db.py ingest | query \"<SQL>\" [--csv PATH]")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Parsed Export Cache
+Binary cache of the projected, typed parse of a Products.csv export, stored
+next to the export as `Products.csv.cache`.
+
+The cache is keyed by the CSV's size, mtime and content hash: a matching size
+and mtime is trusted directly, otherwise the file is hashed so a touched or
+re-copied but identical export still hits. On a hit, rows are rebuilt from
+interned strings and integer arrays without re-tokenizing the CSV.
+
+File layout:
+    MAGIC (8 bytes) | header length (uint32) | header JSON
+    | string table (UTF-8, NUL-separated)
+    | one int32 code array per text column | int64 inventory qty array
+"""
+
+import hashlib
+import json
+import struct
+import sys
+from array import array
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from product_catalog import CATALOG_COLUMNS, CatalogRow, ProductGroup, group_products, iter_catalog_rows
+from parallel_parse import iter_catalog_rows_parallel
+
+MAGIC = b'RUDISPC1'
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.cache'
+
+FIELDS = list(CATALOG_COLUMNS)
+TEXT_FIELDS = [field for field in FIELDS if field != 'inventory_qty']
+QTY_POSITION = FIELDS.index('inventory_qty')
+
+
+def cache_path_for(csv_path: Path) -> Path:
+    """Cache file location for an export (next to the CSV)."""
+    return csv_path.with_name(csv_path.name + CACHE_SUFFIX)
+
+
+def file_hash(path: Path) -> str:
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(csv_path: Path, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Cache key describing the export file."""
+    stat = csv_path.stat()
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': content_hash or file_hash(csv_path)
+    }
+
+
+def read_header(cache_path: Path) -> Optional[Dict[str, Any]]:
+    """Read a cache file's header, or None if it is missing or unreadable."""
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_len,) = struct.unpack('<I', f.read(4))
+            return json.loads(f.read(header_len).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def is_compatible(header: Dict[str, Any]) -> bool:
+    """Check that a cache was written by this code for these columns."""
+    return (
+        header.get('version') == CACHE_VERSION
+        and header.get('fields') == FIELDS
+        and header.get('byteorder') == sys.byteorder
+    )
+
+
+def compare_source(csv_path: Path, source: Dict[str, Any],
+                   content_hash: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """Check a stored source key against the export's size, mtime and hash.
+
+    Returns (fresh, content hash). The hash is only computed when the size
+    matches but the mtime does not; pass it on to source_key() so a stale
+    export is hashed once.
+    """
+    stat = csv_path.stat()
+    if source.get('size') != stat.st_size:
+        return False, content_hash
+    if source.get('mtime_ns') == stat.st_mtime_ns:
+        return True, content_hash
+    content_hash = content_hash or file_hash(csv_path)
+    return source.get('hash') == content_hash, content_hash
+
+
+def write_cache(cache_path: Path, source: Dict[str, Any], strings: List[str],
+                codes: List[array], qty: array) -> None:
+    """Write a cache file atomically (skipped if a value contains the NUL separator)."""
+    if any('\x00' in value for value in strings):
+        return
+    string_blob = '\x00'.join(strings).encode('utf-8')
+    header = {
+        'version': CACHE_VERSION,
+        'fields': FIELDS,
+        'byteorder': sys.byteorder,
+        'source': source,
+        'rows': len(qty),
+        'strings': len(strings),
+        'string_bytes': len(string_blob),
+        'code_itemsize': array('i').itemsize,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(string_blob)
+        for column in codes:
+            column.tofile(f)
+        qty.tofile(f)
+    tmp_path.replace(cache_path)
+
+
+def load_cache(cache_path: Path) -> Iterator[CatalogRow]:
+    """Rebuild CatalogRow tuples from a cache file."""
+    with open(cache_path, 'rb') as f:
+        data = f.read()
+
+    (header_len,) = struct.unpack_from('<I', data, len(MAGIC))
+    offset = len(MAGIC) + 4
+    header = json.loads(data[offset:offset + header_len].decode('utf-8'))
+    offset += header_len
+
+    strings = data[offset:offset + header['string_bytes']].decode('utf-8').split('\x00')
+    offset += header['string_bytes']
+
+    num_rows = header['rows']
+    code_bytes = num_rows * header['code_itemsize']
+    codes = []
+    for _ in TEXT_FIELDS:
+        column = array('i')
+        column.frombytes(data[offset:offset + code_bytes])
+        codes.append(column)
+        offset += code_bytes
+
+    qty = array('q')
+    qty.frombytes(data[offset:offset + num_rows * qty.itemsize])
+    del data
+
+    columns: List[Any] = [list(map(strings.__getitem__, column)) for column in codes]
+    columns.insert(QTY_POSITION, qty)
+    # tuple.__new__ skips namedtuple._make's length check; widths are fixed by FIELDS
+    return map(partial(tuple.__new__, CatalogRow), zip(*columns))
+
+
+def parse_and_cache(rows: Iterable[CatalogRow], cache_path: Path, source: Dict[str, Any]) -> Iterator[CatalogRow]:
+    """Stream freshly parsed rows while collecting them for the cache.
+
+    The cache is only written once the CSV has been fully read.
+    """
+    strings: List[str] = []
+    string_codes: Dict[str, int] = {}
+    codes = [array('i') for _ in TEXT_FIELDS]
+    qty = array('q')
+    text_positions = [FIELDS.index(field) for field in TEXT_FIELDS]
+
+    for row in rows:
+        for column, position in zip(codes, text_positions):
+            value = row[position]
+            code = string_codes.get(value)
+            if code is None:
+                code = len(strings)
+                string_codes[value] = code
+                strings.append(value)
+            column.append(code)
+        qty.append(row.inventory_qty)
+        yield row
+
+    write_cache(cache_path, source, strings, codes, qty)
+
+
+def parse_rows(csv_path: Path, workers: int = 1) -> Iterator[CatalogRow]:
+    """Parse the CSV serially, or with a process pool when workers > 1."""
+    if workers > 1:
+        return iter_catalog_rows_parallel(csv_path, workers)
+    return iter_catalog_rows(csv_path)
+
+
+def iter_cached_rows(csv_path: Path, use_cache: bool = True, workers: int = 1,
+                     content_hash: Optional[str] = None) -> Iterator[CatalogRow]:
+    """Stream CatalogRow tuples, from the cache when it matches the export.
+
+    `content_hash` is the export's hash if the caller already computed it.
+    """
+    if not use_cache:
+        return parse_rows(csv_path, workers)
+
+    cache_path = cache_path_for(csv_path)
+    header = read_header(cache_path)
+    if header is not None and is_compatible(header):
+        fresh, content_hash = compare_source(csv_path, header.get('source', {}), content_hash)
+        if fresh:
+            return load_cache(cache_path)
+
+    return parse_and_cache(parse_rows(csv_path, workers), cache_path, source_key(csv_path, content_hash))
+
+
+def iter_cached_products(csv_path: Path, use_cache: bool = True, workers: int = 1,
+                         content_hash: Optional[str] = None) -> Iterator[ProductGroup]:
+    """Stream grouped products, using the parsed-export cache when possible."""
+    return group_products(iter_cached_rows(csv_path, use_cache=use_cache, workers=workers, content_hash=content_hash))
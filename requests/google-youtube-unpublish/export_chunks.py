@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Chunked Export Merge
+Reads a Matrixify export delivered as several partial Products CSV files (a
+directory of chunks plus `Export Summary.csv`) as one product stream.
+
+Chunks are parsed concurrently in a process pool (each through the parsed
+export cache, see export_cache.py) and merged in file order:
+    - a product split across consecutive chunks continues as one product
+    - repeated variants within a product are dropped, matched by variant ID
+      (by handle and option values for rows without one)
+    - a product that reappears after another product (e.g. an overlapping
+      re-export) is dropped; the first occurrence wins
+so the merged rows are product-contiguous and group_products() accepts them.
+
+Coverage is checked once every chunk has been read, against the summary's
+`Exported` column ("4629 of 14122": products exported by the job, out of all
+products in the store).
+
+Usage:
+    python3 export_chunks.py check DIR [--workers N] [--no-cache]
+"""
+
+import csv
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from product_catalog import CatalogRow
+from export_cache import iter_cached_rows
+
+SUMMARY_FILE = 'Export Summary.csv'
+SUMMARY_SHEET = 'Products'
+EXPORTED_PATTERN = re.compile(r'^\s*([\d,]+)\s+of\s+([\d,]+)\s*$')
+
+
+def natural_key(path: Path) -> List[Any]:
+    """Sort key ordering `Products_2.csv` before `Products_10.csv`."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path.name)]
+
+
+def read_export_summary(directory: Path, sheet: str = SUMMARY_SHEET) -> Optional[Dict[str, Any]]:
+    """Read the sheet's row of `Export Summary.csv` (None if there is no summary or no such sheet)."""
+    path = directory / SUMMARY_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for record in csv.DictReader(f):
+            if (record.get('Sheet') or '').strip() != sheet:
+                continue
+            match = EXPORTED_PATTERN.match(record.get('Exported') or '')
+            return {
+                'job_id': (record.get('Job ID') or '').strip(),
+                'sheet': sheet,
+                'finished_at': (record.get('Finished At') or '').strip(),
+                'filters': (record.get('Filters') or '').strip(),
+                'exported': int(match.group(1).replace(',', '')) if match else None,
+                'total': int(match.group(2).replace(',', '')) if match else None
+            }
+    return None
+
+
+def read_csv_header(path: Path) -> List[str]:
+    """First record of a CSV file (empty for an empty file)."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [name.strip() for name in next(csv.reader(f), [])]
+
+
+def find_chunks(directory: Path) -> List[Path]:
+    """Product CSV chunks in a directory (any CSV with an `ID` column except the summary), in natural order."""
+    chunks = [
+        path for path in directory.glob('*.csv')
+        if path.name != SUMMARY_FILE and 'ID' in read_csv_header(path)
+    ]
+    return sorted(chunks, key=natural_key)
+
+
+def variant_key(row: CatalogRow) -> Tuple[str, ...]:
+    """Identity of a variant row within its product: the variant ID, or handle and option values when it is blank."""
+    if row.variant_id:
+        return (row.variant_id,)
+    return (row.handle, row.option1_value, row.option2_value, row.option3_value)
+
+
+def load_chunk(args: Tuple[str, bool]) -> List[CatalogRow]:
+    """Worker: parse one chunk (through its export cache)."""
+    path, use_cache = args
+    return list(iter_cached_rows(Path(path), use_cache))
+
+
+class ChunkedExport:
+    """A directory of export chunks read as one merged, de-duplicated row stream."""
+
+    def __init__(self, directory: Path, use_cache: bool = True, workers: int = 1):
+        self.directory = directory
+        self.use_cache = use_cache
+        self.workers = workers
+        self.chunks = find_chunks(directory)
+        self.summary = read_export_summary(directory)
+        self.stats = {
+            'chunks': len(self.chunks),
+            'products': 0,
+            'variants': 0,
+            'split_products': 0,
+            'duplicate_variants': 0,
+            'duplicate_products': 0,
+            'duplicate_product_rows': 0
+        }
+
+    def header_problems(self) -> List[str]:
+        """Chunks whose columns differ from the first chunk's."""
+        if not self.chunks:
+            return [f"No product CSV chunks in {self.directory}"]
+        problems = []
+        first = read_csv_header(self.chunks[0])
+        for path in self.chunks[1:]:
+            header = read_csv_header(path)
+            missing = [name for name in first if name not in header]
+            if missing:
+                problems.append(f"{path.name} is missing {len(missing)} column(s) present in "
+                                f"{self.chunks[0].name}: {', '.join(missing[:5])}")
+        return problems
+
+    def chunk_rows(self) -> Iterator[Iterable[CatalogRow]]:
+        """Rows of each chunk in file order, parsed concurrently when workers > 1."""
+        if self.workers <= 1 or len(self.chunks) <= 1:
+            for path in self.chunks:
+                yield iter_cached_rows(path, self.use_cache)
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(self.chunks))) as pool:
+            tasks = [(str(path), self.use_cache) for path in self.chunks]
+            yield from pool.map(load_chunk, tasks)
+
+    def rows(self) -> Iterator[CatalogRow]:
+        """Merged rows, product-contiguous and de-duplicated by product and variant (see variant_key)."""
+        stats = self.stats
+        completed = set()
+        current_id = None
+        skipping = False
+        # The product whose rows were emitted last; it may continue in the next chunk, possibly
+        # after an overlap of products already emitted
+        emitted_id = None
+        emitted_variants = set()
+        emitted_chunk = None
+
+        for chunk, rows in enumerate(self.chunk_rows()):
+            for row in rows:
+                product_id = row.product_id
+                if not product_id:
+                    continue
+                if product_id != current_id:
+                    current_id = product_id
+                    skipping = False
+                    if product_id == emitted_id:
+                        pass  # Continues the last emitted product
+                    elif product_id in completed:
+                        skipping = True
+                        stats['duplicate_products'] += 1
+                    else:
+                        if emitted_id is not None:
+                            completed.add(emitted_id)
+                        emitted_id = product_id
+                        emitted_variants = set()
+                        stats['products'] += 1
+
+                if skipping:
+                    stats['duplicate_product_rows'] += 1
+                    continue
+                key = variant_key(row)
+                if key in emitted_variants:
+                    stats['duplicate_variants'] += 1
+                    continue
+                if emitted_variants and emitted_chunk != chunk:
+                    stats['split_products'] += 1
+                emitted_variants.add(key)
+                emitted_chunk = chunk
+                stats['variants'] += 1
+                yield row
+
+    def coverage_problems(self) -> List[str]:
+        """Compare merged product counts with `Export Summary.csv` (call after rows() is exhausted)."""
+        if self.summary is None or self.summary['exported'] is None:
+            return []
+        expected = self.summary['exported']
+        products = self.stats['products']
+        if products < expected:
+            return [f"Chunks cover {products:,} of the {expected:,} products exported by job "
+                    f"{self.summary['job_id']}; {expected - products:,} are missing"]
+        if products > expected:
+            return [f"Chunks contain {products:,} products but job {self.summary['job_id']} "
+                    f"exported {expected:,}; the directory may mix several exports"]
+        return []
+
+    def describe(self) -> str:
+        """One-line summary of the merge."""
+        stats = self.stats
+        line = (f"Merged {stats['chunks']} chunk(s): {stats['products']:,} products, {stats['variants']:,} variants "
+                f"({stats['split_products']:,} split across chunks, {stats['duplicate_products']:,} duplicate products, "
+                f"{stats['duplicate_variants']:,} duplicate variants dropped)")
+        if self.summary is not None and self.summary['exported'] is not None:
+            line += f"; summary: {self.summary['exported']:,} of {self.summary['total']:,}"
+        return line
+
+
+def iter_merged_rows(directory: Path, use_cache: bool = True, workers: int = 1) -> Iterator[CatalogRow]:
+    """Stream merged rows from a chunk directory, reporting the merge and any coverage gaps at the end.
+
+    Raises ValueError if the directory has no product CSV chunks.
+    """
+    export = ChunkedExport(directory, use_cache, workers)
+    problems = export.header_problems()
+    if not export.chunks:
+        raise ValueError(problems[0])
+    for problem in problems:
+        print(f"⚠️  {problem}")
+
+    def merged() -> Iterator[CatalogRow]:
+        yield from export.rows()
+        print(export.describe())
+        for problem in export.coverage_problems():
+            print(f"❌ Coverage: {problem}")
+
+    return merged()
+
+
+def iter_export_rows(path: Path, use_cache: bool = True, workers: int = 1) -> Iterator[CatalogRow]:
+    """Rows of a single Products.csv, or the merged rows of a directory of export chunks."""
+    if path.is_dir():
+        return iter_merged_rows(path, use_cache, workers)
+    return iter_cached_rows(path, use_cache, workers)
+
+
+def export_dir_from_argv(argv: List[str]) -> Optional[Path]:
+    """Chunk directory given with --export-dir DIR (None if absent)."""
+    if '--export-dir' not in argv:
+        return None
+    return Path(argv[argv.index('--export-dir') + 1])
+
+
+def main():
+    """Main execution function."""
+    if len(sys.argv) < 3 or sys.argv[1] != 'check':
+        print(__doc__)
+        sys.exit(1)
+
+    directory = Path(sys.argv[2])
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else os.cpu_count() or 1
+
+    export = ChunkedExport(directory, use_cache, workers)
+    problems = export.header_problems()
+    if not export.chunks:
+        print(f"ERROR: {problems[0]}")
+        sys.exit(1)
+
+    print(f"Reading {len(export.chunks)} chunk(s) from {directory}:")
+    for path in export.chunks:
+        print(f"   - {path.name} ({path.stat().st_size / 1e6:.1f} MB)")
+    sum(1 for _ in export.rows())
+    print(export.describe())
+
+    problems += export.coverage_problems()
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ Chunks are complete and consistent")
+
+
+if __name__ == '__main__':
+    main()
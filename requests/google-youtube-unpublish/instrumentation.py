@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Stage Instrumentation
+Opt-in timing and memory spans for the analyzer scripts (`--profile`).
+
+    profiler = Profiler.from_argv(sys.argv)
+    with profiler.span('analyze'):
+        rows = profiler.timed_iter('read_rows', iter_cached_rows(...), parent='group_products')
+        products = profiler.timed_iter('group_products', group_products(rows), parent='analyze')
+        analysis = analyze_inventory(products)
+    profiler.finish(TIMING_JSON, catalog={...})
+
+The pipeline is lazy, so CSV reading, grouping and analysis interleave inside
+one span. timed_iter() charges the time spent producing each item to its own
+stage, and timed_func() does the same for per-item callbacks such as the
+streaming JSON sink. Every stage reports inclusive seconds and exclusive
+seconds (minus its children), so `analyze` exclusive time is the
+per-product loop alone.
+
+Spans also record the tracemalloc peak reached while they were open. Tracing
+slows Python allocation down noticeably, so compare profiled runs with
+profiled runs. `--cprofile` additionally dumps cProfile stats to a `.prof`
+file and prints the top functions by cumulative time.
+
+When profiling is off, span(), timed_iter() and timed_func() are no-ops.
+"""
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+MB = 1024 * 1024
+
+
+class Profiler:
+    """Collects stage timings and tracemalloc peaks for one run."""
+
+    def __init__(self, enabled: bool = False, cprofile: bool = False):
+        self.enabled = enabled or cprofile
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._stack: List[List[Any]] = []  # [name, start, peak so far] per open span
+        self._start = time.perf_counter()
+        self._cprofile = cProfile.Profile() if cprofile else None
+        if self.enabled:
+            tracemalloc.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    @classmethod
+    def from_argv(cls, argv: List[str]) -> 'Profiler':
+        """Profiler enabled by --profile (and --cprofile)."""
+        return cls('--profile' in argv, '--cprofile' in argv)
+
+    def _stage(self, name: str, parent: Optional[str]) -> Dict[str, Any]:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'parent': parent, 'seconds': 0.0, 'items': 0, 'peak_mb': None}
+        return stage
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[str] = None) -> Iterator[None]:
+        """Time a block and record its tracemalloc peak. Nested spans default to the enclosing one as parent."""
+        if not self.enabled:
+            yield
+            return
+
+        if parent is None and self._stack:
+            parent = self._stack[-1][0]
+        stage = self._stage(name, parent)
+
+        # The traced peak is process-wide, so fold it into the enclosing span before resetting it
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], peak)
+        tracemalloc.reset_peak()
+        frame = [name, time.perf_counter(), current]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._stack.pop()
+            span_peak = max(frame[2], tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], span_peak)
+            stage['seconds'] += elapsed
+            stage['peak_mb'] = round(max(stage['peak_mb'] or 0, span_peak / MB), 2)
+
+    def timed_iter(self, name: str, iterable: Iterable, parent: Optional[str] = None) -> Iterable:
+        """Charge the time spent producing each item of `iterable` to stage `name`."""
+        if not self.enabled:
+            return iterable
+        return self._timed(self._stage(name, parent), iterable)
+
+    def timed_func(self, name: str, func: Callable, parent: Optional[str] = None) -> Callable:
+        """Charge the time spent in each call of `func` (e.g. a per-product sink) to stage `name`."""
+        if not self.enabled:
+            return func
+        stage = self._stage(name, parent)
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage['seconds'] += clock() - start
+                stage['items'] += 1
+        return timed
+
+    @staticmethod
+    def _timed(stage: Dict[str, Any], iterable: Iterable) -> Iterator:
+        clock = time.perf_counter
+        iterator = iter(iterable)
+        seconds = 0.0
+        items = 0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    seconds += clock() - start
+                    return
+                seconds += clock() - start
+                items += 1
+                yield item
+        finally:
+            stage['seconds'] += seconds
+            stage['items'] += items
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Stage rows with inclusive and exclusive seconds, each parent followed by its children."""
+        children: Dict[Optional[str], List[str]] = {}
+        child_seconds: Dict[str, float] = {}
+        for name, stage in self.stages.items():
+            parent = stage['parent'] if stage['parent'] in self.stages else None
+            children.setdefault(parent, []).append(name)
+            if parent:
+                child_seconds[parent] = child_seconds.get(parent, 0.0) + stage['seconds']
+
+        rows = []
+        pending = list(reversed(children.get(None, [])))
+        while pending:
+            name = pending.pop()
+            stage = self.stages[name]
+            rows.append({
+                'name': name,
+                'parent': stage['parent'],
+                'seconds': round(stage['seconds'], 4),
+                'exclusive_seconds': round(max(stage['seconds'] - child_seconds.get(name, 0.0), 0.0), 4),
+                'items': stage['items'],
+                'peak_mb': stage['peak_mb']
+            })
+            pending.extend(reversed(children.get(name, [])))
+        return rows
+
+    def finish(self, timing_path: Path, **extra: Any) -> None:
+        """Stop profiling, print the stage table and write the timing JSON (no-op when disabled)."""
+        if not self.enabled:
+            return
+        total_seconds = time.perf_counter() - self._start
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max([peak] + [frame[2] for frame in self._stack])
+        tracemalloc.stop()
+
+        stages = self.report()
+        timing = {
+            'script': Path(sys.argv[0]).name,
+            'generated': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'argv': sys.argv[1:],
+            'total_seconds': round(total_seconds, 4),
+            'peak_mb': round(max([peak / MB] + [stage['peak_mb'] or 0 for stage in stages]), 2),
+            **extra,
+            'stages': stages
+        }
+        with open(timing_path, 'w', encoding='utf-8') as f:
+            json.dump(timing, f, indent=2)
+
+        print(f"\n{'Stage':<24} {'Seconds':>9} {'Self':>9} {'Items':>10} {'Peak MB':>9}")
+        depth: Dict[str, int] = {}
+        for stage in stages:
+            depth[stage['name']] = depth.get(stage['parent'], -1) + 1
+            label = '  ' * depth[stage['name']] + stage['name']
+            peak_mb = '-' if stage['peak_mb'] is None else f"{stage['peak_mb']:.1f}"
+            print(f"{label:<24} {stage['seconds']:>9.3f} {stage['exclusive_seconds']:>9.3f} "
+                  f"{stage['items'] or '':>10} {peak_mb:>9}")
+        print(f"{'total':<24} {total_seconds:>9.3f}")
+        print(f"   - Timing: {timing_path}")
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            prof_path = timing_path.with_suffix('.prof')
+            self._cprofile.dump_stats(str(prof_path))
+            print(f"   - cProfile: {prof_path}\n")
+            pstats.Stats(self._cprofile).sort_stats('cumulative').print_stats(20)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Inventory History
+Append-only, delta-encoded per-variant inventory history built from successive
+dated exports (`AD_ACTIVE-PRODUCTS_Export_2025-11-04_141820`, ...).
+
+Each appended snapshot stores only the variants whose quantity changed since
+the previous snapshot, so a day on which little sold costs a few bytes per
+changed variant instead of a full copy of the export. A variant that drops
+out of an export is recorded with the MISSING quantity. Appends copy the file
+to `<path>.tmp`, add the block and rename it over the original, so a crash
+mid-write never leaves a torn block behind.
+
+File layout (`inventory_history.bin`):
+    MAGIC (8 bytes) | header length (uint32) | header JSON {version, byteorder}
+    then one block per snapshot:
+    meta length (uint32) | meta JSON {date, source, new_keys, keys_bytes, changes}
+    | new variant keys ("<product id>/<variant id>", UTF-8, NUL-separated)
+    | int32 variant index per change | int64 quantity per change
+
+Usage:
+    python3 inventory_history.py append [PATH/Products.csv ...]   # oldest first
+    python3 inventory_history.py report [--days 30] [--top 20] [--product ID]
+"""
+
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from product_catalog import ProductGroup
+
+# Path to products CSV (pre-filtered to Active products only)
+PRODUCTS_CSV = Path(__file__).parent / "AD_ACTIVE-PRODUCTS_Export_2025-11-04_141820" / "Products.csv"
+HISTORY_FILE = Path(__file__).parent / "inventory_history.bin"
+
+MAGIC = b'RUDISIH1'
+HISTORY_VERSION = 1
+
+# Quantity recorded when a previously seen variant is absent from an export
+MISSING = -1
+
+# Matrixify export folders are named <prefix>_Export_<YYYY-MM-DD>_<HHMMSS>
+EXPORT_DATE_PATTERN = re.compile(r'_Export_(\d{4}-\d{2}-\d{2})_(\d{6})')
+
+
+def export_date(csv_path: Path) -> datetime:
+    """Snapshot time of an export, from its folder name or else the file's mtime."""
+    match = EXPORT_DATE_PATTERN.search(csv_path.parent.name) or EXPORT_DATE_PATTERN.search(csv_path.name)
+    if match:
+        return datetime.strptime(match.group(1) + match.group(2), '%Y-%m-%d%H%M%S')
+    return datetime.fromtimestamp(csv_path.stat().st_mtime)
+
+
+def variant_key(product_id: str, variant_id: str) -> str:
+    return f"{product_id}/{variant_id}"
+
+
+class InventoryHistory:
+    """In-memory replay of the history: per variant, its (snapshot, quantity) change points."""
+
+    def __init__(self):
+        self.dates: List[datetime] = []
+        self.sources: List[str] = []
+        self.keys: List[str] = []
+        self.key_index: Dict[str, int] = {}
+        self.series: List[List[Tuple[int, int]]] = []
+
+    @classmethod
+    def load(cls, path: Path) -> 'InventoryHistory':
+        """Replay a history file (an empty history if it doesn't exist)."""
+        history = cls()
+        if not path.exists():
+            return history
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an inventory history file")
+            header = json.loads(f.read(struct.unpack('<I', f.read(4))[0]).decode('utf-8'))
+            if header.get('version') != HISTORY_VERSION or header.get('byteorder') != sys.byteorder:
+                raise ValueError(f"{path} was written with a different layout")
+
+            while True:
+                length = f.read(4)
+                if len(length) < 4:
+                    break
+                meta = json.loads(f.read(struct.unpack('<I', length)[0]).decode('utf-8'))
+                keys_blob = f.read(meta['keys_bytes']).decode('utf-8')
+                indices = array('i')
+                indices.fromfile(f, meta['changes'])
+                quantities = array('q')
+                quantities.fromfile(f, meta['changes'])
+
+                if meta['new_keys']:
+                    for key in keys_blob.split('\x00'):
+                        history._add_key(key)
+                history._add_snapshot(datetime.fromisoformat(meta['date']), meta['source'], indices, quantities)
+        return history
+
+    def _add_key(self, key: str) -> int:
+        index = len(self.keys)
+        self.keys.append(key)
+        self.key_index[key] = index
+        self.series.append([])
+        return index
+
+    def _add_snapshot(self, date: datetime, source: str, indices: Iterable[int], quantities: Iterable[int]) -> None:
+        snapshot = len(self.dates)
+        self.dates.append(date)
+        self.sources.append(source)
+        for index, qty in zip(indices, quantities):
+            self.series[index].append((snapshot, qty))
+
+    @property
+    def num_snapshots(self) -> int:
+        return len(self.dates)
+
+    def current_quantities(self) -> List[int]:
+        """Latest recorded quantity per variant (MISSING if never or no longer exported)."""
+        return [points[-1][1] if points else MISSING for points in self.series]
+
+    def append(self, path: Path, products: Iterable[ProductGroup], date: datetime, source: str) -> Dict[str, int]:
+        """Append one export as a delta block. Returns {'variants', 'new', 'changed', 'missing'}."""
+        if self.dates and date <= self.dates[-1]:
+            raise ValueError(f"Snapshot {date.isoformat()} is not newer than the last one ({self.dates[-1].isoformat()})")
+
+        previous = self.current_quantities()
+        seen = [False] * len(previous)
+        pending: Dict[str, int] = {}
+        new_keys: List[str] = []
+        indices = array('i')
+        quantities = array('q')
+        counts = {'variants': 0, 'new': 0, 'changed': 0, 'missing': 0}
+
+        for product in products:
+            for row in product.variants:
+                key = variant_key(product.product_id, row.variant_id)
+                index = self.key_index.get(key, pending.get(key))
+                if index is None:
+                    index = pending[key] = len(self.keys) + len(new_keys)
+                    new_keys.append(key)
+                    seen.append(True)
+                    counts['new'] += 1
+                elif seen[index]:
+                    continue  # Duplicate variant row; the first one wins
+                else:
+                    seen[index] = True
+                    if previous[index] == row.inventory_qty:
+                        counts['variants'] += 1
+                        continue
+                    counts['changed'] += 1
+                counts['variants'] += 1
+                indices.append(index)
+                quantities.append(row.inventory_qty)
+
+        for index, qty in enumerate(previous):
+            if not seen[index] and qty != MISSING:
+                indices.append(index)
+                quantities.append(MISSING)
+                counts['missing'] += 1
+
+        keys_blob = '\x00'.join(new_keys).encode('utf-8')
+        meta = json.dumps({
+            'date': date.isoformat(),
+            'source': source,
+            'new_keys': len(new_keys),
+            'keys_bytes': len(keys_blob),
+            'changes': len(indices),
+        }, ensure_ascii=False).encode('utf-8')
+
+        block = struct.pack('<I', len(meta)) + meta + keys_blob + indices.tobytes() + quantities.tobytes()
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                if path.exists():
+                    with open(path, 'rb') as existing:
+                        shutil.copyfileobj(existing, f)
+                else:
+                    header = json.dumps({'version': HISTORY_VERSION, 'byteorder': sys.byteorder}).encode('utf-8')
+                    f.write(MAGIC + struct.pack('<I', len(header)) + header)
+                f.write(block)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        for key in new_keys:
+            self._add_key(key)
+        self._add_snapshot(date, source, indices, quantities)
+        return counts
+
+    def window_start(self, days: Optional[float] = None) -> int:
+        """Index of the first snapshot within `days` of the latest one (0 if None)."""
+        if days is None or not self.dates:
+            return 0
+        latest = self.dates[-1]
+        for snapshot, date in enumerate(self.dates):
+            if (latest - date).total_seconds() <= days * 86400:
+                return snapshot
+        return len(self.dates) - 1
+
+    def variant_metrics(self, index: int, start: int = 0) -> Dict[str, Any]:
+        """Stockouts, units sold / received and last in-stock snapshot for one variant.
+
+        Quantity decreases count as units sold and increases as units received.
+        A variant that goes MISSING is treated as 0 stock without counting a sale.
+        """
+        qty = 0
+        begin = 0
+        sold = 0
+        received = 0
+        stockouts = 0
+        last_in_stock: Optional[int] = None
+        points = self.series[index]
+        for snapshot, value in points:
+            if qty > 0:
+                # In stock from the previous change point up to the snapshot before this one
+                last_in_stock = snapshot - 1
+            if value == MISSING:
+                qty = 0
+                if snapshot <= start:
+                    begin = 0
+                continue
+
+            if snapshot <= start:
+                begin = value
+            elif value < qty:
+                sold += qty - value
+                if qty > 0 and value == 0:
+                    stockouts += 1
+            else:
+                received += value - qty
+            qty = value
+        if qty > 0:
+            last_in_stock = self.num_snapshots - 1
+        return {
+            'begin': begin,
+            'current': qty,
+            'sold': sold,
+            'received': received,
+            'stockouts': stockouts,
+            'last_in_stock': last_in_stock
+        }
+
+    def product_trends(self, days: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Per-product stockout velocity, days since last in stock and sell-through.
+
+        `days` limits velocity and sell-through to the trailing window;
+        days since last in stock always uses the full history.
+        """
+        if not self.dates:
+            return {}
+        start = self.window_start(days)
+        latest = self.dates[-1]
+        window_days = max((latest - self.dates[start]).total_seconds() / 86400, 1)
+
+        totals: Dict[str, Dict[str, Any]] = {}
+        for index, key in enumerate(self.keys):
+            product_id = key.split('/', 1)[0]
+            metrics = self.variant_metrics(index, start)
+            total = totals.get(product_id)
+            if total is None:
+                total = totals[product_id] = {
+                    'variants': 0, 'begin': 0, 'sold': 0, 'received': 0, 'stockouts': 0, 'last_in_stock': None
+                }
+            total['variants'] += 1
+            for field in ('begin', 'sold', 'received', 'stockouts'):
+                total[field] += metrics[field]
+            if metrics['last_in_stock'] is not None and (total['last_in_stock'] is None or metrics['last_in_stock'] > total['last_in_stock']):
+                total['last_in_stock'] = metrics['last_in_stock']
+
+        trends = {}
+        for product_id, total in totals.items():
+            available = total['begin'] + total['received']
+            last_in_stock = total['last_in_stock']
+            trends[product_id] = {
+                'stockouts': total['stockouts'],
+                'stockouts_per_week': round(total['stockouts'] / window_days * 7, 2),
+                'units_sold': total['sold'],
+                'units_received': total['received'],
+                'sell_through_pct': round(total['sold'] / available * 100, 1) if available else 0,
+                'days_since_in_stock': (
+                    None if last_in_stock is None
+                    else round((latest - self.dates[last_in_stock]).total_seconds() / 86400, 1)
+                )
+            }
+        return trends
+
+
+def format_trend_table(trends: Dict[str, Dict[str, Any]], top: int) -> List[str]:
+    """Markdown table of the products with the fastest stockout velocity."""
+    lines = [
+        "| Product ID | Stockouts | Stockouts / Week | Units Sold | Units Received | Sell-Through % | Days Since In Stock |",
+        "|------------|-----------|------------------|------------|----------------|----------------|---------------------|"
+    ]
+    ranked = sorted(trends.items(), key=lambda item: (item[1]['stockouts_per_week'], item[1]['sell_through_pct']), reverse=True)
+    for product_id, trend in ranked[:top]:
+        days = '-' if trend['days_since_in_stock'] is None else trend['days_since_in_stock']
+        lines.append(
+            f"| {product_id} | {trend['stockouts']} | {trend['stockouts_per_week']} | {trend['units_sold']:,} | "
+            f"{trend['units_received']:,} | {trend['sell_through_pct']}% | {days} |"
+        )
+    return lines
+
+
+def main():
+    """Append exports to the history or print a trend report."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+
+    if command == 'append':
+        # Imported here so reports don't pay for the CSV reader imports
+        from export_cache import iter_cached_products
+        paths = [Path(arg) for arg in sys.argv[2:] if not arg.startswith('--')] or [PRODUCTS_CSV]
+        history = InventoryHistory.load(HISTORY_FILE)
+        for csv_path in paths:
+            if not csv_path.exists():
+                print(f"ERROR: Products CSV not found at {csv_path}")
+                sys.exit(1)
+            date = export_date(csv_path)
+            if history.dates and date <= history.dates[-1]:
+                print(f"⏭️  Skipping {csv_path.parent.name}: not newer than the last snapshot ({history.dates[-1]:%Y-%m-%d %H:%M})")
+                continue
+            counts = history.append(HISTORY_FILE, iter_cached_products(csv_path), date, csv_path.parent.name)
+            print(f"✅ {date:%Y-%m-%d %H:%M} {csv_path.parent.name}: {counts['variants']:,} variants, "
+                  f"{counts['new']:,} new, {counts['changed']:,} changed, {counts['missing']:,} missing")
+        print(f"History: {history.num_snapshots} snapshots, {len(history.keys):,} variants ({HISTORY_FILE})")
+        return
+
+    if command != 'report':
+        print(f"ERROR: Unknown command {command!r} (expected 'append' or 'report')")
+        sys.exit(1)
+
+    history = InventoryHistory.load(HISTORY_FILE)
+    if history.num_snapshots == 0:
+        print(f"ERROR: No history at {HISTORY_FILE}. Run 'inventory_history.py append <Products.csv ...>' first.")
+        sys.exit(1)
+
+    days = float(sys.argv[sys.argv.index('--days') + 1]) if '--days' in sys.argv else None
+    top = int(sys.argv[sys.argv.index('--top') + 1]) if '--top' in sys.argv else 20
+    trends = history.product_trends(days)
+    print(f"{history.num_snapshots} snapshots from {history.dates[0]:%Y-%m-%d} to {history.dates[-1]:%Y-%m-%d}, "
+          f"{len(history.keys):,} variants, {len(trends):,} products\n")
+
+    if '--product' in sys.argv:
+        product_id = sys.argv[sys.argv.index('--product') + 1]
+        if product_id not in trends:
+            print(f"ERROR: Product {product_id} not in history")
+            sys.exit(1)
+        trends = {product_id: trends[product_id]}
+    print('\n'.join(format_trend_table(trends, top)))
+
+
+if __name__ == '__main__':
+    main()
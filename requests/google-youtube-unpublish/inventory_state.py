@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Inventory Analysis State
+Persistent per-product state used by `analyze_inventory.py --incremental` to
+re-analyze only the products that changed between successive daily exports.
+
+State layout (JSON):
+    {
+      "version": 1,
+      "updated_at": "...",
+      "products": {
+        "<Product ID>": {
+          "hash": "<content hash of the product's projected rows>",
+          "variants": {"<Variant ID>": <inventory qty>, ...},
+          "record": {<per-product record from analyze_product_records()>}
+        }
+      }
+    }
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any
+
+from product_catalog import ProductGroup
+
+# Bump when the per-product record format or analysis logic changes so stale
+# state is discarded instead of reused
+STATE_VERSION = 1
+
+
+def new_state(products: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap per-product entries in a versioned state document."""
+    return {
+        'version': STATE_VERSION,
+        'updated_at': datetime.now().isoformat(),
+        'products': products
+    }
+
+
+def load_state(state_path: Path) -> Dict[str, Any]:
+    """Load saved state, or an empty state if missing or from another version."""
+    if not state_path.exists():
+        return new_state({})
+
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+
+    if state.get('version') != STATE_VERSION:
+        print(f"  ⚠️  Ignoring state file with version {state.get('version')} (expected {STATE_VERSION})")
+        return new_state({})
+
+    return state
+
+
+def save_state(state_path: Path, state: Dict[str, Any]) -> None:
+    """Write state atomically so an interrupted run never leaves a partial file."""
+    tmp_path = state_path.with_suffix(state_path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+    tmp_path.replace(state_path)
+
+
+def product_hash(product: ProductGroup) -> str:
+    """Content hash over a product's header row and all its variant rows."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(tuple(product.row)).encode('utf-8'))
+    for row in product.variants:
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def variant_quantities(product: ProductGroup) -> Dict[str, int]:
+    """Map Variant ID -> inventory qty for one product."""
+    return {row.variant_id: row.inventory_qty for row in product.variants}
+
+
+def count_variant_changes(old: Dict[str, int], new: Dict[str, int]) -> int:
+    """Count variants that were added, removed or changed quantity."""
+    changed = sum(1 for variant_id, qty in new.items() if old.get(variant_id) != qty)
+    return changed + sum(1 for variant_id in old if variant_id not in new)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Per-Location Inventory
+Builds a dense variant × location matrix for each inventory state from the
+Matrixify `Inventory <State>: <Location>` columns, in one pass over the export.
+
+The analyzers otherwise only read the aggregate `Variant Inventory Qty`.
+This model answers location-aware questions such as
+"which variants are in stock counting only the fulfillable warehouse, minus
+safety stock", and can feed that sellable quantity into the Google & YouTube
+exclusion decision (see `analyze_products.py --sellable`).
+
+Usage:
+    python3 location_inventory.py [--locations "Warehouse,Retail Store"]
+"""
+
+import csv
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from product_catalog import CatalogRow, make_row_projector
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Path to products CSV (pre-filtered to Active products only)
+PRODUCTS_CSV = Path(__file__).parent / "AD_ACTIVE-PRODUCTS_Export_2025-11-04_141820" / "Products.csv"
+
+# Inventory states exported per location ("Inventory <State>: <Location>");
+# the matching "... Adjust: <Location>" columns are import-only and ignored
+INVENTORY_STATES = [
+    'Available',
+    'On Hand',
+    'Committed',
+    'Reserved',
+    'Incoming',
+    'Safety Stock',
+    'Damaged',
+    'Quality Control',
+]
+COLUMN_PREFIX = 'Inventory '
+
+
+def parse_quantity(value: str) -> int:
+    """Parse a per-location quantity (may be negative). Empty or invalid is 0."""
+    value = value.strip()
+    if not value:
+        return 0
+    try:
+        return int(float(value))
+    except ValueError:
+        return 0
+
+
+def sellable(available_qty, safety_qty):
+    """Available minus Safety Stock, floored at 0: the quantity that can be sold at a location.
+
+    Takes per-location quantities as ints or as NumPy arrays (element-wise).
+    """
+    if np is not None and isinstance(available_qty, np.ndarray):
+        return np.maximum(available_qty - safety_qty, 0)
+    return max(0, available_qty - safety_qty)
+
+
+def parse_location_columns(header: List[str]) -> Dict[str, Dict[str, int]]:
+    """Map state -> {location: column index} for all per-location inventory columns."""
+    columns: Dict[str, Dict[str, int]] = {state: {} for state in INVENTORY_STATES}
+    for index, name in enumerate(header):
+        name = name.strip()
+        if not name.startswith(COLUMN_PREFIX) or ':' not in name:
+            continue
+        state, location = name[len(COLUMN_PREFIX):].split(':', 1)
+        state = state.strip()
+        if state in columns:
+            columns[state][location.strip()] = index
+    return columns
+
+
+class LocationInventory:
+    """Dense per-state variant × location quantity matrices (row-major)."""
+
+    def __init__(self, locations: List[str], states: List[str], use_numpy: Optional[bool] = None):
+        self.use_numpy = (np is not None) if use_numpy is None else (use_numpy and np is not None)
+        self.locations = locations
+        self.states = states
+        self.product_ids: List[str] = []
+        self.variant_ids: List[str] = []
+        self.matrices: Dict[str, array] = {state: array('q') for state in states}
+
+    @property
+    def num_variants(self) -> int:
+        return len(self.variant_ids)
+
+    def location_indices(self, locations: Optional[Sequence[str]] = None) -> List[int]:
+        """Column indices for the given locations (all locations if None)."""
+        if locations is None:
+            return list(range(len(self.locations)))
+        missing = [location for location in locations if location not in self.locations]
+        if missing:
+            raise ValueError(f"Unknown location(s): {', '.join(missing)}. Known: {', '.join(self.locations)}")
+        return [self.locations.index(location) for location in locations]
+
+    def matrix(self, state: str):
+        """Variant × location matrix for a state (NumPy array when available)."""
+        if state not in self.matrices:
+            raise ValueError(f"No 'Inventory {state}: <Location>' columns in the export")
+        data = self.matrices[state]
+        if self.use_numpy:
+            return np.frombuffer(data, dtype=np.int64).reshape(self.num_variants, len(self.locations))
+        return data
+
+    def quantities(self, state: str, locations: Optional[Sequence[str]] = None) -> List[int]:
+        """Per-variant quantity in a state, summed over the given locations."""
+        columns = self.location_indices(locations)
+        if self.use_numpy:
+            return self.matrix(state)[:, columns].sum(axis=1).tolist()
+
+        data = self.matrix(state)
+        width = len(self.locations)
+        return [sum(data[row * width + col] for col in columns) for row in range(self.num_variants)]
+
+    def sellable_qty(self, locations: Optional[Sequence[str]] = None) -> List[int]:
+        """Per-variant Available minus Safety Stock, floored at 0 per location, summed.
+
+        Raises ValueError if the export has no Available columns; a missing
+        Safety Stock state counts as no safety stock.
+        """
+        columns = self.location_indices(locations)
+        available = self.matrix('Available')
+        if 'Safety Stock' in self.matrices:
+            safety = self.matrix('Safety Stock')
+        else:
+            safety = np.zeros_like(available) if self.use_numpy else array('q', bytes(8 * len(available)))
+        if self.use_numpy:
+            return sellable(available[:, columns], safety[:, columns]).sum(axis=1).tolist()
+
+        width = len(self.locations)
+        result = []
+        for row in range(self.num_variants):
+            base = row * width
+            result.append(sum(sellable(available[base + col], safety[base + col]) for col in columns))
+        return result
+
+    def in_stock_counts(self, quantities: Sequence[int]) -> Dict[str, int]:
+        """Count variants with quantity > 0 per product ID."""
+        counts: Dict[str, int] = {}
+        for product_id, qty in zip(self.product_ids, quantities):
+            if not product_id:
+                continue
+            counts[product_id] = counts.get(product_id, 0) + (1 if qty > 0 else 0)
+        return counts
+
+
+def read_location_inventory(csv_path: Path, use_numpy: Optional[bool] = None) -> LocationInventory:
+    """Build a LocationInventory from a products CSV in one pass.
+
+    Variants are kept in file order (one entry per CSV row), so quantities line
+    up with rows from product_catalog.iter_catalog_rows().
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:  # utf-8-sig handles BOM
+        reader = csv.reader(f)
+        header = next(reader, [])
+        names = [name.strip() for name in header]
+        id_index = names.index('ID') if 'ID' in names else -1
+        variant_index = names.index('Variant ID') if 'Variant ID' in names else -1
+
+        columns = parse_location_columns(header)
+        locations = sorted({location for by_location in columns.values() for location in by_location})
+        states = [state for state in INVENTORY_STATES if columns[state]]
+        inventory = LocationInventory(locations, states, use_numpy)
+
+        # Per state, the column index for each location in matrix order (-1 if not exported)
+        layout = [
+            (inventory.matrices[state], [columns[state].get(location, -1) for location in locations])
+            for state in states
+        ]
+
+        for record in reader:
+            width = len(record)
+            inventory.product_ids.append(record[id_index].strip() if 0 <= id_index < width else '')
+            inventory.variant_ids.append(record[variant_index].strip() if 0 <= variant_index < width else '')
+            for matrix, indices in layout:
+                matrix.extend(parse_quantity(record[i]) if 0 <= i < width else 0 for i in indices)
+
+    return inventory
+
+
+def sellable_columns(header: List[str], locations: Optional[Sequence[str]] = None) -> List[Tuple[int, int]]:
+    """(Available, Safety Stock) column indices per location (-1 where Safety Stock is not exported).
+
+    Raises ValueError if the export has no Available columns or a requested
+    location is not in it, rather than treating every variant as out of stock.
+    """
+    columns = parse_location_columns(header)
+    available = columns['Available']
+    if not available:
+        raise ValueError("No 'Inventory Available: <Location>' columns in the export; "
+                         "sellable quantity needs a per-location inventory export")
+    if locations is None:
+        locations = sorted(available)
+    missing = [location for location in locations if location not in available]
+    if missing:
+        raise ValueError(f"Unknown location(s): {', '.join(missing)}. Known: {', '.join(sorted(available))}")
+    return [(available[location], columns['Safety Stock'].get(location, -1)) for location in locations]
+
+
+def iter_sellable_rows(csv_path: Path, locations: Optional[Sequence[str]] = None) -> Iterator[CatalogRow]:
+    """Stream CatalogRow tuples whose inventory_qty is the sellable quantity at `locations`.
+
+    The row projection and the per-location quantities come from the same
+    pass over the CSV. The header is checked before returning, so a missing
+    Available column or an unknown location raises ValueError up front.
+    """
+    f = open(csv_path, 'r', encoding='utf-8-sig', newline='')  # utf-8-sig handles BOM
+    reader = csv.reader(f)
+    header = next(reader, [])
+    try:
+        pairs = sellable_columns(header, locations)
+    except ValueError:
+        f.close()
+        raise
+    project = make_row_projector(header)
+
+    def rows() -> Iterator[CatalogRow]:
+        with f:
+            for record in reader:
+                width = len(record)
+                qty = 0
+                for available, safety in pairs:
+                    available_qty = parse_quantity(record[available]) if available < width else 0
+                    safety_qty = parse_quantity(record[safety]) if 0 <= safety < width else 0
+                    qty += sellable(available_qty, safety_qty)
+                yield project(record)._replace(inventory_qty=qty)
+
+    return rows()
+
+
+def main():
+    """Print a per-location inventory summary."""
+    if not PRODUCTS_CSV.exists():
+        print(f"ERROR: Products CSV not found at {PRODUCTS_CSV}")
+        return
+
+    locations = None
+    if '--locations' in sys.argv:
+        locations = [name.strip() for name in sys.argv[sys.argv.index('--locations') + 1].split(',')]
+
+    inventory = read_location_inventory(PRODUCTS_CSV)
+    print(f"Loaded {inventory.num_variants:,} variants across {len(inventory.locations)} locations")
+    if 'Available' not in inventory.states:
+        print("ERROR: No 'Inventory Available: <Location>' columns in the export")
+        sys.exit(1)
+
+    print(f"\n{'Location':<30} " + ' '.join(f"{state:>14}" for state in inventory.states) + f" {'Sellable':>10}")
+    for location in inventory.locations:
+        totals = [sum(inventory.quantities(state, [location])) for state in inventory.states]
+        sellable = sum(inventory.sellable_qty([location]))
+        print(f"{location:<30} " + ' '.join(f"{total:>14,}" for total in totals) + f" {sellable:>10,}")
+
+    try:
+        sellable = inventory.sellable_qty(locations)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    in_stock = inventory.in_stock_counts(sellable)
+    scope = ', '.join(locations) if locations else 'all locations'
+    print(f"\nSellable in-stock variants ({scope}, minus safety stock): "
+          f"{sum(1 for qty in sellable if qty > 0):,} of {inventory.num_variants:,}")
+    print(f"Products with no sellable variants: {sum(1 for count in in_stock.values() if count == 0):,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Merchant Center Supplemental Feed
+Renders the unpublish analysis as a Google Merchant Center supplemental feed
+that sets `excluded_destination` on every variant of each flagged product.
+Uploading (or scheduling a fetch of) one file replaces thousands of
+per-product publish/unpublish API calls.
+
+Item IDs follow the Shopify Google & YouTube channel format,
+`shopify_<COUNTRY>_<product id>_<variant id>`, one item per variant.
+
+Formats:
+    tsv - `id<TAB>excluded_destination`, destinations comma-separated
+    xml - RSS 2.0 with the `g:` namespace, one <g:excluded_destination> per destination
+
+Incremental regeneration (the previous feed is read from the output path):
+    - flagged items are written with the excluded destinations
+    - items excluded in the previous feed but no longer flagged are written
+      once more with an empty `excluded_destination`, which clears it
+    - items already cleared in the previous feed are dropped
+    - if nothing changed, the previous file is left untouched
+
+Usage:
+    python3 merchant_feed.py [--xml] [--country US] [--destinations Shopping_ads,Free_listings]
+                             [--analysis products_to_unpublish.json] [--out PATH]
+"""
+
+import csv
+import os
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+from streaming_output import analysis_file, iter_analysis_products
+
+ANALYSIS_JSON = Path(__file__).parent / "products_to_unpublish.json"
+OUTPUT_DIR = Path(__file__).parent
+OUTPUT_TSV = OUTPUT_DIR / "merchant_supplemental_feed.tsv"
+OUTPUT_XML = OUTPUT_DIR / "merchant_supplemental_feed.xml"
+
+DEFAULT_COUNTRY = 'US'
+# Destinations served by the Google & YouTube channel
+DEFAULT_DESTINATIONS = ['Shopping_ads', 'Free_listings', 'YouTube_shopping']
+
+FORMATS = ('tsv', 'xml')
+G_NAMESPACE = 'http://base.google.com/ns/1.0'
+
+
+def item_id(product_id: str, variant_id: str, country: str = DEFAULT_COUNTRY) -> str:
+    """Merchant Center item ID assigned by the Shopify Google & YouTube channel."""
+    return f"shopify_{country}_{product_id}_{variant_id}"
+
+
+def product_item_ids(product: Dict[str, Any], country: str = DEFAULT_COUNTRY) -> List[str]:
+    """Item IDs for every variant of an analyzed product (see analyze_products.analyze_product)."""
+    product_id = str(product['product_id'])
+    return [item_id(product_id, str(variant['variant_id']), country)
+            for variant in product.get('variants') or [] if variant.get('variant_id')]
+
+
+def feed_format(path: Path) -> str:
+    """Feed format from the output file extension."""
+    return 'xml' if path.suffix.lower() == '.xml' else 'tsv'
+
+
+def read_feed(path: Path) -> Dict[str, str]:
+    """Item ID -> excluded_destination value (comma-separated) of an existing feed; empty if absent."""
+    items: Dict[str, str] = {}
+    if not path.exists():
+        return items
+
+    if feed_format(path) == 'xml':
+        id_tag = f"{{{G_NAMESPACE}}}id"
+        destination_tag = f"{{{G_NAMESPACE}}}excluded_destination"
+        for _, element in ET.iterparse(path):
+            if element.tag != 'item':
+                continue
+            destinations = [child.text or '' for child in element.iter(destination_tag)]
+            items[element.findtext(id_tag, '')] = ','.join(value for value in destinations if value)
+            element.clear()
+        return items
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for record in csv.DictReader(f, delimiter='\t'):
+            items[record['id']] = record.get('excluded_destination') or ''
+    return items
+
+
+class FeedWriter:
+    """Streams feed items to a temporary file; close() swaps it in only if the feed changed."""
+
+    def __init__(self, path: Path, destinations: List[str], title: str = 'Google & YouTube exclusions'):
+        self.path = path
+        self.fmt = feed_format(path)
+        self.value = ','.join(destinations)
+        self.destinations = destinations
+        self.previous = read_feed(path)
+        self.written = set()
+        self.stats = {'items': 0, 'added': 0, 'kept': 0, 'cleared': 0, 'dropped': 0}
+        self._tmp_path = path.with_name(path.name + '.tmp')
+        self._file = open(self._tmp_path, 'w', encoding='utf-8', newline='')
+        if self.fmt == 'xml':
+            self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                             f'<rss version="2.0" xmlns:g="{G_NAMESPACE}">\n<channel>\n'
+                             f'<title>{escape(title)}</title>\n')
+        else:
+            self._file.write('id\texcluded_destination\n')
+
+    def _write_item(self, item: str, destinations: List[str]) -> None:
+        if self.fmt == 'xml':
+            values = ''.join(f'<g:excluded_destination>{escape(value)}</g:excluded_destination>'
+                             for value in destinations) or '<g:excluded_destination></g:excluded_destination>'
+            self._file.write(f'<item><g:id>{escape(item)}</g:id>{values}</item>\n')
+        else:
+            self._file.write(f"{item}\t{','.join(destinations)}\n")
+
+    def exclude(self, items: Iterable[str]) -> None:
+        """Write items excluded from the configured destinations."""
+        for item in items:
+            if item in self.written:
+                continue
+            self.written.add(item)
+            self._write_item(item, self.destinations)
+            self.stats['items'] += 1
+            if self.previous.get(item) == self.value:
+                self.stats['kept'] += 1
+            else:
+                self.stats['added'] += 1
+
+    def close(self) -> bool:
+        """Clear exclusions for items no longer flagged and finish the feed. Returns True if the file changed."""
+        for item, value in self.previous.items():
+            if item in self.written:
+                continue
+            if value:
+                self._write_item(item, [])
+                self.stats['cleared'] += 1
+            else:
+                self.stats['dropped'] += 1
+        if self.fmt == 'xml':
+            self._file.write('</channel>\n</rss>\n')
+        self._file.close()
+
+        stats = self.stats
+        changed = bool(stats['added'] or stats['cleared'] or stats['dropped']) or not self.path.exists()
+        if changed:
+            os.replace(self._tmp_path, self.path)
+        else:
+            self._tmp_path.unlink()
+        return changed
+
+    def __enter__(self) -> 'FeedWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.abort()
+
+    def abort(self) -> None:
+        """Discard an unfinished feed; the previous feed at the path stays in place."""
+        if not self._file.closed:
+            self._file.close()
+            self._tmp_path.unlink()
+
+
+def write_feed(products: Iterable[Dict[str, Any]], path: Path, destinations: List[str],
+               country: str = DEFAULT_COUNTRY) -> Dict[str, Any]:
+    """Write the supplemental feed for analyzed products. Returns the writer stats plus 'changed'."""
+    with FeedWriter(path, destinations) as writer:
+        for product in products:
+            writer.exclude(product_item_ids(product, country))
+        changed = writer.close()
+    return {**writer.stats, 'changed': changed}
+
+
+def feed_options(argv: List[str]) -> Dict[str, Any]:
+    """Output path, country and destinations from --xml / --out / --country / --destinations."""
+    path = OUTPUT_XML if '--xml' in argv else OUTPUT_TSV
+    if '--out' in argv:
+        path = Path(argv[argv.index('--out') + 1])
+    destinations = DEFAULT_DESTINATIONS
+    if '--destinations' in argv:
+        destinations = [value.strip() for value in argv[argv.index('--destinations') + 1].split(',') if value.strip()]
+    country = argv[argv.index('--country') + 1].upper() if '--country' in argv else DEFAULT_COUNTRY
+    return {'path': path, 'destinations': destinations, 'country': country}
+
+
+def format_feed_stats(stats: Dict[str, Any]) -> str:
+    return (f"{stats['items']:,} excluded items ({stats['added']:,} new, {stats['kept']:,} unchanged), "
+            f"{stats['cleared']:,} cleared, {stats['dropped']:,} dropped")
+
+
+def main():
+    """Main execution function."""
+    analysis_path = analysis_file(sys.argv, ANALYSIS_JSON)
+    if not analysis_path.exists():
+        print(f"ERROR: Analysis file not found: {analysis_path}")
+        print("Run analyze_products.py first to generate the analysis.")
+        sys.exit(1)
+
+    options = feed_options(sys.argv)
+    print(f"Building supplemental feed from {analysis_path.name} "
+          f"(excluded from {', '.join(options['destinations'])})...")
+    stats = write_feed(iter_analysis_products(analysis_path, 'products_to_unpublish'),
+                       options['path'], options['destinations'], options['country'])
+
+    print(f"   {format_feed_stats(stats)}")
+    if stats['changed']:
+        print(f"\n✅ Feed written: {options['path']}")
+    else:
+        print(f"\n⏭️  Feed unchanged: {options['path']}")
+
+
+if __name__ == '__main__':
+    main()
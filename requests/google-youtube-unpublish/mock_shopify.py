@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Offline Shopify Admin API Stand-in
+A local HTTP server that serves a seeded, in-memory catalog through the
+endpoints the unpublish scripts use, so the sync can be exercised without a
+store or an access token.
+
+Endpoints:
+    GET    /admin/api/<version>/publications.json
+    GET    /admin/api/<version>/publications/<id>/product_publications.json?product_id= | ?limit=&page_info=
+    POST   /admin/api/<version>/publications/<id>/product_publications.json
+    DELETE /admin/api/<version>/publications/<id>/product_publications/<id>.json
+    POST   /admin/api/<version>/graphql.json   (bulkOperationRunQuery, currentBulkOperation,
+                                                aliased publishablePublish / publishableUnpublish)
+    GET    /bulk/<n>.jsonl                     (bulk operation results, streamed)
+
+Bulk operations stay RUNNING for --bulk-delay seconds and then complete with
+canned JSONL results built from the catalog.
+
+Rate limits are enforced like Shopify's: REST calls fill a leaky bucket
+(--rest-limit SIZE/RATE, default 40/2) reported in X-Shopify-Shop-Api-Call-Limit
+and rejected with 429 + Retry-After when it is full; GraphQL requests are
+charged cost points and answered THROTTLED when the points are not available.
+Publication mutations cost 10 points each, and a document costing more than
+1000 is rejected with MAX_COST_EXCEEDED.
+
+Usage:
+    python3 mock_shopify.py serve [--port 8765] [--products 5000] [--seed 1] [--bulk-delay 1]
+                                  [--rest-limit 40/2] [--latency 0.05]
+
+Point the scripts at it with SHOPIFY_STORE=http://127.0.0.1:8765 and any
+SHOPIFY_ACCESS_TOKEN. The client checks in test_mock_shopify.py start one
+with start_server().
+"""
+
+import base64
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# The GraphQL cost bucket and single-query limit come from the client, so the two cannot drift apart
+from publication_mutations import GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE, MAX_QUERY_COST
+
+# Shopify's standard plan limits: REST calls (bucket size, leak per second), GraphQL cost points
+REST_BUCKET_SIZE = 40
+REST_LEAK_RATE = 2.0
+BULK_RUN_COST = 10
+PUBLISHABLE_MUTATION_COST = 10
+
+GOOGLE_PUBLICATION_ID = 300000000001
+ONLINE_STORE_PUBLICATION_ID = 300000000002
+FIRST_PRODUCT_ID = 8000000000000
+
+ADMIN_PATH = re.compile(r'^/admin/api/[^/]+/(.+)$')
+PRODUCT_PUBLICATIONS_PATH = re.compile(r'^publications/(\d+)/product_publications(?:/(\d+))?\.json$')
+BULK_RESULT_PATH = re.compile(r'^/bulk/(\d+)\.jsonl$')
+PUBLISHED_ON_PATTERN = re.compile(r'publishedOnPublication\(publicationId:\s*"([^"]+)"\)')
+PUBLISHABLE_PATTERN = re.compile(r'(\w+):\s*(publishablePublish|publishableUnpublish)\(id:\s*"gid://shopify/Product/(\d+)",\s*'
+                                 r'input:\s*\[\{publicationId:\s*"gid://shopify/Publication/(\d+)"\}\]\)')
+
+
+def encode_page_info(after: int) -> str:
+    return base64.urlsafe_b64encode(f"after:{after}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_page_info(page_info: str) -> int:
+    padded = page_info + '=' * (-len(page_info) % 4)
+    return int(base64.urlsafe_b64decode(padded).decode('ascii').split(':', 1)[1])
+
+
+def product_publication(publication_id: int, product_id: int, row_id: int) -> Dict[str, int]:
+    return {'id': row_id, 'publication_id': publication_id, 'product_id': product_id}
+
+
+class LeakyBucket:
+    """Server-side Shopify rate limit: requests fill the bucket, which drains at a fixed rate."""
+
+    def __init__(self, capacity: float, leak_rate: float):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+
+    def drain(self) -> None:
+        now = time.monotonic()
+        self.level = max(self.level - (now - self.updated) * self.leak_rate, 0.0)
+        self.updated = now
+
+    def take(self, cost: float) -> bool:
+        """Add a request's cost if it fits; False means the request is throttled."""
+        self.drain()
+        if self.level + cost > self.capacity:
+            return False
+        self.level += cost
+        return True
+
+    def available(self) -> float:
+        self.drain()
+        return self.capacity - self.level
+
+
+class MockShop:
+    """Seeded catalog state: products, the exclude metafield and publication membership.
+
+    REST calls go through a 40-call bucket leaking 2/s and GraphQL through a
+    1000-point bucket restoring 50/s (Shopify's standard limits) unless
+    other limits are given; `latency` adds a fixed delay to every request.
+    """
+
+    def __init__(self, num_products: int = 5000, seed: int = 1, bulk_delay: float = 0.0,
+                 rest_limit: Tuple[float, float] = (REST_BUCKET_SIZE, REST_LEAK_RATE),
+                 graphql_limit: Tuple[float, float] = (GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE),
+                 latency: float = 0.0):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.bulk_delay = bulk_delay
+        self.rest_bucket = LeakyBucket(*rest_limit)
+        self.graphql_bucket = LeakyBucket(*graphql_limit)
+        self.latency = latency
+        self.products: Dict[int, Dict[str, Any]] = {}
+        # Publication ID -> {product ID: product_publication ID}
+        self.publications: Dict[int, Dict[int, int]] = {GOOGLE_PUBLICATION_ID: {}, ONLINE_STORE_PUBLICATION_ID: {}}
+        # product_publication ID -> (publication ID, product ID)
+        self.publication_rows: Dict[int, Tuple[int, int]] = {}
+        self.next_publication_row = 1
+        self.bulk_operations: List[Dict[str, Any]] = []
+        self.request_counts = Counter()
+        self.mutation_cost = PUBLISHABLE_MUTATION_COST
+        # Products whose publication mutations answer with a userError
+        self.failing_products: set = set()
+
+        for i in range(num_products):
+            product_id = FIRST_PRODUCT_ID + i
+            roll = rng.random()
+            self.products[product_id] = {
+                'handle': f"prod-{i}",
+                'title': f"Product {i}",
+                'status': 'ACTIVE' if rng.random() < 0.9 else 'DRAFT',
+                # Flow sets the flag on most products; the rest have never been evaluated
+                'exclude': 'true' if roll < 0.3 else 'false' if roll < 0.75 else None
+            }
+            self.add_publication(ONLINE_STORE_PUBLICATION_ID, product_id)
+            if rng.random() < 0.6:
+                self.add_publication(GOOGLE_PUBLICATION_ID, product_id)
+
+    def add_publication(self, publication_id: int, product_id: int) -> int:
+        """Publish a product; returns its product_publication ID (existing one if already published)."""
+        members = self.publications[publication_id]
+        if product_id not in members:
+            members[product_id] = self.next_publication_row
+            self.publication_rows[self.next_publication_row] = (publication_id, product_id)
+            self.next_publication_row += 1
+        return members[product_id]
+
+    def remove_publication(self, row_id: int) -> bool:
+        """Unpublish by product_publication ID; False if there is no such row."""
+        if row_id not in self.publication_rows:
+            return False
+        publication_id, product_id = self.publication_rows.pop(row_id)
+        del self.publications[publication_id][product_id]
+        return True
+
+    def change_publication(self, field: str, product_id: int, publication_id: int) -> List[Dict[str, Any]]:
+        """Apply one publishablePublish / publishableUnpublish; returns its userErrors."""
+        if product_id not in self.products:
+            return [{'field': ['id'], 'message': f"Product {product_id} does not exist"}]
+        if publication_id not in self.publications:
+            return [{'field': ['input', '0', 'publicationId'], 'message': 'Publication does not exist'}]
+        if product_id in self.failing_products:
+            return [{'field': ['id'], 'message': 'Product cannot be published to this channel'}]
+        if field == 'publishablePublish':
+            self.add_publication(publication_id, product_id)
+        elif product_id in self.publications[publication_id]:
+            self.remove_publication(self.publications[publication_id][product_id])
+        return []
+
+    def throttle_status(self) -> Dict[str, Any]:
+        bucket = self.graphql_bucket
+        return {
+            'maximumAvailable': bucket.capacity,
+            'currentlyAvailable': int(bucket.available()),
+            'restoreRate': bucket.leak_rate
+        }
+
+    def is_published(self, publication_id: int, product_id: int) -> bool:
+        return product_id in self.publications.get(publication_id, {})
+
+    def start_bulk_operation(self, query: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Start a bulk query; returns (operation, userErrors)."""
+        current = self.current_bulk_operation()
+        if current is not None and current['status'] == 'RUNNING':
+            return None, [{'field': None, 'message':
+                           f"A bulk query operation for this app and shop is already in progress: {current['id']}."}]
+        published_on = PUBLISHED_ON_PATTERN.search(query)
+        operation = {
+            'number': len(self.bulk_operations) + 1,
+            'started': time.monotonic(),
+            'publication_id': int(published_on.group(1).rsplit('/', 1)[-1]) if published_on else None
+        }
+        self.bulk_operations.append(operation)
+        return self.bulk_operation_status(operation), []
+
+    def current_bulk_operation(self) -> Optional[Dict[str, Any]]:
+        if not self.bulk_operations:
+            return None
+        return self.bulk_operation_status(self.bulk_operations[-1])
+
+    def bulk_operation_status(self, operation: Dict[str, Any]) -> Dict[str, Any]:
+        done = time.monotonic() - operation['started'] >= self.bulk_delay
+        return {
+            'id': f"gid://shopify/BulkOperation/{operation['number']}",
+            'status': 'COMPLETED' if done else 'RUNNING',
+            'errorCode': None,
+            'objectCount': str(len(self.products)) if done else '0',
+            'url': f"/bulk/{operation['number']}.jsonl" if done and self.products else None,
+            'partialDataUrl': None
+        }
+
+    def bulk_result_line(self, product_id: int, publication_id: Optional[int]) -> str:
+        product = self.products[product_id]
+        record = {
+            'id': f"gid://shopify/Product/{product_id}",
+            'handle': product['handle'],
+            'title': product['title'],
+            'status': product['status'],
+            'metafield': {'value': product['exclude']} if product['exclude'] is not None else None
+        }
+        if publication_id is not None:
+            record['publishedOnPublication'] = self.is_published(publication_id, product_id)
+        return json.dumps(record) + '\n'
+
+
+class MockShopifyHandler(BaseHTTPRequestHandler):
+    """Routes Admin API requests to the server's MockShop."""
+
+    protocol_version = 'HTTP/1.1'
+    call_limit: Optional[str] = None
+
+    @property
+    def shop(self) -> MockShop:
+        return self.server.shop
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Keep the console quiet
+
+    def send_json(self, payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.call_limit:
+            self.send_header('X-Shopify-Shop-Api-Call-Limit', self.call_limit)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def admin_route(self) -> Optional[str]:
+        """Admin API path below the version.
+
+        Returns None, after responding, if the request is not authorized or
+        (REST only) the call limit bucket is full.
+        """
+        self.call_limit = None
+        if self.shop.latency:
+            time.sleep(self.shop.latency)
+        match = ADMIN_PATH.match(urlparse(self.path).path)
+        if match is None:
+            self.send_json({'errors': 'Not Found'}, 404)
+            return None
+        if not self.headers.get('X-Shopify-Access-Token'):
+            self.send_json({'errors': '[API] Invalid API key or access token (unrecognized login or wrong password)'}, 401)
+            return None
+        route = match.group(1)
+        if route == 'graphql.json':
+            return route
+
+        shop = self.shop
+        with shop.lock:
+            allowed = shop.rest_bucket.take(1)
+            bucket = shop.rest_bucket
+            self.call_limit = f"{int(math.ceil(bucket.level))}/{int(bucket.capacity)}"
+            if not allowed:
+                shop.request_counts['429 Too Many Requests'] += 1
+        if not allowed:
+            self.send_json({'errors': 'Exceeded 2 calls per second for api client. Reduce request rates to resume uninterrupted service.'},
+                           429, {'Retry-After': f"{1 / bucket.leak_rate:.1f}"})
+            return None
+        return route
+
+    def send_graphql(self, data: Optional[Dict[str, Any]], cost: float, errors: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Respond to a GraphQL request, charging `cost` points (THROTTLED, without data, if they are not available)."""
+        shop = self.shop
+        bucket = shop.graphql_bucket
+        if not bucket.take(cost):
+            shop.request_counts['GraphQL THROTTLED'] += 1
+            data, errors = None, [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}]
+            cost_info = {'requestedQueryCost': cost, 'actualQueryCost': None}
+        else:
+            cost_info = {'requestedQueryCost': cost, 'actualQueryCost': cost}
+        body = {'extensions': {'cost': {**cost_info, 'throttleStatus': shop.throttle_status()}}}
+        if data is not None:
+            body['data'] = data
+        if errors:
+            body['errors'] = errors
+        self.send_json(body)
+
+    def do_GET(self) -> None:
+        bulk = BULK_RESULT_PATH.match(urlparse(self.path).path)
+        if bulk:
+            self.stream_bulk_result(int(bulk.group(1)))
+            return
+
+        route = self.admin_route()
+        if route is None:
+            return
+        shop = self.shop
+        with shop.lock:
+            shop.request_counts['GET ' + re.sub(r'\d+', '{id}', route)] += 1
+            if route == 'publications.json':
+                self.send_json({'publications': [
+                    {'id': ONLINE_STORE_PUBLICATION_ID, 'name': 'Online Store'},
+                    {'id': GOOGLE_PUBLICATION_ID, 'name': 'Google & YouTube'}
+                ]})
+                return
+            match = PRODUCT_PUBLICATIONS_PATH.match(route)
+            if match and match.group(2) is None:
+                publication_id = int(match.group(1))
+                query = parse_qs(urlparse(self.path).query)
+                members = shop.publications.get(publication_id, {})
+                if 'product_id' in query:
+                    product_id = int(query['product_id'][0])
+                    rows = [product_publication(publication_id, product_id, members[product_id])] \
+                        if product_id in members else []
+                    self.send_json({'product_publications': rows})
+                    return
+
+                # Cursor pagination ordered by product_publication ID, like the real endpoint
+                limit = min(int(query.get('limit', ['50'])[0]), 250)
+                after = decode_page_info(query['page_info'][0]) if 'page_info' in query else 0
+                page = sorted((row_id, member_id) for member_id, row_id in members.items() if row_id > after)
+                rows = [product_publication(publication_id, member_id, row_id) for row_id, member_id in page[:limit]]
+                headers = {}
+                if len(page) > limit:
+                    next_url = f"http://{self.headers['Host']}{urlparse(self.path).path}" \
+                               f"?limit={limit}&page_info={encode_page_info(page[limit - 1][0])}"
+                    headers['Link'] = f'<{next_url}>; rel="next"'
+                self.send_json({'product_publications': rows}, headers=headers)
+                return
+        self.send_json({'errors': 'Not Found'}, 404)
+
+    def do_POST(self) -> None:
+        route = self.admin_route()
+        if route is None:
+            return
+        payload = self.read_json()
+        shop = self.shop
+        with shop.lock:
+            if route == 'graphql.json':
+                query = payload.get('query', '')
+                shop.request_counts['POST graphql.json'] += 1
+                if 'bulkOperationRunQuery' in query:
+                    if shop.graphql_bucket.available() < BULK_RUN_COST:
+                        self.send_graphql(None, BULK_RUN_COST)
+                        return
+                    operation, errors = shop.start_bulk_operation(payload.get('variables', {}).get('query', ''))
+                    self.send_graphql({'bulkOperationRunQuery': {
+                        'bulkOperation': operation and {'id': operation['id'], 'status': operation['status']},
+                        'userErrors': errors
+                    }}, BULK_RUN_COST)
+                elif 'currentBulkOperation' in query:
+                    operation = shop.current_bulk_operation()
+                    if operation and operation['url']:
+                        operation = {**operation, 'url': f"http://{self.headers['Host']}{operation['url']}"}
+                    self.send_graphql({'currentBulkOperation': operation}, 1)
+                elif PUBLISHABLE_PATTERN.search(query):
+                    mutations = PUBLISHABLE_PATTERN.findall(query)
+                    cost = shop.mutation_cost * len(mutations)
+                    shop.request_counts['GraphQL publication mutations'] += 1
+                    if cost > MAX_QUERY_COST:
+                        shop.request_counts['GraphQL MAX_COST_EXCEEDED'] += 1
+                        self.send_json({'errors': [{
+                            'message': f"Query cost is {cost}, which exceeds the single query max cost limit ({MAX_QUERY_COST}).",
+                            'extensions': {'code': 'MAX_COST_EXCEEDED', 'cost': cost, 'maxCost': MAX_QUERY_COST}
+                        }], 'extensions': {'cost': {'requestedQueryCost': cost, 'actualQueryCost': None,
+                                                    'throttleStatus': shop.throttle_status()}}})
+                        return
+                    if shop.graphql_bucket.available() < cost:
+                        self.send_graphql(None, cost)
+                        return
+                    self.send_graphql({alias: {'userErrors': shop.change_publication(field, int(product_id), int(publication_id))}
+                                       for alias, field, product_id, publication_id in mutations}, cost)
+                else:
+                    self.send_json({'errors': [{'message': 'Unsupported query for the mock server'}]})
+                return
+
+            shop.request_counts['POST ' + re.sub(r'\d+', '{id}', route)] += 1
+            match = PRODUCT_PUBLICATIONS_PATH.match(route)
+            if match and match.group(2) is None and int(match.group(1)) in shop.publications:
+                publication_id = int(match.group(1))
+                product_id = int(payload.get('product_publication', {}).get('product_id') or 0)
+                if product_id not in shop.products:
+                    self.send_json({'errors': {'product_id': ['not found']}}, 422)
+                    return
+                row_id = shop.add_publication(publication_id, product_id)
+                self.send_json({'product_publication': product_publication(publication_id, product_id, row_id)}, 201)
+                return
+        self.send_json({'errors': 'Not Found'}, 404)
+
+    def do_DELETE(self) -> None:
+        route = self.admin_route()
+        if route is None:
+            return
+        shop = self.shop
+        with shop.lock:
+            shop.request_counts['DELETE ' + re.sub(r'\d+', '{id}', route)] += 1
+            match = PRODUCT_PUBLICATIONS_PATH.match(route)
+            if match and match.group(2) is not None and shop.remove_publication(int(match.group(2))):
+                self.send_json({})
+                return
+        self.send_json({'errors': 'Not Found'}, 404)
+
+    def stream_bulk_result(self, number: int) -> None:
+        """Send a bulk result as chunked JSONL, generated while it is written."""
+        shop = self.shop
+        with shop.lock:
+            shop.request_counts['GET bulk result'] += 1
+            if number < 1 or number > len(shop.bulk_operations):
+                self.send_json({'errors': 'Not Found'}, 404)
+                return
+            publication_id = shop.bulk_operations[number - 1]['publication_id']
+            lines = [shop.bulk_result_line(product_id, publication_id) for product_id in shop.products]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/jsonl')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(lines), 500):
+            chunk = ''.join(lines[start:start + 500]).encode('utf-8')
+            self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def start_server(shop: MockShop, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve a shop from a background thread. Returns (server, base URL); call server.shutdown() when done."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockShopifyHandler)
+    server.daemon_threads = True
+    server.shop = shop
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    """Main execution function."""
+    if len(sys.argv) < 2 or sys.argv[1] != 'serve':
+        print(__doc__)
+        sys.exit(1)
+
+    num_products = int(sys.argv[sys.argv.index('--products') + 1]) if '--products' in sys.argv else 5000
+    seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else 1
+
+    port = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 8765
+    bulk_delay = float(sys.argv[sys.argv.index('--bulk-delay') + 1]) if '--bulk-delay' in sys.argv else 1.0
+    latency = float(sys.argv[sys.argv.index('--latency') + 1]) if '--latency' in sys.argv else 0.0
+    rest_limit = (REST_BUCKET_SIZE, REST_LEAK_RATE)
+    if '--rest-limit' in sys.argv:
+        size, rate = sys.argv[sys.argv.index('--rest-limit') + 1].split('/')
+        rest_limit = (float(size), float(rate))
+    shop = MockShop(num_products, seed, bulk_delay, rest_limit, latency=latency)
+    server, base_url = start_server(shop, port)
+    print(f"Mock shop with {num_products:,} products at {base_url} "
+          f"(Google & YouTube publication {GOOGLE_PUBLICATION_ID}, REST limit {rest_limit[0]:.0f} calls at {rest_limit[1]:g}/s)")
+    print(f"   export SHOPIFY_STORE={base_url} SHOPIFY_ACCESS_TOKEN=test")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
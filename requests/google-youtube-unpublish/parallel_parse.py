@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Parallel Products.csv Parsing
+Splits a Matrixify export into byte ranges aligned to product boundaries and
+parses them in a process pool.
+
+Shard boundaries always fall on a record start (quote-aware, so multi-line
+`Body HTML` values are never split) where the `ID` column changes, so every
+product is parsed entirely by one worker. Shard results are yielded back in
+file order, which keeps the output identical to the serial reader.
+
+Workers send each shard back column by column: the row builder shares
+repeated strings, so each distinct value is pickled once per shard, and the
+parent only zips the columns back into CatalogRow tuples. At most
+IN_FLIGHT_PER_WORKER shards per worker are pending at a time, so a slow
+consumer holds a few shards in memory rather than the whole export.
+"""
+
+import csv
+import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from product_catalog import CatalogRow, iter_catalog_rows, make_row_projector
+
+BOM = b'\xef\xbb\xbf'
+QUOTE = b'"'
+NEWLINE = b'\n'
+
+# Below this size the pool start-up costs more than parsing serially
+MIN_PARALLEL_BYTES = 4 * 1024 * 1024
+# Shards per worker submitted ahead of the consumer
+IN_FLIGHT_PER_WORKER = 2
+
+
+def record_end(mm: mmap.mmap, start: int) -> int:
+    """Offset just past the CSV record starting at `start` (quote-aware)."""
+    pos = start
+    in_quotes = False
+    size = len(mm)
+    while pos < size:
+        newline = mm.find(NEWLINE, pos)
+        if newline == -1:
+            return size
+        if mm[pos:newline].count(QUOTE) % 2:
+            in_quotes = not in_quotes
+        pos = newline + 1
+        if not in_quotes:
+            return pos
+    return size
+
+
+def parse_record(mm: mmap.mmap, start: int, end: int) -> List[str]:
+    """Parse the single CSV record stored at mm[start:end]."""
+    text = mm[start:end].decode('utf-8')
+    return next(csv.reader(io.StringIO(text, newline='')), [])
+
+
+def read_header(mm: mmap.mmap) -> Tuple[List[str], int]:
+    """Return the header fields and the offset of the first data record."""
+    start = len(BOM) if mm[:len(BOM)] == BOM else 0
+    end = record_end(mm, start)
+    return parse_record(mm, start, end), end
+
+
+def find_shard_offsets(mm: mmap.mmap, data_start: int, id_index: int, shards: int) -> List[int]:
+    """Split mm[data_start:] into up to `shards` ranges aligned to product boundaries.
+
+    Returns sorted offsets [data_start, ..., len(mm)].
+    """
+    size = len(mm)
+    offsets = [data_start]
+    # Quote parity is tracked from the last known record start, so the scan
+    # between targets is a single bytes.count() per newline.
+    for k in range(1, shards):
+        target = data_start + (size - data_start) * k // shards
+        if target <= offsets[-1]:
+            continue
+
+        pos = offsets[-1]
+        in_quotes = mm[pos:target].count(QUOTE) % 2 == 1
+        while target < size:
+            newline = mm.find(NEWLINE, target)
+            if newline == -1:
+                target = size
+                break
+            if mm[target:newline].count(QUOTE) % 2:
+                in_quotes = not in_quotes
+            target = newline + 1
+            if not in_quotes:
+                break
+        if target >= size:
+            break
+
+        # Advance record by record until the product ID changes
+        end = record_end(mm, target)
+        first = parse_record(mm, target, end)
+        product_id = first[id_index].strip() if id_index < len(first) else ''
+        start = end
+        while start < size:
+            end = record_end(mm, start)
+            record = parse_record(mm, start, end)
+            if (record[id_index].strip() if id_index < len(record) else '') != product_id:
+                break
+            start = end
+        if start >= size:
+            break
+        offsets.append(start)
+
+    offsets.append(size)
+    return offsets
+
+
+def parse_shard(args: Tuple[str, int, int, List[str]]) -> List[Sequence]:
+    """Worker: parse and project the records in one byte range. Returns one sequence per CatalogRow field."""
+    csv_path, start, end, header = args
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    project = make_row_projector(header)
+    rows = [project(record) for record in csv.reader(io.StringIO(text, newline=''))]
+    return list(zip(*rows))
+
+
+def plan_shards(csv_path: Path, workers: int) -> Tuple[List[str], List[int]]:
+    """Read the header and compute product-aligned shard offsets."""
+    with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header, data_start = read_header(mm)
+        names = [name.strip() for name in header]
+        id_index = names.index('ID') if 'ID' in names else 0
+        # A few shards per worker keeps the pool busy when products vary in size
+        return header, find_shard_offsets(mm, data_start, id_index, workers * 4)
+
+
+def iter_catalog_rows_parallel(csv_path: Path, workers: Optional[int] = None) -> Iterator[CatalogRow]:
+    """Stream CatalogRow tuples parsed by a process pool, in file order.
+
+    Workers beyond the CPU count only add transfer overhead, so they are capped
+    at os.cpu_count(); with a single CPU the file is parsed serially.
+    """
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus)
+    if workers <= 1 or csv_path.stat().st_size < MIN_PARALLEL_BYTES:
+        yield from iter_catalog_rows(csv_path)
+        return
+
+    header, offsets = plan_shards(csv_path, workers)
+    tasks = [(str(csv_path), start, end, header) for start, end in zip(offsets, offsets[1:])]
+    window = workers * IN_FLIGHT_PER_WORKER
+    make = CatalogRow._make
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_shard, task))
+            if len(pending) == window:
+                yield from map(make, zip(*pending.popleft().result()))
+        while pending:
+            yield from map(make, zip(*pending.popleft().result()))
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Unified Catalog Pipeline
+Parses a Products.csv export once and feeds every grouped product to a set of
+analysis stages, which then write all their artifacts in the same run.
+
+Stages share the product model from product_catalog (ProductGroup of
+CatalogRow tuples). Each stage receives products one at a time in export order
+via add_product() and writes its outputs in finish(), so adding an analysis
+means adding a Stage subclass and registering it in STAGES. Stages open their
+output files on first use, so building a pipeline leaves existing outputs
+alone, and a failed run abort()s every stage.
+
+Stages:
+    inventory - OOS pattern analysis (analyze_inventory.py outputs)
+    unpublish - Google & YouTube unpublish candidates (analyze_products.py outputs)
+    cube      - style × size stockout cube (stockout_cube.bin)
+    sweep     - unpublish threshold sweep (threshold_sweep.csv)
+    feed      - Merchant Center supplemental feed (merchant_feed.py; --xml, --country, --destinations)
+    pricing   - price dispersion, markdown depth and revenue at risk (pricing.py; --threshold)
+
+Usage:
+    python3 pipeline.py [--stages inventory,unpublish,cube] [--csv PATH | --export-dir DIR]
+                        [--no-cache] [--workers N] [--ndjson | --compact] [--report-top N]
+                        [--sellable [--locations "Warehouse"]]
+"""
+
+import sys
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import analyze_inventory
+import analyze_products
+import merchant_feed
+import pricing
+from export_chunks import export_dir_from_argv, iter_export_rows
+from location_inventory import iter_sellable_rows
+from product_catalog import ProductGroup, group_products
+from stockout_cube import StockoutCube
+from streaming_output import DEFAULT_REPORT_TOP, AnalysisJsonWriter, output_format, report_top
+from threshold_sweep import evaluate_rules, format_sweep_table, histogram_key, rules_from_argv, write_sweep_csv
+
+# The full export is a superset of the Active-only one; the inventory stage skips inactive products itself
+PRODUCTS_CSV = analyze_products.PRODUCTS_CSV
+
+DEFAULT_STAGES = ['inventory', 'unpublish', 'cube']
+
+
+class Stage(ABC):
+    """One analysis fed by the pipeline. Subclasses implement add_product() and finish()."""
+
+    name = ''
+
+    @abstractmethod
+    def add_product(self, product: ProductGroup) -> None:
+        """Consume one grouped product (called in export order)."""
+
+    @abstractmethod
+    def finish(self) -> List[Path]:
+        """Write this stage's outputs and return their paths."""
+
+    def abort(self) -> None:
+        """Discard partial outputs after a failed run (previous outputs stay in place)."""
+
+
+class InventoryStage(Stage):
+    """OOS pattern analysis; writes the analyze_inventory.py JSON, CSV and report."""
+
+    name = 'inventory'
+
+    def __init__(self, fmt: str = 'pretty', report_size: int = DEFAULT_REPORT_TOP):
+        self.fmt = fmt
+        self.report_size = report_size
+        self.builder = analyze_inventory.InventoryRecordBuilder()
+
+    def add_product(self, product: ProductGroup) -> None:
+        self.builder.add_product(product)
+
+    def finish(self) -> List[Path]:
+        analysis = analyze_inventory.summarize_inventory(self.builder.records())
+        stats = analysis['stats']
+        print(f"  [inventory] {stats['products_active']:,} active products, "
+              f"{stats['products_with_oos_variants']:,} with OOS variants")
+        analyze_inventory.generate_json_output(analysis, self.fmt)
+        analyze_inventory.generate_csv_output(analysis)
+        analyze_inventory.generate_report(analysis, self.report_size)
+        return [
+            analyze_inventory.json_output_path(self.fmt),
+            analyze_inventory.OUTPUT_CSV,
+            analyze_inventory.OUTPUT_REPORT
+        ]
+
+
+class UnpublishStage(Stage):
+    """Products with ≤5 in-stock variants; writes the analyze_products.py JSON, CSV and report."""
+
+    name = 'unpublish'
+
+    def __init__(self, fmt: str = 'pretty', report_size: int = DEFAULT_REPORT_TOP):
+        self.fmt = fmt
+        self.report_size = report_size
+        self.stats = analyze_products.new_product_stats()
+        self.products_to_unpublish = []
+        # Flagged products are streamed to the JSON output as they are found
+        self.writer: Optional[AnalysisJsonWriter] = None
+
+    def open_writer(self) -> AnalysisJsonWriter:
+        if self.writer is None:
+            self.writer = AnalysisJsonWriter(analyze_products.json_output_path(self.fmt), 'products_to_unpublish', self.fmt)
+        return self.writer
+
+    def add_product(self, product: ProductGroup) -> None:
+        product_info = analyze_products.analyze_product(product, self.stats)
+        if product_info is None:
+            return
+        self.open_writer().write_product(product_info)
+        del product_info['variants']
+        self.products_to_unpublish.append(product_info)
+
+    def finish(self) -> List[Path]:
+        self.open_writer().close(self.stats)
+        analysis = {'stats': self.stats, 'products_to_unpublish': self.products_to_unpublish}
+        print(f"  [unpublish] {self.stats['products_with_5_or_fewer_in_stock']:,} products with ≤5 in-stock variants")
+        analyze_products.generate_csv_output(analysis)
+        analyze_products.generate_report(analysis, self.report_size)
+        return [self.writer.path, analyze_products.OUTPUT_CSV, analyze_products.OUTPUT_REPORT]
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.abort()
+
+
+class CubeStage(Stage):
+    """Style × size stockout cube over active products."""
+
+    name = 'cube'
+
+    def __init__(self):
+        self.cube = StockoutCube()
+
+    def add_product(self, product: ProductGroup) -> None:
+        self.cube.add_product(product)
+
+    def finish(self) -> List[Path]:
+        self.cube.freeze()
+        self.cube.save(analyze_inventory.OUTPUT_CUBE)
+        print(f"  [cube] {self.cube.num_cells:,} cells")
+        return [analyze_inventory.OUTPUT_CUBE]
+
+
+class SweepStage(Stage):
+    """Unpublish threshold sweep (rules from --thresholds / --ratios / --core-min)."""
+
+    name = 'sweep'
+
+    def __init__(self, argv: List[str]):
+        self.rules = rules_from_argv(argv)
+        self.histogram = Counter()
+
+    def add_product(self, product: ProductGroup) -> None:
+        self.histogram[histogram_key(product)] += 1
+
+    def finish(self) -> List[Path]:
+        results = evaluate_rules(self.histogram, self.rules)
+        print(f"  [sweep] {sum(self.histogram.values()):,} products, {len(self.histogram):,} histogram buckets\n")
+        print('\n'.join(format_sweep_table(results)) + '\n')
+        write_sweep_csv(results, analyze_products.OUTPUT_SWEEP_CSV)
+        return [analyze_products.OUTPUT_SWEEP_CSV]
+
+
+class FeedStage(Stage):
+    """Merchant Center supplemental feed excluding the unpublish candidates' variants."""
+
+    name = 'feed'
+
+    def __init__(self, argv: List[str]):
+        self.options = merchant_feed.feed_options(argv)
+        self.country = self.options['country']
+        self.stats = analyze_products.new_product_stats()
+        self.writer: Optional[merchant_feed.FeedWriter] = None
+
+    def open_writer(self) -> merchant_feed.FeedWriter:
+        if self.writer is None:
+            self.writer = merchant_feed.FeedWriter(self.options['path'], self.options['destinations'])
+        return self.writer
+
+    def add_product(self, product: ProductGroup) -> None:
+        product_info = analyze_products.analyze_product(product, self.stats)
+        if product_info is not None:
+            self.open_writer().exclude(merchant_feed.product_item_ids(product_info, self.country))
+
+    def finish(self) -> List[Path]:
+        changed = self.open_writer().close()
+        print(f"  [feed] {merchant_feed.format_feed_stats(self.writer.stats)}"
+              f"{'' if changed else ' (unchanged)'}")
+        return [self.writer.path]
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.abort()
+
+
+class PricingStage(Stage):
+    """Price, markdown and revenue-at-risk metrics (pricing.py outputs)."""
+
+    name = 'pricing'
+
+    def __init__(self, argv: List[str]):
+        self.threshold = pricing.threshold_from_argv(argv)
+        self.report_size = report_top(argv)
+        self.store = pricing.PriceStore()
+
+    def add_product(self, product: ProductGroup) -> None:
+        self.store.add_product(product)
+
+    def finish(self) -> List[Path]:
+        metrics = self.store.product_metrics(self.threshold)
+        stats = pricing.summarize_pricing(self.store, metrics)
+        print(f"  [pricing] ${stats['inventory_value']:,.2f} in-stock value, "
+              f"${stats['revenue_at_risk']:,.2f} at risk in {stats['products_flagged']:,} flagged products")
+        pricing.generate_csv_output(self.store, metrics)
+        pricing.generate_report(self.store, metrics, stats, self.threshold, self.report_size)
+        return [pricing.OUTPUT_CSV, pricing.OUTPUT_REPORT]
+
+
+# Stage name -> factory taking the command line
+STAGES: Dict[str, Callable[[List[str]], Stage]] = {
+    'inventory': lambda argv: InventoryStage(output_format(argv), report_top(argv)),
+    'unpublish': lambda argv: UnpublishStage(output_format(argv), report_top(argv)),
+    'cube': lambda argv: CubeStage(),
+    'sweep': lambda argv: SweepStage(argv),
+    'feed': lambda argv: FeedStage(argv),
+    'pricing': lambda argv: PricingStage(argv),
+}
+
+
+def build_stages(names: List[str], argv: List[str]) -> List[Stage]:
+    """Instantiate stages by name, in the given order."""
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(STAGES)}")
+    return [STAGES[name](argv) for name in names]
+
+
+def run_pipeline(products: Iterable[ProductGroup], stages: List[Stage]) -> Dict[str, List[Path]]:
+    """Feed every product to every stage in one pass, then finish each stage.
+
+    Returns stage name -> artifact paths.
+    """
+    count = 0
+    try:
+        for product in products:
+            count += 1
+            for stage in stages:
+                stage.add_product(product)
+    except BaseException:
+        for stage in stages:
+            stage.abort()
+        raise
+    print(f"Processed {count:,} products through {len(stages)} stage(s)")
+
+    return {stage.name: stage.finish() for stage in stages}
+
+
+def main():
+    """Main execution function."""
+    csv_path = Path(sys.argv[sys.argv.index('--csv') + 1]) if '--csv' in sys.argv else PRODUCTS_CSV
+    # --export-dir reads a directory of partial export chunks as one catalog
+    csv_path = export_dir_from_argv(sys.argv) or csv_path
+    if not csv_path.exists():
+        print(f"ERROR: Products CSV not found at {csv_path}")
+        return
+    if csv_path.is_dir() and '--sellable' in sys.argv:
+        print("ERROR: --export-dir cannot be combined with --sellable")
+        sys.exit(1)
+
+    names = DEFAULT_STAGES
+    if '--stages' in sys.argv:
+        names = [name.strip() for name in sys.argv[sys.argv.index('--stages') + 1].split(',') if name.strip()]
+    try:
+        stages = build_stages(names, sys.argv)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+
+    # Optionally count only sellable stock (Available minus Safety Stock) at chosen locations, for every stage,
+    # read from the per-location columns in the same pass as the rows
+    if '--sellable' in sys.argv:
+        locations = None
+        if '--locations' in sys.argv:
+            locations = [name.strip() for name in sys.argv[sys.argv.index('--locations') + 1].split(',')]
+        try:
+            rows = iter_sellable_rows(csv_path, locations)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"Using sellable quantity at {', '.join(locations) if locations else 'all locations'} (minus safety stock)")
+    else:
+        rows = iter_export_rows(csv_path, use_cache, workers)
+
+    print(f"Running pipeline ({', '.join(stage.name for stage in stages)}) over {csv_path.name}...")
+    artifacts = run_pipeline(group_products(rows), stages)
+
+    print(f"\n✅ Pipeline complete!")
+    for name, paths in artifacts.items():
+        for path in paths:
+            print(f"   - {name}: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Price and Markdown Analytics
+Loads `Variant Price` / `Variant Compare At Price` into numeric arrays and
+computes per-product pricing metrics across the whole catalog at once:
+
+    - discount depth: (compare at - price) / compare at for marked-down variants
+    - price dispersion: min / max price and coefficient of variation within a product
+    - inventory value: price × in-stock qty
+    - revenue at risk: inventory value of products flagged for unpublish
+      (≤ threshold in-stock variants, the analyze_products.py rule)
+
+so exclusion decisions can weigh the stock value being hidden, not only the
+variant counts. A missing or invalid price is stored as NaN and left out of
+the price statistics (it adds nothing to inventory value); a product with no
+priced variants has no min / max / mean / CV. Variants are stored like
+variant_store.VariantStore (parallel arrays plus per-product offsets); with
+NumPy the group-by reductions are vectorized, otherwise the same metrics are
+computed with plain loops.
+
+Usage:
+    python3 pricing.py [--threshold 5] [--csv PATH] [--report-top N] [--no-cache] [--workers N]
+"""
+
+import csv
+import math
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from product_catalog import ProductGroup, group_products
+from export_cache import iter_cached_rows
+from streaming_output import DEFAULT_REPORT_TOP, report_top, top_products, write_markdown
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Path to products CSV (full export, like analyze_products.py)
+PRODUCTS_CSV = Path(__file__).parent.parent.parent / "data" / "AD_PRODUCTS_Export_2025-11-04_095613" / "Products.csv"
+OUTPUT_DIR = Path(__file__).parent
+OUTPUT_CSV = OUTPUT_DIR / "pricing_analysis.csv"
+OUTPUT_REPORT = OUTPUT_DIR / "pricing_analysis_report.md"
+
+# Products with this many in-stock variants or fewer are flagged (see analyze_products.py)
+UNPUBLISH_THRESHOLD = 5
+
+
+def parse_price(value: str) -> float:
+    """Parse a price column ('1,299.00', '$24.99'). Empty, negative or invalid is NaN."""
+    value = (value or '').strip().lstrip('$').replace(',', '')
+    if not value:
+        return math.nan
+    try:
+        price = float(value)
+    except ValueError:
+        return math.nan
+    return price if math.isfinite(price) and price >= 0 else math.nan
+
+
+def format_price(value: float) -> str:
+    """Two-decimal price for the CSV; empty when there is no price."""
+    return '' if math.isnan(value) else f"{value:.2f}"
+
+
+# Per-product metrics, in CSV column order
+METRIC_KEYS = [
+    'variants', 'priced_variants', 'in_stock_variants', 'min_price', 'max_price', 'mean_price', 'price_cv',
+    'markdown_variants', 'max_discount', 'avg_discount', 'inventory_value', 'flagged', 'revenue_at_risk'
+]
+
+
+class PriceStore:
+    """Per-variant price, compare-at price and inventory arrays grouped by product."""
+
+    def __init__(self, use_numpy: Optional[bool] = None):
+        self.use_numpy = (np is not None) if use_numpy is None else (use_numpy and np is not None)
+
+        # Per-product columns
+        self.product_ids: List[str] = []
+        self.handles: List[str] = []
+        self.titles: List[str] = []
+        self.statuses: List[str] = []
+        self.offsets = array('q', [0])
+
+        # Per-variant columns
+        self.price = array('d')
+        self.compare_at = array('d')
+        self.inventory_qty = array('q')
+
+    def add_product(self, product: ProductGroup) -> None:
+        """Append one product's variants."""
+        row = product.row
+        self.product_ids.append(product.product_id)
+        self.handles.append(row.handle)
+        self.titles.append(row.title)
+        self.statuses.append(row.status)
+        for variant in product.variants:
+            self.price.append(parse_price(variant.price))
+            self.compare_at.append(parse_price(variant.compare_at_price))
+            self.inventory_qty.append(variant.inventory_qty)
+        self.offsets.append(len(self.price))
+
+    @property
+    def num_products(self) -> int:
+        return len(self.product_ids)
+
+    @property
+    def num_variants(self) -> int:
+        return len(self.price)
+
+    def product_metrics(self, threshold: int = UNPUBLISH_THRESHOLD) -> Dict[str, List]:
+        """Per-product pricing metrics as parallel lists (keys match the CSV columns)."""
+        if self.num_products == 0:
+            return {key: [] for key in METRIC_KEYS}
+        if self.use_numpy:
+            return self._metrics_numpy(threshold)
+        return self._metrics_python(threshold)
+
+    def _metrics_numpy(self, threshold: int) -> Dict[str, List]:
+        price = np.frombuffer(self.price, dtype=np.float64)
+        compare_at = np.frombuffer(self.compare_at, dtype=np.float64)
+        qty = np.maximum(np.frombuffer(self.inventory_qty, dtype=np.int64), 0)
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        starts = offsets[:-1]
+        counts = np.diff(offsets)
+
+        # Missing prices are NaN: masked out of the sums, skipped by fmin / fmax, never marked down
+        priced = ~np.isnan(price)
+        known_price = np.where(priced, price, 0.0)
+        marked_down = compare_at > price
+        discount = np.where(marked_down, (compare_at - price) / np.where(marked_down, compare_at, 1.0), 0.0)
+        in_stock = qty > 0
+        value = known_price * qty
+
+        priced_count = np.add.reduceat(priced.astype(np.int64), starts)
+        has_price = priced_count > 0
+        divisor = np.maximum(priced_count, 1)
+        mean = np.where(has_price, np.add.reduceat(known_price, starts) / divisor, np.nan)
+        variance = np.maximum(np.add.reduceat(known_price * known_price, starts) / divisor - np.nan_to_num(mean) ** 2, 0.0)
+        cv = np.where(mean > 0, np.sqrt(variance) / np.where(mean > 0, mean, 1.0), np.where(has_price, 0.0, np.nan))
+        markdown_count = np.add.reduceat(marked_down.astype(np.int64), starts)
+        discount_sum = np.add.reduceat(discount, starts)
+        in_stock_count = np.add.reduceat(in_stock.astype(np.int64), starts)
+        inventory_value = np.add.reduceat(value, starts)
+        flagged = in_stock_count <= threshold
+
+        return {
+            'variants': counts.tolist(),
+            'priced_variants': priced_count.tolist(),
+            'in_stock_variants': in_stock_count.tolist(),
+            'min_price': np.fmin.reduceat(price, starts).tolist(),
+            'max_price': np.fmax.reduceat(price, starts).tolist(),
+            'mean_price': mean.tolist(),
+            'price_cv': cv.tolist(),
+            'markdown_variants': markdown_count.tolist(),
+            'max_discount': np.maximum.reduceat(discount, starts).tolist(),
+            'avg_discount': np.where(markdown_count > 0, discount_sum / np.maximum(markdown_count, 1), 0.0).tolist(),
+            'inventory_value': inventory_value.tolist(),
+            'flagged': flagged.tolist(),
+            'revenue_at_risk': np.where(flagged, inventory_value, 0.0).tolist()
+        }
+
+    def _metrics_python(self, threshold: int) -> Dict[str, List]:
+        metrics: Dict[str, List] = {key: [] for key in METRIC_KEYS}
+        offsets = self.offsets
+        for i in range(self.num_products):
+            start, end = offsets[i], offsets[i + 1]
+            all_prices = self.price[start:end]
+            prices = [p for p in all_prices if not math.isnan(p)]
+            count = end - start
+            discounts = [
+                (compare_at - price) / compare_at
+                for price, compare_at in zip(all_prices, self.compare_at[start:end]) if compare_at > price
+            ]
+            quantities = [max(q, 0) for q in self.inventory_qty[start:end]]
+            in_stock_count = sum(1 for q in quantities if q > 0)
+            inventory_value = sum(p * q for p, q in zip(all_prices, quantities) if not math.isnan(p))
+            flagged = in_stock_count <= threshold
+
+            metrics['variants'].append(count)
+            metrics['priced_variants'].append(len(prices))
+            metrics['in_stock_variants'].append(in_stock_count)
+            if prices:
+                mean = sum(prices) / len(prices)
+                variance = max(sum(p * p for p in prices) / len(prices) - mean * mean, 0.0)
+                metrics['min_price'].append(min(prices))
+                metrics['max_price'].append(max(prices))
+                metrics['mean_price'].append(mean)
+                metrics['price_cv'].append(math.sqrt(variance) / mean if mean > 0 else 0.0)
+            else:
+                for key in ('min_price', 'max_price', 'mean_price', 'price_cv'):
+                    metrics[key].append(math.nan)
+            metrics['markdown_variants'].append(len(discounts))
+            metrics['max_discount'].append(max(discounts, default=0.0))
+            metrics['avg_discount'].append(sum(discounts) / len(discounts) if discounts else 0.0)
+            metrics['inventory_value'].append(inventory_value)
+            metrics['flagged'].append(flagged)
+            metrics['revenue_at_risk'].append(inventory_value if flagged else 0.0)
+        return metrics
+
+    def products(self, metrics: Dict[str, List]) -> Iterable[Dict[str, Any]]:
+        """Per-product records combining identity columns with the metrics."""
+        for i, product_id in enumerate(self.product_ids):
+            record = {
+                'product_id': product_id,
+                'handle': self.handles[i],
+                'title': self.titles[i],
+                'status': self.statuses[i]
+            }
+            for key in METRIC_KEYS:
+                record[key] = metrics[key][i]
+            yield record
+
+
+def summarize_pricing(store: PriceStore, metrics: Dict[str, List]) -> Dict[str, Any]:
+    """Catalog-wide pricing stats."""
+    inventory_value = sum(metrics['inventory_value'])
+    revenue_at_risk = sum(metrics['revenue_at_risk'])
+    return {
+        'products_analyzed': store.num_products,
+        'variants_analyzed': store.num_variants,
+        'variants_without_price': store.num_variants - sum(metrics['priced_variants']),
+        'products_with_markdowns': sum(1 for count in metrics['markdown_variants'] if count),
+        'variants_on_markdown': sum(metrics['markdown_variants']),
+        'products_flagged': sum(1 for flagged in metrics['flagged'] if flagged),
+        'inventory_value': round(inventory_value, 2),
+        'revenue_at_risk': round(revenue_at_risk, 2),
+        'revenue_at_risk_pct': round(revenue_at_risk / inventory_value * 100, 1) if inventory_value else 0.0
+    }
+
+
+def generate_csv_output(store: PriceStore, metrics: Dict[str, List]) -> None:
+    """Write one row per product with its pricing metrics."""
+    with open(OUTPUT_CSV, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            'Product ID', 'Handle', 'Title', 'Status', 'Total Variants', 'Priced Variants', 'In Stock Variants',
+            'Min Price', 'Max Price', 'Mean Price', 'Price CV', 'Markdown Variants',
+            'Max Discount %', 'Avg Discount %', 'Inventory Value', 'Flagged', 'Revenue At Risk'
+        ])
+        for product in store.products(metrics):
+            writer.writerow([
+                product['product_id'], product['handle'], product['title'], product['status'],
+                product['variants'], product['priced_variants'], product['in_stock_variants'],
+                format_price(product['min_price']), format_price(product['max_price']), format_price(product['mean_price']),
+                '' if math.isnan(product['price_cv']) else f"{product['price_cv']:.3f}", product['markdown_variants'],
+                f"{product['max_discount'] * 100:.1f}", f"{product['avg_discount'] * 100:.1f}",
+                f"{product['inventory_value']:.2f}", 'TRUE' if product['flagged'] else 'FALSE',
+                f"{product['revenue_at_risk']:.2f}"
+            ])
+
+
+def price_range(product: Dict[str, Any]) -> str:
+    if math.isnan(product['min_price']):
+        return 'no price'
+    return f"${product['min_price']:.2f}–${product['max_price']:.2f}"
+
+
+def generate_report(store: PriceStore, metrics: Dict[str, List], stats: Dict[str, Any],
+                    threshold: int = UNPUBLISH_THRESHOLD, top: int = DEFAULT_REPORT_TOP) -> None:
+    """Markdown summary listing the flagged products with the most revenue at risk."""
+    flagged = (product for product in store.products(metrics) if product['flagged'])
+    at_risk, total = top_products(flagged, top, key=lambda x: x['revenue_at_risk'], largest=True)
+
+    header = [
+        "# Pricing & Markdown Analysis",
+        "",
+        f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        "## Summary",
+        "",
+        f"- **Products Analyzed:** {stats['products_analyzed']:,}",
+        f"- **Variants Analyzed:** {stats['variants_analyzed']:,} ({stats['variants_without_price']:,} without a price)",
+        f"- **Products with Markdowns:** {stats['products_with_markdowns']:,} ({stats['variants_on_markdown']:,} variants)",
+        f"- **In-Stock Inventory Value:** ${stats['inventory_value']:,.2f}",
+        f"- **Products Flagged (≤{threshold} In-Stock Variants):** {stats['products_flagged']:,}",
+        f"- **Revenue at Risk (flagged products' in-stock value):** ${stats['revenue_at_risk']:,.2f} "
+        f"({stats['revenue_at_risk_pct']}% of inventory value)",
+        "",
+        "## Flagged Products by Revenue at Risk",
+        "",
+        "| Product ID | Handle | In Stock | Price Range | Max Discount | Revenue at Risk |",
+        "|------------|--------|----------|-------------|--------------|-----------------|"
+    ]
+    rows = (
+        f"| {product['product_id']} | `{product['handle']}` | {product['in_stock_variants']}/{product['variants']} | "
+        f"{price_range(product)} | {product['max_discount'] * 100:.0f}% | "
+        f"${product['revenue_at_risk']:,.2f} |"
+        for product in at_risk
+    )
+    footer = []
+    if total > len(at_risk):
+        footer.append(f"\n*... and {total - len(at_risk):,} more flagged products (see `{OUTPUT_CSV.name}`)*")
+    write_markdown(OUTPUT_REPORT, header, rows, footer)
+
+
+def analyze_pricing(products: Iterable[ProductGroup], threshold: int = UNPUBLISH_THRESHOLD,
+                    use_numpy: Optional[bool] = None) -> Tuple[PriceStore, Dict[str, List], Dict[str, Any]]:
+    """Load grouped products into a PriceStore and compute (store, metrics, stats)."""
+    store = PriceStore(use_numpy)
+    for product in products:
+        store.add_product(product)
+    metrics = store.product_metrics(threshold)
+    return store, metrics, summarize_pricing(store, metrics)
+
+
+def threshold_from_argv(argv: List[str]) -> int:
+    """In-stock variant threshold from --threshold N (default 5)."""
+    return int(argv[argv.index('--threshold') + 1]) if '--threshold' in argv else UNPUBLISH_THRESHOLD
+
+
+def main():
+    """Main execution function."""
+    csv_path = Path(sys.argv[sys.argv.index('--csv') + 1]) if '--csv' in sys.argv else PRODUCTS_CSV
+    if not csv_path.exists():
+        print(f"ERROR: Products CSV not found at {csv_path}")
+        return
+
+    use_cache = '--no-cache' not in sys.argv
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+    threshold = threshold_from_argv(sys.argv)
+
+    print("Analyzing prices and markdowns...")
+    store, metrics, stats = analyze_pricing(group_products(iter_cached_rows(csv_path, use_cache, workers)), threshold)
+    print(f"Processed {stats['products_analyzed']:,} products / {stats['variants_analyzed']:,} variants")
+    print(f"  In-stock inventory value: ${stats['inventory_value']:,.2f}")
+    print(f"  Revenue at risk ({stats['products_flagged']:,} flagged products): "
+          f"${stats['revenue_at_risk']:,.2f} ({stats['revenue_at_risk_pct']}%)")
+
+    generate_csv_output(store, metrics)
+    generate_report(store, metrics, stats, threshold, report_top(sys.argv))
+    print(f"\n✅ Pricing analysis complete!")
+    print(f"   - CSV: {OUTPUT_CSV}")
+    print(f"   - Report: {OUTPUT_REPORT}")
+
+
+if __name__ == '__main__':
+    main()
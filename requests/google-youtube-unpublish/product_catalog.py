@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Product Catalog Helpers
+Shared streaming reader and grouping logic for Matrixify Products.csv exports,
+used by analyze_inventory.py and analyze_products.py.
+
+Only the columns the analyzers need are kept: header indices are resolved once
+and each CSV row is projected into a compact CatalogRow tuple. Matrixify writes
+all rows of a product contiguously, so each product is yielded as soon as its
+last variant row has been read; apart from the set of product IDs already seen
+(used to detect non-contiguous exports), memory stays flat regardless of export size.
+
+Rows share their strings (see make_row_builder): low-cardinality columns
+(status, vendor, option names and values, ...) map to one instance per
+distinct value, and product columns repeated on every variant row reuse the
+previous row's instances, so a retained variant row costs little more than
+its tuple, variant ID and SKU.
+"""
+
+import csv
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List
+
+# Export column for each CatalogRow field
+CATALOG_COLUMNS = {
+    'product_id': 'ID',
+    'handle': 'Handle',
+    'title': 'Title',
+    'url': 'URL',
+    'status': 'Status',
+    'published': 'Published',
+    'vendor': 'Vendor',
+    'product_type': 'Type',
+    'tags': 'Tags',
+    'top_row': 'Top Row',
+    'variant_id': 'Variant ID',
+    'variant_sku': 'Variant SKU',
+    'option1_name': 'Option1 Name',
+    'option1_value': 'Option1 Value',
+    'option2_name': 'Option2 Name',
+    'option2_value': 'Option2 Value',
+    'option3_name': 'Option3 Name',
+    'option3_value': 'Option3 Value',
+    'price': 'Variant Price',
+    'compare_at_price': 'Variant Compare At Price',
+    'inventory_qty': 'Variant Inventory Qty',
+}
+
+CatalogRow = namedtuple('CatalogRow', list(CATALOG_COLUMNS))
+ProductGroup = namedtuple('ProductGroup', ['product_id', 'row', 'variants'])
+
+# Matrixify marks the first row of each product with the `Top Row` column
+TOP_ROW_VALUES = ('true', '1', 'yes')
+
+# Columns with few distinct values across the whole export
+INTERNED_FIELDS = (
+    'status', 'published', 'vendor', 'product_type', 'top_row',
+    'option1_name', 'option1_value', 'option2_name', 'option2_value', 'option3_name', 'option3_value',
+    'price', 'compare_at_price',
+)
+# Product columns repeated on every variant row of the product
+PRODUCT_FIELDS = ('product_id', 'handle', 'title', 'url', 'tags')
+
+
+def make_row_builder() -> Callable[[List], CatalogRow]:
+    """Build a function turning per-field value lists into CatalogRow tuples with shared strings.
+
+    INTERNED_FIELDS go through a table of distinct values; PRODUCT_FIELDS are
+    taken from the previous row when unchanged, which keeps the table from
+    growing with every handle and title in the catalog. The value list is
+    modified in place.
+    """
+    strings: Dict[str, str] = {}
+    intern = strings.setdefault
+    interned = [CatalogRow._fields.index(field) for field in INTERNED_FIELDS]
+    product = [CatalogRow._fields.index(field) for field in PRODUCT_FIELDS]
+    id_field = CatalogRow._fields.index('product_id')
+    make = CatalogRow._make
+    previous = None
+
+    def build(values: List) -> CatalogRow:
+        nonlocal previous
+        for i in interned:
+            value = values[i]
+            values[i] = intern(value, value)
+        if previous is not None and values[id_field] == previous[id_field]:
+            for i in product:
+                if values[i] == previous[i]:
+                    values[i] = previous[i]
+        previous = make(values)
+        return previous
+
+    return build
+
+
+def parse_inventory_qty(qty_str: str) -> int:
+    """Parse a 'Variant Inventory Qty' value. If empty or invalid, returns 0."""
+    qty_str = (qty_str or '').strip()
+    if not qty_str:
+        return 0
+    try:
+        qty = int(float(qty_str))
+        return max(0, qty)  # Ensure non-negative
+    except (ValueError, TypeError):
+        return 0
+
+
+def resolve_columns(header: List[str], columns: Dict[str, str]) -> List[int]:
+    """Map each requested column to its index in the CSV header (-1 if absent)."""
+    positions = {name.strip(): i for i, name in enumerate(header)}
+    return [positions.get(column, -1) for column in columns.values()]
+
+
+def make_row_projector(header: List[str]) -> Callable[[List[str]], CatalogRow]:
+    """Build a function projecting raw CSV records onto CatalogRow for this header."""
+    indices = resolve_columns(header, CATALOG_COLUMNS)
+    qty_field = list(CATALOG_COLUMNS).index('inventory_qty')
+    build_row = make_row_builder()
+
+    def project(record: List[str]) -> CatalogRow:
+        width = len(record)
+        values = [record[i].strip() if 0 <= i < width else '' for i in indices]
+        values[qty_field] = parse_inventory_qty(values[qty_field])
+        return build_row(values)
+
+    return project
+
+
+def iter_catalog_rows(csv_path: Path) -> Iterator[CatalogRow]:
+    """Stream projected CatalogRow tuples from a products CSV file."""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:  # utf-8-sig handles BOM
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield from map(make_row_projector(header), reader)
+
+
+def is_top_row(row: CatalogRow) -> bool:
+    """Check whether a row is flagged as the product's Matrixify top row."""
+    return row.top_row.lower() in TOP_ROW_VALUES
+
+
+def group_products(rows: Iterable[CatalogRow]) -> Iterator[ProductGroup]:
+    """Group contiguous variant rows by product ID in a single pass.
+
+    Each ProductGroup is yielded as soon as the next product starts. The header
+    row is the Matrixify `Top Row` when flagged, otherwise the product's first row.
+    Raises ValueError if a product's rows are not contiguous.
+    """
+    seen = set()
+    current_id = None
+    header = None
+    variants: List[CatalogRow] = []
+
+    for row in rows:
+        product_id = row.product_id
+        if not product_id:
+            continue
+
+        if product_id != current_id:
+            if current_id is not None:
+                yield ProductGroup(current_id, header, variants)
+            if product_id in seen:
+                raise ValueError(
+                    f"Rows for product {product_id} are not contiguous; "
+                    "sort the export by ID before analyzing"
+                )
+            seen.add(product_id)
+            current_id = product_id
+            header = row
+            variants = []
+        elif is_top_row(row) and not is_top_row(header):
+            header = row
+
+        variants.append(row)
+
+    if current_id is not None:
+        yield ProductGroup(current_id, header, variants)
+
+
+def iter_products(csv_path: Path) -> Iterator[ProductGroup]:
+    """Stream grouped products from a products CSV file."""
+    return group_products(iter_catalog_rows(csv_path))
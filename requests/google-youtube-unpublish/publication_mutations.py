@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Batched Publication Mutations
+Publishes / unpublishes many products per GraphQL request by packing aliased
+publishablePublish / publishableUnpublish mutations into one document:
+
+    mutation {
+      p0: publishableUnpublish(id: "gid://shopify/Product/1", input: [{publicationId: "..."}]) { userErrors { field message } }
+      p1: publishableUnpublish(id: "gid://shopify/Product/2", input: [{publicationId: "..."}]) { userErrors { field message } }
+    }
+
+Batches are sized from the cost per mutation observed so far (requestedQueryCost
+/ batch size, starting from MUTATION_COST) to stay under the single-query cost
+limit and the bucket's capacity, and are paced by the GraphQL cost bucket
+(see publish_executor.py). A batch rejected with MAX_COST_EXCEEDED is split in
+half and retried; a single product rejected that way fails on its own.
+
+Each alias maps back to one product: its userErrors (or a top-level error
+whose path starts with the alias) fail that product only. Given a
+PublicationSnapshot, products already in the target state are skipped and
+successful changes are recorded in it.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from publication_snapshot import PublicationSnapshot
+from publish_executor import CallLimitBucket, ThroughputReporter
+from shopify_bulk import gid, graphql
+
+MUTATIONS = {'unpublish': 'publishableUnpublish', 'publish': 'publishablePublish'}
+# Shopify's single-query cost limit, and the initial cost estimate for one mutation
+MAX_QUERY_COST = 1000
+MUTATION_COST = 10
+MAX_BATCH_SIZE = 100
+GRAPHQL_BUCKET_SIZE = 1000
+GRAPHQL_RESTORE_RATE = 50.0
+
+
+class MaxCostExceeded(RuntimeError):
+    """The batch's requested cost is above the single-query limit."""
+
+
+def batch_mutation(action: str, product_ids: List[Any], publication_id: Any) -> str:
+    """Mutation document with one aliased publish/unpublish field per product (aliases p0, p1, ...)."""
+    field = MUTATIONS[action]
+    publication = gid('Publication', publication_id)
+    lines = [
+        f'  p{i}: {field}(id: "{gid("Product", product_id)}", input: [{{publicationId: "{publication}"}}]) '
+        f'{{ userErrors {{ field message }} }}'
+        for i, product_id in enumerate(product_ids)
+    ]
+    return 'mutation {\n' + '\n'.join(lines) + '\n}'
+
+
+def batch_errors(data: Optional[Dict[str, Any]], errors: List[Dict[str, Any]], size: int) -> List[Optional[str]]:
+    """Error message per product of a batch (None where the mutation succeeded)."""
+    messages: List[Optional[str]] = [None] * size
+    # Top-level errors are attributed through their path; errors without one fail the whole batch
+    for error in errors:
+        path = error.get('path') or []
+        alias = path[0] if path else None
+        if isinstance(alias, str) and alias.startswith('p') and alias[1:].isdigit() and int(alias[1:]) < size:
+            messages[int(alias[1:])] = error.get('message', 'GraphQL error')
+        else:
+            messages = [error.get('message', 'GraphQL error')] * size
+            break
+    for i in range(size):
+        if messages[i] is not None:
+            continue
+        result = (data or {}).get(f'p{i}')
+        if result is None:
+            messages[i] = 'No result returned'
+        elif result.get('userErrors'):
+            messages[i] = '; '.join(user_error.get('message', '') for user_error in result['userErrors'])
+    return messages
+
+
+class PublicationBatcher:
+    """Runs publish / unpublish for many products through batched GraphQL mutations."""
+
+    def __init__(self, store: str, token: str, publication_id: Any, bucket: Optional[CallLimitBucket] = None,
+                 max_batch_size: int = MAX_BATCH_SIZE, snapshot: Optional[PublicationSnapshot] = None):
+        self.store = store
+        self.token = token
+        self.publication_id = publication_id
+        self.snapshot = snapshot
+        self.bucket = bucket or CallLimitBucket(GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE)
+        self.max_batch_size = max_batch_size
+        self.mutation_cost = float(MUTATION_COST)
+        self.stats = {'requests': 0, 'mutations': 0, 'failed': 0, 'split': 0}
+
+    def batch_size(self) -> int:
+        """Products per request that keep the requested cost under the query limit and the bucket capacity."""
+        budget = min(MAX_QUERY_COST, self.bucket.capacity)
+        return max(1, min(self.max_batch_size, int(budget // self.mutation_cost)))
+
+    def send(self, action: str, product_ids: List[Any]) -> List[Optional[str]]:
+        """One batched request; returns an error message per product (None on success)."""
+        query = batch_mutation(action, product_ids, self.publication_id)
+        try:
+            body = graphql(self.store, self.token, query, bucket=self.bucket,
+                           cost=len(product_ids) * self.mutation_cost, full_response=True)
+        except (RuntimeError, requests.RequestException) as e:
+            return [str(e)] * len(product_ids)
+        self.stats['requests'] += 1
+
+        errors = body.get('errors') or []
+        if any((error.get('extensions') or {}).get('code') == 'MAX_COST_EXCEEDED' for error in errors):
+            raise MaxCostExceeded(errors[0].get('message', 'Query cost exceeds the maximum'))
+        requested = body.get('extensions', {}).get('cost', {}).get('requestedQueryCost')
+        if requested:
+            self.mutation_cost = max(float(requested) / len(product_ids), 1.0)
+        return batch_errors(body.get('data'), errors, len(product_ids))
+
+    def run(self, action: str, items: List[Any], on_result: Callable[[Any, Any, Optional[BaseException]], None],
+            product_id: Callable[[Any], Any] = lambda item: item, label: str = '') -> Dict[str, Any]:
+        """Publish or unpublish every item, calling on_result(item, changed, error) for each.
+
+        Same callback shape as publish_executor.run_operations, so callers can
+        share their result handling between the REST and GraphQL paths:
+        changed is True on success, False for items the snapshot already has
+        in the target state, and None (with the error) on failure.
+        """
+        items = list(items)
+        reporter = ThroughputReporter(label or action, len(items), self.bucket)
+        if self.snapshot is not None:
+            pending = []
+            for item in items:
+                if self.snapshot.is_published(product_id(item)) == (action == 'publish'):
+                    on_result(item, False, None)
+                    reporter.completed()
+                else:
+                    pending.append(item)
+            items = pending
+        start = 0
+        while start < len(items):
+            batch = items[start:start + self.batch_size()]
+            try:
+                messages = self.send(action, [product_id(item) for item in batch])
+            except MaxCostExceeded as e:
+                if len(batch) == 1:
+                    # A single mutation above the limit fails on its own; the run goes on
+                    start += 1
+                    self.stats['failed'] += 1
+                    on_result(batch[0], None, e)
+                    reporter.completed()
+                    continue
+                # Raise the cost estimate so the retried batch is half this one
+                self.stats['split'] += 1
+                self.mutation_cost = max(self.mutation_cost, MAX_QUERY_COST / (len(batch) // 2))
+                continue
+            start += len(batch)
+            self.stats['mutations'] += len(batch)
+            for item, message in zip(batch, messages):
+                if message is None:
+                    if self.snapshot is not None:
+                        self.snapshot.record(product_id(item), action == 'publish')
+                    on_result(item, True, None)
+                else:
+                    self.stats['failed'] += 1
+                    on_result(item, None, RuntimeError(message))
+                reporter.completed()
+        if reporter.total:
+            reporter.finish()
+        return dict(self.stats)
+
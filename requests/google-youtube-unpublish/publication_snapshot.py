@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Publication Membership Snapshot
+Pages through every product_publication of one publication (the Google &
+YouTube channel) once and keeps product ID -> product_publication ID in a
+dict. Membership checks and unpublish DELETE targets then come from memory
+instead of a GET per product, and the map is updated as publish / unpublish
+calls succeed so it stays current for the rest of the run. Changes made
+another way (GraphQL mutations, see publication_mutations.py) are recorded
+with record(). The map and stats are updated under a lock, and a product
+is claimed before its publish / unpublish call, so one snapshot can serve
+concurrent worker threads without duplicate requests.
+
+Usage:
+    python3 publication_snapshot.py [--publication-id ID]
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+import requests
+
+from shopify_bulk import SHOPIFY_ACCESS_TOKEN, SHOPIFY_STORE, admin_url, api_headers
+
+PAGE_LIMIT = 250
+NEXT_PAGE_PATTERN = re.compile(r'<[^>]*[?&]page_info=([^&>]+)[^>]*>;\s*rel="next"')
+
+
+def next_page_info(link_header: str) -> Optional[str]:
+    """page_info cursor of the rel="next" link in a Link header (None on the last page)."""
+    match = NEXT_PAGE_PATTERN.search(link_header or '')
+    return match.group(1) if match else None
+
+
+class PublicationSnapshot:
+    """In-memory membership of one publication, kept current by publish() / unpublish()."""
+
+    def __init__(self, store: str, token: str, publication_id: str, http: Any = requests):
+        self.store = store
+        self.token = token
+        self.publication_id = str(publication_id)
+        # Anything with requests-style get/post/delete, e.g. a publish_executor.ThrottledSession
+        self.http = http
+        # The product_publication ID is None for products published through GraphQL
+        self.members: Dict[int, Optional[int]] = {}
+        self.stats = {'pages': 0, 'published': 0, 'unpublished': 0, 'stale': 0}
+        # Guards members, stats and in_flight; never held across an HTTP call
+        self.lock = threading.Lock()
+        # Products with a publish / unpublish call in progress, so concurrent calls for one product send one request
+        self.in_flight: Set[int] = set()
+
+    @property
+    def url(self) -> str:
+        return f"{admin_url(self.store)}/publications/{self.publication_id}/product_publications"
+
+    def load(self) -> 'PublicationSnapshot':
+        """Read every product_publication of the publication, PAGE_LIMIT per request."""
+        members: Dict[int, int] = {}
+        params = {'limit': PAGE_LIMIT}
+        headers = api_headers(self.token)
+        while True:
+            response = self.http.get(f"{self.url}.json", headers=headers, params=params)
+            response.raise_for_status()
+            with self.lock:
+                self.stats['pages'] += 1
+            for row in response.json().get('product_publications', []):
+                members[int(row['product_id'])] = int(row['id'])
+            page_info = next_page_info(response.headers.get('Link', ''))
+            if page_info is None:
+                break
+            # Cursor pages accept only limit and page_info
+            params = {'limit': PAGE_LIMIT, 'page_info': page_info}
+        with self.lock:
+            self.members = members
+        return self
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def is_published(self, product_id) -> bool:
+        return int(product_id) in self.members
+
+    def record(self, product_id, published: bool, row_id: Optional[int] = None) -> None:
+        """Record a publish / unpublish made without this snapshot."""
+        product_id = int(product_id)
+        with self.lock:
+            if published:
+                if product_id not in self.members:
+                    self.stats['published'] += 1
+                self.members[product_id] = row_id or self.members.get(product_id)
+            elif product_id in self.members:
+                del self.members[product_id]
+                self.stats['unpublished'] += 1
+
+    def _drop(self, product_id: int, stat: str) -> None:
+        """Remove a product from the map and count it under stat."""
+        with self.lock:
+            self.members.pop(product_id, None)
+            self.stats[stat] += 1
+
+    def lookup_row_id(self, product_id) -> Optional[int]:
+        """Fetch the product's product_publication ID (None if it is not published)."""
+        response = self.http.get(f"{self.url}.json", headers=api_headers(self.token),
+                                 params={'product_id': int(product_id)})
+        response.raise_for_status()
+        rows = response.json().get('product_publications', [])
+        return int(rows[0]['id']) if rows else None
+
+    def _claim(self, product_id: int, published: bool) -> bool:
+        """Reserve a product for one change if it is not in that state yet and no other thread is changing it."""
+        with self.lock:
+            if (product_id in self.members) == published or product_id in self.in_flight:
+                return False
+            self.in_flight.add(product_id)
+            return True
+
+    def _release(self, product_id: int) -> None:
+        with self.lock:
+            self.in_flight.discard(product_id)
+
+    def unpublish(self, product_id) -> bool:
+        """Delete the product's publication. Returns False if it was not published.
+
+        A product unpublished elsewhere since the snapshot (404) is dropped from
+        the map and counts as not published.
+        """
+        product_id = int(product_id)
+        if not self._claim(product_id, False):
+            return False
+        try:
+            with self.lock:
+                row_id = self.members[product_id]
+            row_id = row_id or self.lookup_row_id(product_id)
+            if row_id is None:
+                self._drop(product_id, 'stale')
+                return False
+            response = self.http.delete(f"{self.url}/{row_id}.json", headers=api_headers(self.token))
+            if response.status_code == 404:
+                self._drop(product_id, 'stale')
+                return False
+            response.raise_for_status()
+            self._drop(product_id, 'unpublished')
+            return True
+        finally:
+            self._release(product_id)
+
+    def publish(self, product_id) -> bool:
+        """Publish the product. Returns False if it was already published."""
+        product_id = int(product_id)
+        if not self._claim(product_id, True):
+            return False
+        try:
+            payload = {'product_publication': {'product_id': product_id}}
+            response = self.http.post(f"{self.url}.json", headers=api_headers(self.token), json=payload)
+            response.raise_for_status()
+            with self.lock:
+                self.members[product_id] = int(response.json()['product_publication']['id'])
+                self.stats['published'] += 1
+            return True
+        finally:
+            self._release(product_id)
+
+def main():
+    """Main execution function."""
+    if not SHOPIFY_ACCESS_TOKEN:
+        print("ERROR: SHOPIFY_ACCESS_TOKEN not set")
+        sys.exit(1)
+
+    publication_id = sys.argv[sys.argv.index('--publication-id') + 1] if '--publication-id' in sys.argv \
+        else os.getenv('GOOGLE_YOUTUBE_PUBLICATION_ID', '')
+    if not publication_id:
+        print("ERROR: pass --publication-id or set GOOGLE_YOUTUBE_PUBLICATION_ID")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    snapshot = PublicationSnapshot(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, publication_id).load()
+    print(f"✅ {len(snapshot):,} products published to {publication_id} "
+          f"({snapshot.stats['pages']} page(s), {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
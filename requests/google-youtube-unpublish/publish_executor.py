@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Concurrent Publish / Unpublish Executor
+Runs publication changes concurrently while staying inside Shopify's API rate
+limits, instead of one blocking request after another.
+
+Rate limiting mirrors Shopify's leaky bucket on the client:
+    - CallLimitBucket reserves capacity before every request and waits when
+      the bucket would overflow. REST defaults to 40 calls leaking at 2/s
+      (Shopify Plus: 400 at 20/s).
+    - Every response re-syncs the level from `X-Shopify-Shop-Api-Call-Limit`
+      ("32/40"), or from the GraphQL `extensions.cost.throttleStatus`.
+    - A 429 (or a GraphQL THROTTLED error) fills the bucket and the request
+      is retried after `Retry-After`.
+
+Operations run on an asyncio event loop that dispatches the blocking
+`requests` calls to worker threads and reports live throughput. Where an
+event loop is already running (e.g. inside a notebook), a plain thread pool
+runs them instead.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+
+CALL_LIMIT_HEADER = 'X-Shopify-Shop-Api-Call-Limit'
+REST_BUCKET_SIZE = 40
+REST_LEAK_RATE = 2.0
+MAX_RETRIES = 5
+DEFAULT_CONCURRENCY = 8
+# Seconds between live throughput lines
+PROGRESS_INTERVAL = 2.0
+
+
+class CallLimitBucket:
+    """Thread-safe client-side model of a Shopify leaky bucket.
+
+    Callers reserve cost up front, so concurrent requests queue behind each
+    other in order instead of all finding the bucket full at once.
+    """
+
+    def __init__(self, capacity: float = REST_BUCKET_SIZE, leak_rate: float = REST_LEAK_RATE):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'waits': 0, 'wait_seconds': 0.0, 'throttled': 0}
+
+    def _leak(self, now: float) -> None:
+        self.level = max(self.level - (now - self.updated) * self.leak_rate, 0.0)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Reserve capacity for one request; returns the seconds to wait before sending it."""
+        with self.lock:
+            self._leak(time.monotonic())
+            wait = max(self.level + cost - self.capacity, 0.0) / self.leak_rate
+            self.level += cost
+            self.stats['requests'] += 1
+            if wait > 0:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self, cost: float = 1.0) -> None:
+        """Block until a request of this cost fits in the bucket."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+
+    def observe(self, used: float, capacity: Optional[float] = None, leak_rate: Optional[float] = None) -> None:
+        """Re-sync with the level reported by the server.
+
+        The local level also holds reservations for requests not yet sent, so
+        it is only ever raised to the server's figure. When only the capacity
+        changes (e.g. a Plus store), the leak rate scales with it.
+        """
+        with self.lock:
+            self._leak(time.monotonic())
+            if capacity and capacity != self.capacity:
+                if leak_rate is None:
+                    self.leak_rate *= capacity / self.capacity
+                self.capacity = capacity
+            if leak_rate:
+                self.leak_rate = leak_rate
+            self.level = max(self.level, used)
+
+    def observe_response(self, response: requests.Response) -> None:
+        """Re-sync from a REST response's `X-Shopify-Shop-Api-Call-Limit` header ("used/capacity")."""
+        value = response.headers.get(CALL_LIMIT_HEADER)
+        if value and '/' in value:
+            used, capacity = value.split('/', 1)
+            self.observe(float(used), float(capacity))
+
+    def observe_throttle_status(self, throttle_status: Dict[str, Any]) -> None:
+        """Re-sync from GraphQL `extensions.cost.throttleStatus` (cost points)."""
+        maximum = float(throttle_status['maximumAvailable'])
+        self.observe(maximum - float(throttle_status['currentlyAvailable']), maximum,
+                     float(throttle_status['restoreRate']))
+
+    def throttled(self) -> None:
+        """The server rejected a request: treat the bucket as full."""
+        with self.lock:
+            self._leak(time.monotonic())
+            self.level = max(self.level, self.capacity)
+            self.stats['throttled'] += 1
+
+
+class ThrottledSession:
+    """requests-compatible get/post/delete that wait on a CallLimitBucket and retry 429s.
+
+    Each worker thread gets its own requests.Session (kept-alive connections).
+    """
+
+    def __init__(self, bucket: Optional[CallLimitBucket] = None, max_retries: int = MAX_RETRIES):
+        self.bucket = bucket or CallLimitBucket()
+        self.max_retries = max_retries
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == self.max_retries:
+                self.bucket.observe_response(response)
+                return response
+            self.bucket.throttled()
+            time.sleep(float(response.headers.get('Retry-After') or 1.0))
+        return response
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+
+class ThroughputReporter:
+    """Prints completed / total, operations per second and throttling every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, label: str, total: int, bucket: Optional[CallLimitBucket] = None,
+                 interval: float = PROGRESS_INTERVAL):
+        self.label = label
+        self.total = total
+        self.bucket = bucket
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f"   ⏱️  {self.label}: {self.done:,}/{self.total:,} in {elapsed:.1f}s ({rate:.1f}/s)"
+        if self.bucket is not None:
+            stats = self.bucket.stats
+            line += f", {stats['waits']:,} rate-limit waits, {stats['throttled']} throttled (429)"
+        return line
+
+    def completed(self) -> None:
+        self.done += 1
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval and self.done < self.total:
+            self.last_report = now
+            print(self.line())
+
+    def finish(self) -> None:
+        print(self.line())
+
+
+async def _run_async(items: List[Any], operation: Callable[[Any], Any], concurrency: int,
+                     on_result: Callable[[Any, Any, Optional[BaseException]], None],
+                     reporter: ThroughputReporter) -> None:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async def run_one(item: Any) -> None:
+            async with semaphore:
+                try:
+                    result, error = await loop.run_in_executor(pool, operation, item), None
+                except Exception as e:
+                    result, error = None, e
+            on_result(item, result, error)
+            reporter.completed()
+
+        await asyncio.gather(*(run_one(item) for item in items))
+
+
+def _run_threads(items: List[Any], operation: Callable[[Any], Any], concurrency: int,
+                 on_result: Callable[[Any, Any, Optional[BaseException]], None],
+                 reporter: ThroughputReporter) -> None:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(operation, item): item for item in items}
+        for future in as_completed(futures):
+            error = future.exception()
+            on_result(futures[future], None if error else future.result(), error)
+            reporter.completed()
+
+
+def in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def run_operations(items: Iterable[Any], operation: Callable[[Any], Any],
+                   on_result: Callable[[Any, Any, Optional[BaseException]], None],
+                   concurrency: int = DEFAULT_CONCURRENCY, label: str = 'operations',
+                   bucket: Optional[CallLimitBucket] = None, use_asyncio: bool = True) -> Dict[str, Any]:
+    """Run operation(item) for every item with up to `concurrency` in flight.
+
+    on_result(item, result, error) is called on the calling thread's side of
+    the executor as each operation completes (in completion order), so it may
+    print and log without locking. Returns elapsed time and throughput.
+    """
+    items = list(items)
+    reporter = ThroughputReporter(label, len(items), bucket)
+    if items:
+        if use_asyncio and not in_event_loop():
+            asyncio.run(_run_async(items, operation, max(concurrency, 1), on_result, reporter))
+        else:
+            _run_threads(items, operation, max(concurrency, 1), on_result, reporter)
+        reporter.finish()
+
+    elapsed = time.perf_counter() - reporter.start
+    return {'operations': len(items), 'seconds': elapsed,
+            'per_second': len(items) / elapsed if elapsed > 0 else 0.0}
+
+
+def concurrency_from_argv(argv: List[str]) -> int:
+    """Concurrent requests from --concurrency N (default 8)."""
+    if '--concurrency' in argv:
+        return max(int(argv[argv.index('--concurrency') + 1]), 1)
+    return DEFAULT_CONCURRENCY
+
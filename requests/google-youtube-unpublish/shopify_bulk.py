@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Shopify Bulk Catalog Fetch
+Reads every product's `custom.google_ads_exclude` metafield and its Google &
+YouTube publication status with one Bulk Operation (bulkOperationRunQuery)
+instead of paging products.json and making one metafields.json call per
+product.
+
+Flow:
+    1. bulkOperationRunQuery starts the export job
+    2. currentBulkOperation is polled until the job finishes
+    3. the JSONL result (one product per line) is downloaded and parsed
+       line by line, so the file is never held in memory
+
+SHOPIFY_STORE may be a full base URL (e.g. http://127.0.0.1:8765) to run
+against the offline stand-in server in mock_shopify.py.
+
+Usage:
+    python3 shopify_bulk.py [--publication-id ID] [--out catalog_state.jsonl]
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+
+from publish_executor import MAX_RETRIES, CallLimitBucket
+
+SHOPIFY_STORE = os.getenv('SHOPIFY_STORE', 'rudis.myshopify.com')
+SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN', '')
+SHOPIFY_API_VERSION = '2024-01'  # Update as needed
+
+# Metafield configuration (set by Shopify Flow)
+METAFIELD_NAMESPACE = 'custom'
+METAFIELD_KEY = 'google_ads_exclude'
+
+# Seconds between currentBulkOperation polls, and the overall wait limit
+POLL_INTERVAL = 2.0
+POLL_TIMEOUT = 3600.0
+FINISHED_STATUSES = ('COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED')
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+BULK_RUN_MUTATION = """
+mutation bulkRun($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+CURRENT_BULK_QUERY = """
+query {
+  currentBulkOperation {
+    id status errorCode objectCount url partialDataUrl
+  }
+}
+"""
+
+
+def admin_url(store: str) -> str:
+    """Admin API base URL for a shop domain (or a full base URL, e.g. the local mock)."""
+    base = store.rstrip('/') if '://' in store else f"https://{store}"
+    return f"{base}/admin/api/{SHOPIFY_API_VERSION}"
+
+
+def api_headers(token: str) -> Dict[str, str]:
+    return {
+        'X-Shopify-Access-Token': token,
+        'Content-Type': 'application/json'
+    }
+
+
+def gid(resource: str, resource_id: Any) -> str:
+    """GraphQL global ID for a numeric REST ID (IDs that are already global are returned as is)."""
+    value = str(resource_id)
+    return value if value.startswith('gid://') else f"gid://shopify/{resource}/{value}"
+
+
+def legacy_id(global_id: str) -> int:
+    """Numeric REST ID from a GraphQL global ID."""
+    return int(global_id.rsplit('/', 1)[-1])
+
+
+def graphql(store: str, token: str, query: str, variables: Optional[Dict[str, Any]] = None,
+            bucket: Optional[CallLimitBucket] = None, cost: float = 1.0, full_response: bool = False) -> Dict[str, Any]:
+    """Run a GraphQL Admin API request and return its `data`. Raises RuntimeError on GraphQL errors.
+
+    With a bucket, `cost` points are reserved before sending, the bucket is
+    re-synced from the response's throttleStatus, and THROTTLED responses
+    are retried once enough points have been restored. With full_response,
+    the whole body (data, errors, extensions) is returned instead and only
+    persistent throttling raises.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if bucket is not None:
+            bucket.acquire(cost)
+        response = requests.post(f"{admin_url(store)}/graphql.json", headers=api_headers(token),
+                                 json={'query': query, 'variables': variables or {}})
+        response.raise_for_status()
+        body = response.json()
+        cost_info = body.get('extensions', {}).get('cost', {})
+        throttle_status = cost_info.get('throttleStatus')
+        if bucket is not None and throttle_status:
+            bucket.observe_throttle_status(throttle_status)
+
+        errors = body.get('errors') or []
+        throttled = any((error.get('extensions') or {}).get('code') == 'THROTTLED' for error in errors)
+        if throttled and attempt < MAX_RETRIES:
+            if bucket is not None:
+                bucket.throttled()
+            # Wait for the points this query actually needs, which may exceed the estimate
+            requested = max(float(cost_info.get('requestedQueryCost') or 0), cost)
+            shortfall = requested - throttle_status['currentlyAvailable'] if throttle_status else requested
+            time.sleep(max(shortfall, 1.0) / (throttle_status['restoreRate'] if throttle_status else 50.0))
+            continue
+        if errors and (throttled or not full_response):
+            raise RuntimeError(f"GraphQL error: {'; '.join(error.get('message', '') for error in errors)}")
+        return body if full_response else body['data']
+
+
+def catalog_state_query(publication_id: Optional[str] = None) -> str:
+    """Bulk query for product IDs, handles, the exclude metafield and (optionally) publication status."""
+    published = f'\n        publishedOnPublication(publicationId: "{gid("Publication", publication_id)}")' \
+        if publication_id else ''
+    return f"""
+{{
+  products {{
+    edges {{
+      node {{
+        id
+        handle
+        title
+        status
+        metafield(namespace: "{METAFIELD_NAMESPACE}", key: "{METAFIELD_KEY}") {{ value }}{published}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def run_bulk_query(store: str, token: str, query: str, poll_interval: float = POLL_INTERVAL,
+                   timeout: float = POLL_TIMEOUT) -> Optional[str]:
+    """Start a bulk query and wait for it. Returns the JSONL result URL (None if it matched nothing).
+
+    Raises RuntimeError if the job cannot start or does not complete.
+    """
+    result = graphql(store, token, BULK_RUN_MUTATION, {'query': query})['bulkOperationRunQuery']
+    if result['userErrors']:
+        raise RuntimeError(f"Bulk operation not started: {'; '.join(e['message'] for e in result['userErrors'])}")
+    operation_id = result['bulkOperation']['id']
+
+    deadline = time.monotonic() + timeout
+    while True:
+        operation = graphql(store, token, CURRENT_BULK_QUERY)['currentBulkOperation']
+        if operation is None or operation['id'] != operation_id:
+            raise RuntimeError(f"Bulk operation {operation_id} is no longer the current operation")
+        if operation['status'] in FINISHED_STATUSES:
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Bulk operation {operation_id} still {operation['status']} after {timeout:.0f}s")
+        time.sleep(poll_interval)
+
+    if operation['status'] != 'COMPLETED':
+        raise RuntimeError(f"Bulk operation {operation_id} {operation['status']} ({operation.get('errorCode')})")
+    return operation['url']
+
+
+def iter_jsonl(url: str) -> Iterator[Dict[str, Any]]:
+    """Stream-parse a JSONL result, one object per line."""
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            if line:
+                yield json.loads(line)
+
+
+def product_state(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Product dict from a bulk result line ('exclude' is None when the metafield is unset)."""
+    metafield = record.get('metafield')
+    value = metafield.get('value') if metafield else None
+    return {
+        'id': legacy_id(record['id']),
+        'handle': record.get('handle', ''),
+        'title': record.get('title', ''),
+        'status': record.get('status', ''),
+        'exclude': None if value is None else (value == 'true' or value is True),
+        'published': record.get('publishedOnPublication')
+    }
+
+
+def iter_catalog_state(store: str, token: str, publication_id: Optional[str] = None,
+                       poll_interval: float = POLL_INTERVAL) -> Iterator[Dict[str, Any]]:
+    """Every product's exclude flag and publication status, from one bulk operation."""
+    url = run_bulk_query(store, token, catalog_state_query(publication_id), poll_interval)
+    if url is None:
+        return
+    for record in iter_jsonl(url):
+        yield product_state(record)
+
+
+def main():
+    """Main execution function."""
+    if not SHOPIFY_ACCESS_TOKEN:
+        print("ERROR: SHOPIFY_ACCESS_TOKEN not set")
+        sys.exit(1)
+
+    publication_id = sys.argv[sys.argv.index('--publication-id') + 1] if '--publication-id' in sys.argv \
+        else os.getenv('GOOGLE_YOUTUBE_PUBLICATION_ID') or None
+    out_path = Path(sys.argv[sys.argv.index('--out') + 1]) if '--out' in sys.argv else None
+
+    print("Running bulk catalog export...")
+    start = time.perf_counter()
+    counts = {'products': 0, 'exclude_true': 0, 'exclude_false': 0, 'no_metafield': 0, 'published': 0}
+    out = open(out_path, 'w', encoding='utf-8') if out_path else None
+    try:
+        for product in iter_catalog_state(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, publication_id):
+            counts['products'] += 1
+            if product['exclude'] is None:
+                counts['no_metafield'] += 1
+            else:
+                counts['exclude_true' if product['exclude'] else 'exclude_false'] += 1
+            if product['published']:
+                counts['published'] += 1
+            if out:
+                out.write(json.dumps(product) + '\n')
+    finally:
+        if out:
+            out.close()
+
+    print(f"✅ {counts['products']:,} products in {time.perf_counter() - start:.1f}s")
+    print(f"   google_ads_exclude: {counts['exclude_true']:,} true, {counts['exclude_false']:,} false, "
+          f"{counts['no_metafield']:,} unset")
+    if publication_id:
+        print(f"   Published to {publication_id}: {counts['published']:,}")
+    if out_path:
+        print(f"   Written to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Style × Size Stockout Cube
+Precomputed in-stock / out-of-stock variant counts over
+(product type, style, size, vendor, tag) for active products, where style is
+Option1 Value and size is Option2 Value.
+
+Cells are stored sparsely as parallel arrays: one int32 code column per
+dimension plus int64 in-stock and OOS counts. Because a product can carry many
+tags, every variant is counted once per tag *and* once in a tag-marginal cell
+(tag code 0), so roll-ups that don't involve tags never double count.
+
+Usage:
+    python3 stockout_cube.py build
+    python3 stockout_cube.py query --by size --where product_type=Singlet [--top 20] [--sort oos|rate]
+    python3 stockout_cube.py query --by style,size --where vendor=RUDIS --where tag=Wrestling
+"""
+
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from product_catalog import ProductGroup
+from variant_store import EMPTY_CODE, StringTable
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Path to products CSV (pre-filtered to Active products only)
+PRODUCTS_CSV = Path(__file__).parent / "AD_ACTIVE-PRODUCTS_Export_2025-11-04_141820" / "Products.csv"
+OUTPUT_CUBE = Path(__file__).parent / "stockout_cube.bin"
+
+DIMENSIONS = ('product_type', 'style', 'size', 'vendor', 'tag')
+TAG = DIMENSIONS.index('tag')
+
+MAGIC = b'RUDISCB1'
+
+# Tag code 0 marks the tag-marginal cell (all tags); real tags are never empty
+ALL_TAGS = EMPTY_CODE
+
+
+class StockoutCube:
+    """Sparse, array-backed OOS cube with filter / group-by roll-ups."""
+
+    def __init__(self, use_numpy: Optional[bool] = None):
+        self.use_numpy = (np is not None) if use_numpy is None else (use_numpy and np is not None)
+        self.tables = [StringTable() for _ in DIMENSIONS]
+        self.codes = [array('i') for _ in DIMENSIONS]
+        self.in_stock = array('q')
+        self.out_of_stock = array('q')
+        self._cells: Dict[Tuple[int, ...], List[int]] = {}
+
+    @classmethod
+    def from_products(cls, products: Iterable[ProductGroup], use_numpy: Optional[bool] = None) -> 'StockoutCube':
+        """Build a cube from grouped products (inactive products are skipped)."""
+        cube = cls(use_numpy)
+        for product in products:
+            cube.add_product(product)
+        cube.freeze()
+        return cube
+
+    def add_product(self, product: ProductGroup) -> None:
+        """Accumulate one product's variants into the cube."""
+        row = product.row
+        if row.status != 'Active':
+            return
+
+        type_code = self.tables[0].code(row.product_type)
+        vendor_code = self.tables[3].code(row.vendor)
+        tag_codes = [ALL_TAGS] + sorted({self.tables[TAG].code(tag.strip()) for tag in row.tags.split(',') if tag.strip()})
+
+        cells = self._cells
+        for variant in product.variants:
+            style_code = self.tables[1].code(variant.option1_value)
+            size_code = self.tables[2].code(variant.option2_value)
+            slot = 0 if variant.inventory_qty > 0 else 1
+            for tag_code in tag_codes:
+                key = (type_code, style_code, size_code, vendor_code, tag_code)
+                counts = cells.get(key)
+                if counts is None:
+                    counts = cells[key] = [0, 0]
+                counts[slot] += 1
+
+    def freeze(self) -> None:
+        """Move accumulated cells into the parallel arrays."""
+        for key, (in_stock, out_of_stock) in self._cells.items():
+            for column, code in zip(self.codes, key):
+                column.append(code)
+            self.in_stock.append(in_stock)
+            self.out_of_stock.append(out_of_stock)
+        self._cells = {}
+
+    @property
+    def num_cells(self) -> int:
+        return len(self.in_stock)
+
+    def query(self, group_by: Sequence[str], filters: Optional[Dict[str, str]] = None) -> List[Dict[str, object]]:
+        """Roll up in-stock / OOS counts by `group_by` dims, restricted to `filters`.
+
+        Returns one dict per group with the dimension values, `in_stock`,
+        `out_of_stock` and `oos_rate` (percentage), sorted by OOS count.
+        """
+        filters = filters or {}
+        for dim in list(group_by) + list(filters):
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {dim!r}; expected one of {', '.join(DIMENSIONS)}")
+
+        group_dims = [DIMENSIONS.index(dim) for dim in group_by]
+        uses_tags = 'tag' in group_by or 'tag' in filters
+
+        # Resolve filter values to codes; an unknown value matches nothing
+        filter_codes = []
+        for dim, value in filters.items():
+            index = DIMENSIONS.index(dim)
+            code = self.tables[index].codes.get(value)
+            if code is None:
+                return []
+            filter_codes.append((index, code))
+
+        if self.use_numpy:
+            totals = self._query_numpy(group_dims, filter_codes, uses_tags)
+        else:
+            totals = self._query_python(group_dims, filter_codes, uses_tags)
+
+        results = []
+        for key, (in_stock, out_of_stock) in totals.items():
+            total = in_stock + out_of_stock
+            result = {dim: self.tables[DIMENSIONS.index(dim)][code] for dim, code in zip(group_by, key)}
+            result.update({
+                'in_stock': in_stock,
+                'out_of_stock': out_of_stock,
+                'oos_rate': round(out_of_stock / total * 100, 1) if total else 0
+            })
+            results.append(result)
+        results.sort(key=lambda r: (r['out_of_stock'], r['oos_rate']), reverse=True)
+        return results
+
+    def _query_python(self, group_dims: List[int], filter_codes: List[Tuple[int, int]],
+                      uses_tags: bool) -> Dict[Tuple[int, ...], List[int]]:
+        totals: Dict[Tuple[int, ...], List[int]] = {}
+        codes = self.codes
+        tag_column = codes[TAG]
+        for i in range(self.num_cells):
+            if (tag_column[i] != ALL_TAGS) != uses_tags:
+                continue
+            if any(codes[index][i] != code for index, code in filter_codes):
+                continue
+            key = tuple(codes[index][i] for index in group_dims)
+            counts = totals.get(key)
+            if counts is None:
+                counts = totals[key] = [0, 0]
+            counts[0] += self.in_stock[i]
+            counts[1] += self.out_of_stock[i]
+        return totals
+
+    def _query_numpy(self, group_dims: List[int], filter_codes: List[Tuple[int, int]],
+                     uses_tags: bool) -> Dict[Tuple[int, ...], List[int]]:
+        codes = [np.frombuffer(column, dtype=np.int32) for column in self.codes]
+        in_stock = np.frombuffer(self.in_stock, dtype=np.int64)
+        out_of_stock = np.frombuffer(self.out_of_stock, dtype=np.int64)
+
+        mask = (codes[TAG] != ALL_TAGS) if uses_tags else (codes[TAG] == ALL_TAGS)
+        for index, code in filter_codes:
+            mask &= codes[index] == code
+        if not mask.any():
+            return {}
+
+        if not group_dims:
+            return {(): [int(in_stock[mask].sum()), int(out_of_stock[mask].sum())]}
+
+        keys = np.stack([codes[index][mask] for index in group_dims], axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        in_stock_totals = np.bincount(inverse, weights=in_stock[mask], minlength=len(unique_keys))
+        oos_totals = np.bincount(inverse, weights=out_of_stock[mask], minlength=len(unique_keys))
+        return {
+            tuple(key): [int(a), int(b)]
+            for key, a, b in zip(unique_keys.tolist(), in_stock_totals.tolist(), oos_totals.tolist())
+        }
+
+    def save(self, path: Path) -> None:
+        """Write the cube as header JSON (string tables) followed by raw arrays."""
+        header = json.dumps({
+            'dimensions': list(DIMENSIONS),
+            'tables': [table.values for table in self.tables],
+            'cells': self.num_cells,
+            'byteorder': sys.byteorder,
+        }, ensure_ascii=False).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for column in self.codes:
+                column.tofile(f)
+            self.in_stock.tofile(f)
+            self.out_of_stock.tofile(f)
+
+    @classmethod
+    def load(cls, path: Path, use_numpy: Optional[bool] = None) -> 'StockoutCube':
+        """Load a cube written by save()."""
+        cube = cls(use_numpy)
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a stockout cube file")
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            if header['dimensions'] != list(DIMENSIONS) or header['byteorder'] != sys.byteorder:
+                raise ValueError(f"{path} was written with a different layout; rebuild it")
+
+            for table, values in zip(cube.tables, header['tables']):
+                table.values = values
+                table.codes = {value: code for code, value in enumerate(values)}
+            for column in cube.codes:
+                column.fromfile(f, header['cells'])
+            cube.in_stock.fromfile(f, header['cells'])
+            cube.out_of_stock.fromfile(f, header['cells'])
+        return cube
+
+
+def parse_filters(argv: List[str]) -> Dict[str, str]:
+    """Collect repeated `--where dim=value` arguments."""
+    filters = {}
+    for i, arg in enumerate(argv):
+        if arg == '--where' and i + 1 < len(argv):
+            dim, _, value = argv[i + 1].partition('=')
+            filters[dim.strip()] = value.strip()
+    return filters
+
+
+def print_results(results: List[Dict[str, object]], group_by: Sequence[str], top: int) -> None:
+    """Print query results as a markdown table."""
+    headers = [dim.replace('_', ' ').title() for dim in group_by] + ['In Stock', 'OOS', 'OOS %']
+    print('| ' + ' | '.join(headers) + ' |')
+    print('|' + '|'.join('-' * (len(h) + 2) for h in headers) + '|')
+    for result in results[:top]:
+        values = [str(result[dim]) or '(none)' for dim in group_by]
+        values += [f"{result['in_stock']:,}", f"{result['out_of_stock']:,}", f"{result['oos_rate']}%"]
+        print('| ' + ' | '.join(values) + ' |')
+    if len(results) > top:
+        print(f"\n*... and {len(results) - top} more groups*")
+
+
+def main():
+    """Build the cube or run a roll-up query against it."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'query'
+
+    if command == 'build':
+        # Imported here so queries don't pay for the CSV reader imports
+        from export_cache import iter_cached_products
+        if not PRODUCTS_CSV.exists():
+            print(f"ERROR: Products CSV not found at {PRODUCTS_CSV}")
+            return
+        cube = StockoutCube.from_products(iter_cached_products(PRODUCTS_CSV))
+        cube.save(OUTPUT_CUBE)
+        print(f"✅ Built stockout cube with {cube.num_cells:,} cells: {OUTPUT_CUBE}")
+        return
+
+    if command != 'query':
+        print(f"ERROR: Unknown command {command!r} (expected 'build' or 'query')")
+        sys.exit(1)
+
+    if not OUTPUT_CUBE.exists():
+        print(f"ERROR: Cube not found at {OUTPUT_CUBE}. Run analyze_inventory.py or 'stockout_cube.py build' first.")
+        sys.exit(1)
+
+    group_by = ['size']
+    if '--by' in sys.argv:
+        group_by = [dim.strip() for dim in sys.argv[sys.argv.index('--by') + 1].split(',') if dim.strip()]
+    top = int(sys.argv[sys.argv.index('--top') + 1]) if '--top' in sys.argv else 20
+
+    cube = StockoutCube.load(OUTPUT_CUBE)
+    results = cube.query(group_by, parse_filters(sys.argv))
+    if '--sort' in sys.argv and sys.argv[sys.argv.index('--sort') + 1] == 'rate':
+        results.sort(key=lambda r: (r['oos_rate'], r['out_of_stock']), reverse=True)
+    print_results(results, group_by, top)
+
+
+if __name__ == '__main__':
+    main()
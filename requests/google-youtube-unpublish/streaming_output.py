@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Streaming Output Writers
+Writes analysis results one product at a time instead of building the whole
+`analysis` dict and `json.dump`ing it.
+
+Formats:
+    pretty  - {"<products key>": [...], "stats": {...}} indented like json.dump(indent=2)
+    compact - same document without whitespace
+    ndjson  - one product object per line, followed by a final {"stats": {...}} line
+
+Stats are only known once every product has been seen, so they are written
+after the product list. Readers should look them up by key, not position.
+The document is written to `<path>.tmp` and renamed over `path` on close(),
+so a failed run leaves the previous analysis in place.
+
+Markdown reports are streamed the same way with write_markdown(), and list
+only the top `--report-top N` products (heap selection via top_products());
+the CSV output carries the full listing.
+"""
+
+import heapq
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+FORMATS = ('pretty', 'compact', 'ndjson')
+
+# Products listed in the markdown reports (the CSV always has all of them)
+DEFAULT_REPORT_TOP = 50
+
+
+def output_format(argv: List[str]) -> str:
+    """Pick the JSON output format from --ndjson / --compact flags (default pretty)."""
+    if '--ndjson' in argv:
+        return 'ndjson'
+    if '--compact' in argv:
+        return 'compact'
+    return 'pretty'
+
+
+def analysis_file(argv: List[str], default: Path) -> Path:
+    """Analysis file to read: --analysis PATH, else `default` (no guessing between formats)."""
+    if '--analysis' in argv:
+        return Path(argv[argv.index('--analysis') + 1])
+    return default
+
+
+def report_top(argv: List[str]) -> int:
+    """Number of products to list in markdown reports (--report-top N, default 50)."""
+    if '--report-top' in argv:
+        return max(int(argv[argv.index('--report-top') + 1]), 0)
+    return DEFAULT_REPORT_TOP
+
+
+def top_products(products: Iterable[Dict[str, Any]], n: int, key: Callable[[Dict[str, Any]], Any],
+                 largest: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+    """Select the first `n` products by `key` with a bounded heap. Returns (top, total seen).
+
+    Equivalent to sorted(products, key=key, reverse=largest)[:n] (ties keep
+    input order) in O(total log n) time and O(n) memory.
+    """
+    if n <= 0:
+        return [], sum(1 for _ in products)
+    total = 0
+
+    def counted() -> Iterator[Dict[str, Any]]:
+        nonlocal total
+        for product in products:
+            total += 1
+            yield product
+
+    select = heapq.nlargest if largest else heapq.nsmallest
+    top = select(n, counted(), key=key)
+    return top, total
+
+
+def write_markdown(path: Path, *sections: Iterable[str]) -> None:
+    """Write report lines to `path` as they are produced (newline-separated, no trailing newline)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        first = True
+        for section in sections:
+            for line in section:
+                f.write(line if first else '\n' + line)
+                first = False
+
+
+class AnalysisJsonWriter:
+    """Incrementally write an analysis document, one product at a time."""
+
+    def __init__(self, path: Path, products_key: str, fmt: str = 'pretty'):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        self.path = path
+        self.products_key = products_key
+        self.fmt = fmt
+        self.count = 0
+        self._tmp_path = path.with_name(path.name + '.tmp')
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        if fmt == 'pretty':
+            self._file.write('{\n  ' + json.dumps(products_key) + ': [')
+        elif fmt == 'compact':
+            self._file.write('{' + json.dumps(products_key) + ':[')
+
+    def _dumps(self, obj: Any) -> str:
+        if self.fmt == 'pretty':
+            return json.dumps(obj, indent=2, ensure_ascii=False)
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+    def write_product(self, product: Dict[str, Any]) -> None:
+        """Append one finalized product."""
+        text = self._dumps(product)
+        if self.fmt == 'ndjson':
+            self._file.write(text + '\n')
+        elif self.fmt == 'pretty':
+            separator = ',\n    ' if self.count else '\n    '
+            self._file.write(separator + text.replace('\n', '\n    '))
+        else:
+            self._file.write((',' if self.count else '') + text)
+        self.count += 1
+
+    def close(self, stats: Dict[str, Any]) -> None:
+        """Write the stats, finish the document and move it into place."""
+        if self.fmt == 'ndjson':
+            self._file.write(self._dumps({'stats': stats}) + '\n')
+        elif self.fmt == 'pretty':
+            closing = '\n  ]' if self.count else ']'
+            self._file.write(closing + ',\n  "stats": ' + self._dumps(stats).replace('\n', '\n  ') + '\n}')
+        else:
+            self._file.write('],"stats":' + self._dumps(stats) + '}')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self) -> 'AnalysisJsonWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.abort()
+
+    def abort(self) -> None:
+        """Discard an unfinished document; the previous file at the path stays in place."""
+        if not self._file.closed:
+            self._file.close()
+            self._tmp_path.unlink()
+
+
+def iter_ndjson_products(path: Path) -> Iterator[Dict[str, Any]]:
+    """Lazily yield product objects from an NDJSON analysis file (skips the stats line)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'stats' in record and 'product_id' not in record:
+                continue
+            yield record
+
+
+def iter_analysis_products(path: Path, products_key: str) -> Iterator[Dict[str, Any]]:
+    """Yield the products of an analysis file: NDJSON line by line, JSON documents loaded whole."""
+    if path.suffix == '.ndjson':
+        yield from iter_ndjson_products(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        analysis = json.load(f)
+    yield from analysis.get(products_key, [])
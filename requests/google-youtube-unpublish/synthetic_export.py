@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Synthetic Matrixify Export Generator
+Writes a seeded, realistic Products.csv in the Matrixify layout (UTF-8 BOM,
+one row per variant, `Top Row` on each product's first row, product columns
+repeated on every row) so the analyzers can be benchmarked without a store export.
+
+Catalog shape:
+    - Apparel (Color × Size), footwear (Color × Size × Width) and
+      single-variant accessories (`Title` / `Default Title`)
+    - Mostly Active products with some Draft / Archived
+    - Per-location `Inventory <State>: <Location>` columns; `Variant Inventory
+      Qty` is the sum of Available across locations
+    - Occasional multi-line `Body HTML`, quoted commas and negative stock
+
+Usage:
+    python3 synthetic_export.py --variants 100k [--seed 1] [--out bench_data/Products_100k.csv]
+"""
+
+import csv
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from location_inventory import INVENTORY_STATES
+
+OUTPUT_DIR = Path(__file__).parent / "bench_data"
+OPTIONS = ('--variants', '--seed', '--out')
+
+# Benchmark sizes (variant rows)
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+LOCATIONS = ['Warehouse', 'Retail Store', 'Team Sales']
+
+COLORS = ['Black', 'White', 'Navy', 'Red', 'Royal', 'Grey', 'Maroon', 'Green', 'Gold', 'Purple']
+APPAREL_SIZES = ['XS', 'SM', 'MD', 'LG', 'XL', '2XL', '3XL']
+SHOE_SIZES = [f"{half / 2:g}" for half in range(12, 30)]
+WIDTHS = ['Regular', 'Wide']
+
+# (product type, weight, option names, option value pools)
+PRODUCT_KINDS = [
+    ('Singlet', 30, ['Color', 'Size'], [COLORS, APPAREL_SIZES]),
+    ('T-Shirt', 25, ['Color', 'Size'], [COLORS, APPAREL_SIZES]),
+    ('Shorts', 15, ['Color', 'Size'], [COLORS, APPAREL_SIZES]),
+    ('Wrestling Shoes', 15, ['Color', 'Size', 'Width'], [COLORS, SHOE_SIZES, WIDTHS]),
+    ('Headgear', 10, ['Title'], [['Default Title']]),
+    ('Gift Card', 5, ['Title'], [['Default Title']]),
+]
+TAGS = ['Wrestling', 'Apparel', 'Footwear', 'Youth', 'Mens', 'Womens', 'Sale', 'New Arrival', 'Team']
+
+BASE_COLUMNS = [
+    'ID', 'Handle', 'Command', 'Title', 'Body HTML', 'Vendor', 'Type', 'Tags', 'Status', 'Published',
+    'Published At', 'URL', 'Top Row', 'Row #', 'Variant ID', 'Variant Command', 'Option1 Name', 'Option1 Value',
+    'Option2 Name', 'Option2 Value', 'Option3 Name', 'Option3 Value', 'Variant Position', 'Variant SKU',
+    'Variant Barcode', 'Variant Price', 'Variant Compare At Price', 'Variant Weight', 'Variant Weight Unit',
+    'Variant Inventory Tracker', 'Variant Inventory Policy', 'Variant Inventory Qty',
+]
+
+
+def parse_size(value: str) -> int:
+    """Parse a variant count such as '100k', '1m' or '2500'."""
+    value = value.strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    multiplier = 1
+    if value.endswith('k'):
+        multiplier, value = 1000, value[:-1]
+    elif value.endswith('m'):
+        multiplier, value = 1000000, value[:-1]
+    return int(float(value) * multiplier)
+
+
+def export_columns() -> List[str]:
+    """Full header: base columns plus one column per inventory state and location."""
+    columns = list(BASE_COLUMNS)
+    for state in INVENTORY_STATES:
+        for location in LOCATIONS:
+            columns.append(f"Inventory {state}: {location}")
+    return columns
+
+
+def product_variants(rng: random.Random, kind: Tuple) -> List[List[str]]:
+    """Pick the option value combinations offered by one product."""
+    _, _, _, pools = kind
+    if len(pools) == 1:
+        return [[pools[0][0]]]
+    colors = rng.sample(pools[0], rng.randint(1, 4))
+    sizes = pools[1]
+    start = rng.randint(0, 2)
+    sizes = sizes[start:start + rng.randint(3, len(sizes) - start)]
+    combos = [[color, size] for color in colors for size in sizes]
+    if len(pools) == 3:
+        combos = [combo + [width] for combo in combos for width in rng.sample(pools[2], rng.randint(1, 2))]
+    return combos
+
+
+def location_inventory(rng: random.Random, popularity: float) -> Dict[str, List[int]]:
+    """Per-state quantities for each location for one variant."""
+    quantities = {state: [0] * len(LOCATIONS) for state in INVENTORY_STATES}
+    for i in range(len(LOCATIONS)):
+        if rng.random() < popularity:
+            available = 0 if rng.random() < 0.6 else rng.randint(1, 3)
+        else:
+            available = rng.choice([0, 1, 2, 4, 8, 12, 24, 48])
+        if rng.random() < 0.01:
+            available = -rng.randint(1, 3)  # Oversold
+        committed = rng.randint(0, 2) if available > 0 else 0
+        quantities['Available'][i] = available
+        quantities['Committed'][i] = committed
+        quantities['On Hand'][i] = max(available, 0) + committed
+        quantities['Safety Stock'][i] = rng.choice([0, 0, 0, 1, 2])
+        quantities['Incoming'][i] = rng.choice([0] * 8 + [12, 24])
+        quantities['Damaged'][i] = 1 if rng.random() < 0.02 else 0
+    return quantities
+
+
+def body_html(rng: random.Random, title: str) -> str:
+    """Product description; some span several lines and contain commas and quotes."""
+    paragraphs = [f"<p>The {title}, built for competition.</p>"]
+    if rng.random() < 0.3:
+        paragraphs.append('<ul>\n<li>Moisture-wicking "Pro" fabric</li>\n<li>Sublimated, fade-resistant</li>\n</ul>')
+    return '\n'.join(paragraphs) if rng.random() < 0.5 else ''.join(paragraphs)
+
+
+def write_export(path: Path, num_variants: int, seed: int = 1) -> Tuple[int, int]:
+    """Write a synthetic export with exactly `num_variants` rows. Returns (products, variants)."""
+    rng = random.Random(seed)
+    columns = export_columns()
+    weights = [kind[1] for kind in PRODUCT_KINDS]
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    products = 0
+    variants = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:  # BOM like Matrixify
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        while variants < num_variants:
+            kind = rng.choices(PRODUCT_KINDS, weights)[0]
+            product_type, _, option_names, _ = kind
+            product_id = str(7000000000000 + products)
+            title = f"{rng.choice(COLORS)} {product_type} {products}"
+            handle = title.lower().replace(' ', '-')
+            status = rng.choices(['Active', 'Draft', 'Archived'], [90, 6, 4])[0]
+            published = 'TRUE' if status == 'Active' else 'FALSE'
+            tags = ', '.join(rng.sample(TAGS, rng.randint(0, 4)))
+            popularity = rng.random()
+            description = body_html(rng, title)
+            price = rng.choice([24.99, 34.99, 44.99, 64.99, 129.99])
+            compare_at = round(price * rng.choice([1.25, 1.5]), 2) if rng.random() < 0.2 else None
+
+            combos = product_variants(rng, kind)[:num_variants - variants]
+            for position, values in enumerate(combos, start=1):
+                variant_index = variants + position
+                quantities = location_inventory(rng, popularity)
+                options = []
+                for i in range(3):
+                    options.extend([option_names[i], values[i]] if i < len(values) else ['', ''])
+                row = [
+                    product_id, handle, 'MERGE', title, description, 'RUDIS', product_type, tags, status, published,
+                    '2025-01-15 09:00:00 -0700' if published == 'TRUE' else '', f"https://www.rudis.com/products/{handle}",
+                    'TRUE' if position == 1 else '', str(variant_index), str(40000000000000 + variant_index), 'MERGE',
+                    *options, str(position), f"RUD-{products}-{'-'.join(values)}".upper().replace(' ', ''),
+                    f"{800000000000 + variant_index}", f"{price:.2f}",
+                    f"{compare_at:.2f}" if compare_at else '', '0.4', 'lb', 'shopify', 'deny',
+                    str(sum(quantities['Available'])),
+                ]
+                for state in INVENTORY_STATES:
+                    row.extend(str(qty) for qty in quantities[state])
+                writer.writerow(row)
+            products += 1
+            variants += len(combos)
+
+    return products, variants
+
+
+def main():
+    """Main execution function."""
+    # Every argument is an option followed by its value
+    flags = sys.argv[1::2]
+    if len(sys.argv) % 2 == 0 or any(flag not in OPTIONS for flag in flags):
+        print(__doc__)
+        sys.exit(1)
+
+    size = sys.argv[sys.argv.index('--variants') + 1] if '--variants' in sys.argv else '10k'
+    seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else 1
+    num_variants = parse_size(size)
+    out = Path(sys.argv[sys.argv.index('--out') + 1]) if '--out' in sys.argv else OUTPUT_DIR / f"Products_{size}_seed{seed}.csv"
+
+    products, variants = write_export(out, num_variants, seed)
+    print(f"✅ Wrote {products:,} products / {variants:,} variants ({out.stat().st_size / 1e6:.1f} MB): {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+API Client Checks Against the Mock Shop
+Runs the Shopify clients (bulk fetch, publication snapshot, concurrent REST
+changes, batched GraphQL mutations) against a fresh mock_shopify.py server per
+test and compares the results with the server's state.
+
+Usage:
+    python3 -m pytest test_mock_shopify.py
+"""
+
+import contextlib
+import io
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+import pytest
+import requests
+
+import automated_unpublish
+import shopify_bulk
+import unpublish_products
+from mock_shopify import (FIRST_PRODUCT_ID, GOOGLE_PUBLICATION_ID, GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE,
+                          MAX_QUERY_COST, LeakyBucket, MockShop, start_server)
+from publication_mutations import PublicationBatcher
+from publication_snapshot import PublicationSnapshot
+from publish_executor import CallLimitBucket, ThrottledSession, run_operations
+
+NUM_PRODUCTS = 1000
+SEED = 1
+# Faster-draining REST bucket so the rate-limited checks take seconds, not minutes
+REST_LIMIT = (40, 60.0)
+CONCURRENCY = 8
+# GraphQL restore rate for checks that are about batching rather than pacing
+GRAPHQL_FAST_RESTORE_RATE = 1000.0
+
+
+@pytest.fixture
+def shop() -> MockShop:
+    return MockShop(NUM_PRODUCTS, SEED, bulk_delay=0.2, rest_limit=REST_LIMIT, latency=0.01)
+
+
+@pytest.fixture
+def base_url(shop: MockShop):
+    server, url = start_server(shop)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def session() -> ThrottledSession:
+    return ThrottledSession(CallLimitBucket(*REST_LIMIT))
+
+
+@pytest.fixture
+def snapshot(base_url: str, session: ThrottledSession) -> PublicationSnapshot:
+    return PublicationSnapshot(base_url, 'test', GOOGLE_PUBLICATION_ID, session).load()
+
+
+@pytest.fixture
+def states(base_url: str) -> List[Dict[str, Any]]:
+    return list(shopify_bulk.iter_catalog_state(base_url, 'test', GOOGLE_PUBLICATION_ID, poll_interval=0.05))
+
+
+def google_members(shop: MockShop) -> Dict[int, int]:
+    return shop.publications[GOOGLE_PUBLICATION_ID]
+
+
+def expected_changes(shop: MockShop) -> Dict[str, Set[int]]:
+    """Products the sync should unpublish / republish, from the shop's own state."""
+    expected = {'unpublish': set(), 'republish': set()}
+    for product_id, product in shop.products.items():
+        published = shop.is_published(GOOGLE_PUBLICATION_ID, product_id)
+        if product['exclude'] == 'true' and published:
+            expected['unpublish'].add(product_id)
+        elif product['exclude'] == 'false' and not published:
+            expected['republish'].add(product_id)
+    return expected
+
+
+def run_concurrent_changes(states: List[Dict[str, Any]], snapshot: PublicationSnapshot,
+                           session: ThrottledSession) -> List[int]:
+    """Unpublish / republish every partitioned product through the worker pool. Returns failed product IDs."""
+    partitions = automated_unpublish.partition_products(states)
+    failures = []
+
+    def on_result(product: Dict[str, Any], result: Any, error: Optional[BaseException]) -> None:
+        if error is not None or not result:
+            failures.append(product['id'])
+
+    run_operations(partitions['unpublish'], lambda product: snapshot.unpublish(product['id']),
+                   on_result, CONCURRENCY, 'unpublish', session.bucket)
+    run_operations(partitions['republish'], lambda product: snapshot.publish(product['id']),
+                   on_result, CONCURRENCY, 'republish', session.bucket)
+    return failures
+
+
+def fast_graphql_bucket(shop: MockShop) -> CallLimitBucket:
+    """Let the shop's GraphQL bucket restore 1000 points/s and return a client bucket matching it."""
+    shop.graphql_bucket = LeakyBucket(GRAPHQL_BUCKET_SIZE, GRAPHQL_FAST_RESTORE_RATE)
+    return CallLimitBucket(GRAPHQL_BUCKET_SIZE, GRAPHQL_FAST_RESTORE_RATE)
+
+
+def graphql_unpublish(shop: MockShop, base_url: str, session: ThrottledSession) -> Dict[str, Any]:
+    """Unpublish 150 published products (every 50th failing) and 2 unpublished ones over GraphQL.
+
+    Mutations cost more than the client's initial estimate, so early batches
+    are rejected with MAX_COST_EXCEEDED.
+    """
+    fast_graphql_bucket(shop)
+    shop.mutation_cost = 25
+    published = sorted(google_members(shop))[:150]
+    shop.failing_products = set(published[::50])
+    not_published = sorted(set(shop.products) - set(google_members(shop)))[:2]
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = unpublish_products.unpublish_products_batch(
+            base_url, 'test', GOOGLE_PUBLICATION_ID, [str(product_id) for product_id in published + not_published],
+            dry_run=False, session=session, use_graphql=True)
+    return {'published': published, 'not_published': not_published, 'results': results}
+
+
+def test_bulk_fetch_returns_every_product_once(shop, states):
+    assert sorted(state['id'] for state in states) == sorted(shop.products)
+
+
+def test_bulk_fetch_reads_exclude_metafield(shop, states):
+    for state in states:
+        flag = shop.products[state['id']]['exclude']
+        assert state['exclude'] == (None if flag is None else flag == 'true')
+
+
+def test_bulk_fetch_reads_publication_status(shop, states):
+    for state in states:
+        assert state['published'] == shop.is_published(GOOGLE_PUBLICATION_ID, state['id'])
+
+
+def test_partitions_match_flags_and_publication_state(shop, states):
+    partitions = automated_unpublish.partition_products(states)
+    expected = expected_changes(shop)
+    assert {product['id'] for product in partitions['unpublish']} == expected['unpublish']
+    assert {product['id'] for product in partitions['republish']} == expected['republish']
+    assert sum(len(products) for products in partitions.values()) == len(shop.products)
+
+
+def test_snapshot_pages_all_memberships(shop, snapshot):
+    assert snapshot.stats['pages'] > 1
+    assert snapshot.members == google_members(shop)
+
+
+def test_snapshot_stays_current_through_publish_and_unpublish(shop, states, snapshot):
+    partitions = automated_unpublish.partition_products(states)
+    for product in partitions['unpublish'][:20]:
+        assert snapshot.unpublish(product['id'])
+    for product in partitions['republish'][:20]:
+        assert snapshot.publish(product['id'])
+    assert snapshot.members == google_members(shop)
+
+
+def test_concurrent_changes_all_succeed(states, snapshot, session):
+    assert run_concurrent_changes(states, snapshot, session) == []
+
+
+def test_concurrent_changes_reach_expected_state(shop, states, snapshot, session):
+    expected = expected_changes(shop)
+    before = set(google_members(shop))
+    run_concurrent_changes(states, snapshot, session)
+    assert set(google_members(shop)) == (before - expected['unpublish']) | expected['republish']
+    assert snapshot.members == google_members(shop)
+
+
+def test_client_rate_limiting_avoids_429(shop, states, snapshot, session):
+    run_concurrent_changes(states, snapshot, session)
+    assert session.bucket.stats['waits'] > 0
+    assert shop.request_counts['429 Too Many Requests'] == 0
+
+
+def test_concurrent_publish_of_one_product_sends_one_request(shop, snapshot):
+    product_id = min(set(shop.products) - set(google_members(shop)))
+    results = []
+    run_operations(range(CONCURRENCY), lambda _: snapshot.publish(product_id),
+                   lambda item, result, error: results.append(error or result), CONCURRENCY, 'publish')
+    assert sorted(results) == [False] * (CONCURRENCY - 1) + [True]
+    assert shop.request_counts['POST publications/{id}/product_publications.json'] == 1
+    assert snapshot.stats['published'] == 1
+
+
+def test_mock_enforces_rest_call_limit(shop, snapshot):
+    statuses = Counter()
+    run_operations(range(200), lambda _: requests.get(f"{snapshot.url}.json", headers={'X-Shopify-Access-Token': 'test'},
+                                                      params={'limit': 1}).status_code,
+                   lambda item, status, error: statuses.update([status]), CONCURRENCY, 'unthrottled')
+    assert statuses[429] > 0
+    assert shop.request_counts['429 Too Many Requests'] == statuses[429]
+
+
+def test_graphql_calls_adapt_to_throttle_status(shop, base_url):
+    # A tight GraphQL bucket the client has to learn from throttleStatus
+    shop.graphql_bucket = LeakyBucket(20, 200.0)
+    bucket = CallLimitBucket(GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE)
+    errors = []
+    run_operations(range(200), lambda _: shopify_bulk.graphql(base_url, 'test', shopify_bulk.CURRENT_BULK_QUERY,
+                                                              bucket=bucket, cost=1),
+                   on_result=lambda item, result, error: error and errors.append(error),
+                   concurrency=CONCURRENCY, label='graphql', bucket=bucket)
+    assert errors == []
+    assert bucket.capacity == 20
+
+
+def test_graphql_batches_resize_to_cost_limit(shop, base_url, session):
+    run = graphql_unpublish(shop, base_url, session)
+    splits = shop.request_counts['GraphQL MAX_COST_EXCEEDED']
+    batches = shop.request_counts['GraphQL publication mutations'] - splits
+    assert splits > 0
+    assert batches <= math.ceil(len(run['published']) / (MAX_QUERY_COST / shop.mutation_cost)) + 1
+
+
+def test_graphql_user_errors_map_to_their_product_ids(shop, base_url, session):
+    run = graphql_unpublish(shop, base_url, session)
+    results = run['results']
+    assert results['success'] == len(run['published']) - len(shop.failing_products)
+    assert results['failed'] == len(shop.failing_products)
+    assert results['not_published'] == len(run['not_published'])
+    assert {int(error['product_id']) for error in results['errors']} == shop.failing_products
+
+
+def test_graphql_unpublish_leaves_only_failed_products_published(shop, base_url, session):
+    run = graphql_unpublish(shop, base_url, session)
+    members = set(google_members(shop))
+    assert not (set(run['published']) - shop.failing_products) & members
+    assert shop.failing_products <= members
+
+
+def test_graphql_publish_skips_published_and_fails_unknown_product(shop, base_url, session, snapshot):
+    published = graphql_unpublish(shop, base_url, session)['published']
+    snapshot.load()
+    outcomes = Counter()
+    errors = []
+
+    def on_publish(product_id: int, changed: Any, error: Optional[BaseException]) -> None:
+        outcomes.update(['error' if error else 'published' if changed else 'skipped'])
+        if error is not None:
+            errors.append(product_id)
+
+    missing_product = FIRST_PRODUCT_ID - 1
+    PublicationBatcher(base_url, 'test', GOOGLE_PUBLICATION_ID, fast_graphql_bucket(shop), snapshot=snapshot).run(
+        'publish', published + [missing_product], on_publish)
+    assert errors == [missing_product]
+    assert outcomes['skipped'] == len(shop.failing_products)
+    assert outcomes['published'] == len(published) - len(shop.failing_products)
+
+
+def test_snapshot_records_graphql_changes(shop, base_url, snapshot):
+    product_ids = sorted(set(shop.products) - set(google_members(shop)))[:5]
+    PublicationBatcher(base_url, 'test', GOOGLE_PUBLICATION_ID, snapshot=snapshot).run(
+        'publish', product_ids, lambda item, changed, error: None)
+    assert set(snapshot.members) == set(google_members(shop))
+    # Published through GraphQL, so the REST unpublish has to look up the product_publication ID
+    assert snapshot.unpublish(product_ids[0])
+    assert not shop.is_published(GOOGLE_PUBLICATION_ID, product_ids[0])
+
+
+def test_over_cost_mutation_fails_only_its_product(shop, base_url):
+    shop.mutation_cost = MAX_QUERY_COST + 1
+    product_ids = sorted(google_members(shop))[:3]
+    outcomes = Counter()
+    stats = PublicationBatcher(base_url, 'test', GOOGLE_PUBLICATION_ID, fast_graphql_bucket(shop)).run(
+        'unpublish', product_ids, lambda item, changed, error: outcomes.update(['error' if error else 'changed']))
+    assert outcomes == {'error': 3}
+    assert stats['failed'] == 3
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Unpublish Threshold Sweep
+Answers "what if the cut-off were 3, 4, 6 or 8?" for the Google & YouTube
+unpublish rule without re-running the analysis per threshold.
+
+One pass over the products builds a histogram keyed by
+(total variants, in-stock variants, core sizes offered, core sizes in stock).
+Every rule — in-stock thresholds, in-stock ratios and core-size rules — is then
+evaluated against the histogram, whose size depends on the variety of
+variant counts rather than the size of the catalog.
+
+Used by `analyze_products.py --sweep` and the `sweep` pipeline stage.
+"""
+
+import csv
+from collections import Counter, namedtuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from product_catalog import ProductGroup
+
+# Sizes merchandising treats as core; a product missing these is hard to buy
+CORE_SIZES = ('SM', 'MD', 'LG', 'XL')
+
+DEFAULT_THRESHOLDS = [3, 4, 5, 6, 8]
+DEFAULT_RATIOS = [0.4, 0.5]
+DEFAULT_CORE_MINIMUMS = [3, 4]
+
+HistogramKey = namedtuple('HistogramKey', ['total', 'in_stock', 'core_total', 'core_in_stock'])
+Rule = namedtuple('Rule', ['name', 'matches'])
+
+
+def histogram_key(product: ProductGroup, core_sizes: Sequence[str] = CORE_SIZES) -> HistogramKey:
+    """Summarize one product's variants into its histogram bucket."""
+    in_stock = 0
+    core_offered = set()
+    core_stocked = set()
+    for row in product.variants:
+        if row.inventory_qty > 0:
+            in_stock += 1
+        for value in (row.option1_value, row.option2_value, row.option3_value):
+            if value in core_sizes:
+                core_offered.add(value)
+                if row.inventory_qty > 0:
+                    core_stocked.add(value)
+    return HistogramKey(len(product.variants), in_stock, len(core_offered), len(core_stocked))
+
+
+def build_histogram(products: Iterable[ProductGroup], core_sizes: Sequence[str] = CORE_SIZES) -> Counter:
+    """Count products per histogram bucket in a single pass."""
+    return Counter(histogram_key(product, core_sizes) for product in products)
+
+
+def threshold_rule(threshold: int) -> Rule:
+    """Unpublish if `threshold` or fewer variants are in stock (the current rule uses 5)."""
+    return Rule(f"≤{threshold} in-stock variants", lambda key: key.in_stock <= threshold)
+
+
+def ratio_rule(ratio: float) -> Rule:
+    """Unpublish if under `ratio` of the product's variants are in stock."""
+    return Rule(f"<{ratio:.0%} of variants in stock", lambda key: key.total > 0 and key.in_stock / key.total < ratio)
+
+
+def core_size_rule(minimum: int) -> Rule:
+    """Unpublish if fewer than `minimum` core sizes are in stock.
+
+    Products offering fewer than `minimum` core sizes must have all of them in
+    stock; products offering no core sizes are never matched.
+    """
+    return Rule(
+        f"<{minimum} core sizes in stock",
+        lambda key: key.core_total > 0 and key.core_in_stock < min(minimum, key.core_total)
+    )
+
+
+def default_rules(thresholds: Sequence[int] = DEFAULT_THRESHOLDS,
+                  ratios: Sequence[float] = DEFAULT_RATIOS,
+                  core_minimums: Sequence[int] = DEFAULT_CORE_MINIMUMS) -> List[Rule]:
+    """Build the rule set compared by the sweep."""
+    rules = [threshold_rule(threshold) for threshold in thresholds]
+    rules.extend(ratio_rule(ratio) for ratio in ratios)
+    rules.extend(core_size_rule(minimum) for minimum in core_minimums)
+    return rules
+
+
+def rules_from_argv(argv: List[str]) -> List[Rule]:
+    """Build the sweep rules from optional --thresholds / --ratios / --core-min flags."""
+    thresholds = DEFAULT_THRESHOLDS
+    ratios = DEFAULT_RATIOS
+    core_minimums = DEFAULT_CORE_MINIMUMS
+    if '--thresholds' in argv:
+        thresholds = parse_list(argv[argv.index('--thresholds') + 1], int)
+    if '--ratios' in argv:
+        ratios = parse_list(argv[argv.index('--ratios') + 1], float)
+    if '--core-min' in argv:
+        core_minimums = parse_list(argv[argv.index('--core-min') + 1], int)
+    return default_rules(thresholds, ratios, core_minimums)
+
+
+def evaluate_rules(histogram: Counter, rules: Sequence[Rule]) -> List[Dict[str, object]]:
+    """Count products and variants each rule would unpublish."""
+    total_products = sum(histogram.values())
+    results = []
+    for rule in rules:
+        products = 0
+        variants = 0
+        in_stock_variants = 0
+        for key, count in histogram.items():
+            if rule.matches(key):
+                products += count
+                variants += key.total * count
+                in_stock_variants += key.in_stock * count
+        results.append({
+            'rule': rule.name,
+            'products': products,
+            'products_pct': round(products / total_products * 100, 1) if total_products else 0,
+            'variants': variants,
+            'in_stock_variants': in_stock_variants
+        })
+    return results
+
+
+def write_sweep_csv(results: List[Dict[str, object]], csv_path: Path) -> None:
+    """Write the rule comparison table as CSV."""
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['Rule', 'Products', 'Products %', 'Variants', 'In Stock Variants'])
+        writer.writeheader()
+        for result in results:
+            writer.writerow({
+                'Rule': result['rule'],
+                'Products': result['products'],
+                'Products %': result['products_pct'],
+                'Variants': result['variants'],
+                'In Stock Variants': result['in_stock_variants']
+            })
+
+
+def format_sweep_table(results: List[Dict[str, object]]) -> List[str]:
+    """Render the rule comparison as markdown table lines."""
+    lines = [
+        "| Rule | Products | % of Products | Variants | In-Stock Variants Hidden |",
+        "|------|----------|---------------|----------|--------------------------|"
+    ]
+    for result in results:
+        lines.append(
+            f"| {result['rule']} | {result['products']:,} | {result['products_pct']}% | "
+            f"{result['variants']:,} | {result['in_stock_variants']:,} |"
+        )
+    return lines
+
+
+def parse_list(value: str, convert: Callable[[str], object]) -> List:
+    """Parse a comma-separated CLI value such as '3,4,6'."""
+    return [convert(item.strip()) for item in value.split(',') if item.strip()]
@@ -2,38 +2,46 @@
 """
 Unpublish Products from Google & YouTube Sales Channel
 Uses Shopify Admin API to unpublish products identified in the analysis.
+
+Usage:
+    python3 unpublish_products.py [--dry-run] [--concurrency 8] [--graphql] [--analysis products_to_unpublish.json]
 """
 
 import json
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import requests
 
-# Path to analysis results
+from publication_mutations import PublicationBatcher
+from publication_snapshot import PublicationSnapshot
+from publish_executor import DEFAULT_CONCURRENCY, ThrottledSession, concurrency_from_argv, run_operations
+from shopify_bulk import admin_url
+from streaming_output import analysis_file, iter_ndjson_products
+
+# Path to analysis results (pass --analysis products_to_unpublish.ndjson after analyze_products.py --ndjson)
 ANALYSIS_JSON = Path(__file__).parent / "products_to_unpublish.json"
 
 # Shopify API configuration
 # Set these via environment variables or modify directly
 SHOPIFY_STORE = os.getenv('SHOPIFY_STORE', 'rudis.myshopify.com')
 SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN', '')
-SHOPIFY_API_VERSION = '2024-01'  # Update as needed
 
 # Google & YouTube sales channel publication ID
 # This needs to be determined via API or Shopify admin
 GOOGLE_YOUTUBE_PUBLICATION_ID = os.getenv('GOOGLE_YOUTUBE_PUBLICATION_ID', '')
 
 
-def get_publication_id(store: str, token: str) -> str:
+def get_publication_id(store: str, token: str, http: Any = requests) -> str:
     """Get Google & YouTube sales channel publication ID."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications.json"
+    url = f"{admin_url(store)}/publications.json"
     headers = {
         'X-Shopify-Access-Token': token,
         'Content-Type': 'application/json'
     }
     
-    response = requests.get(url, headers=headers)
+    response = http.get(url, headers=headers)
     response.raise_for_status()
     
     publications = response.json().get('publications', [])
@@ -47,40 +55,17 @@ def get_publication_id(store: str, token: str) -> str:
     raise ValueError("Google & YouTube publication not found. Please set GOOGLE_YOUTUBE_PUBLICATION_ID manually.")
 
 
-def unpublish_product(
-    store: str,
-    token: str,
-    product_id: str,
-    publication_id: str
-) -> bool:
-    """Unpublish a product from a specific sales channel publication."""
-    url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications.json"
-    headers = {
-        'X-Shopify-Access-Token': token,
-        'Content-Type': 'application/json'
-    }
-    
-    # First, get existing product publication to find its ID
-    get_url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications.json"
-    params = {'product_id': product_id}
-    
-    response = requests.get(get_url, headers=headers, params=params)
-    response.raise_for_status()
-    
-    product_publications = response.json().get('product_publications', [])
-    
-    if not product_publications:
-        print(f"  ⚠️  Product {product_id} not published to this channel")
-        return False
-    
-    # Delete the product publication
-    product_pub_id = product_publications[0]['id']
-    delete_url = f"https://{store}/admin/api/{SHOPIFY_API_VERSION}/publications/{publication_id}/product_publications/{product_pub_id}.json"
+def load_product_ids(analysis_path: Path) -> List[str]:
+    """Load product IDs to unpublish.
     
-    response = requests.delete(delete_url, headers=headers)
-    response.raise_for_status()
+    NDJSON is read one product per line, keeping only the IDs; JSON is loaded whole.
+    """
+    if analysis_path.suffix == '.ndjson':
+        return [str(product['product_id']) for product in iter_ndjson_products(analysis_path)]
     
-    return True
+    with open(analysis_path, 'r') as f:
+        analysis = json.load(f)
+    return [str(p['product_id']) for p in analysis.get('products_to_unpublish', [])]
 
 
 def unpublish_products_batch(
@@ -88,9 +73,22 @@ def unpublish_products_batch(
     token: str,
     publication_id: str,
     product_ids: List[str],
-    dry_run: bool = True
+    dry_run: bool = True,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    session: Optional[ThrottledSession] = None,
+    use_graphql: bool = False
 ) -> Dict[str, Any]:
-    """Unpublish multiple products from Google & YouTube sales channel."""
+    """Unpublish multiple products from Google & YouTube sales channel.
+    
+    The publication's membership is read once up front (see
+    publication_snapshot.py), so each product costs a single DELETE. Up to
+    `concurrency` DELETEs run at once, paced by the shop's API call limit
+    (see publish_executor.py).
+    
+    With use_graphql, products are unpublished in batches of aliased
+    publishableUnpublish mutations instead (see publication_mutations.py);
+    a failed mutation is reported against its own product ID.
+    """
     results = {
         'total': len(product_ids),
         'success': 0,
@@ -102,31 +100,36 @@ def unpublish_products_batch(
     if dry_run:
         print("🔍 DRY RUN MODE - No changes will be made")
         print(f"   Would unpublish {len(product_ids)} products\n")
-    
-    for i, product_id in enumerate(product_ids, 1):
-        print(f"[{i}/{len(product_ids)}] Processing product {product_id}...", end=' ')
-        
-        if dry_run:
-            print("✅ (dry run)")
+        for i, product_id in enumerate(product_ids, 1):
+            print(f"[{i}/{len(product_ids)}] Processing product {product_id}... ✅ (dry run)")
             results['success'] += 1
-            continue
-        
-        try:
-            success = unpublish_product(store, token, product_id, publication_id)
-            if success:
-                print("✅ Unpublished")
-                results['success'] += 1
-            else:
-                print("⚠️  Not published")
-                results['not_published'] += 1
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
+        return results
+    
+    session = session or ThrottledSession()
+    snapshot = PublicationSnapshot(store, token, publication_id, session).load()
+    print(f"Google & YouTube has {len(snapshot)} published products\n")
+    
+    def on_result(product_id: str, success: bool, error: Optional[BaseException]) -> None:
+        done = results['success'] + results['failed'] + results['not_published'] + 1
+        print(f"[{done}/{len(product_ids)}] Product {product_id}...", end=' ')
+        if error is not None:
+            print(f"❌ Error: {str(error)}")
             results['failed'] += 1
             results['errors'].append({
                 'product_id': product_id,
-                'error': str(e)
+                'error': str(error)
             })
+        elif success:
+            print("✅ Unpublished")
+            results['success'] += 1
+        else:
+            print("⚠️  Not published")
+            results['not_published'] += 1
     
+    if use_graphql:
+        PublicationBatcher(store, token, publication_id, snapshot=snapshot).run('unpublish', product_ids, on_result)
+    else:
+        run_operations(product_ids, snapshot.unpublish, on_result, concurrency, 'unpublish', session.bucket)
     return results
 
 
@@ -139,37 +142,33 @@ def main():
         sys.exit(1)
     
     # Load analysis results
-    if not ANALYSIS_JSON.exists():
-        print(f"ERROR: Analysis file not found: {ANALYSIS_JSON}")
+    analysis_path = analysis_file(sys.argv, ANALYSIS_JSON)
+    if not analysis_path.exists():
+        print(f"ERROR: Analysis file not found: {analysis_path}")
         print("Run analyze_products.py first to generate the analysis.")
         sys.exit(1)
     
-    with open(ANALYSIS_JSON, 'r') as f:
-        analysis = json.load(f)
-    
-    products = analysis.get('products_to_unpublish', [])
+    product_ids = load_product_ids(analysis_path)
     
-    if not products:
+    if not product_ids:
         print("No products to unpublish.")
         return
     
-    print(f"Found {len(products)} products to unpublish")
+    print(f"Found {len(product_ids)} products to unpublish ({analysis_path.name})")
     
-    # Get publication ID
+    # Get publication ID (REST calls share one rate-limit bucket, see publish_executor.py)
+    session = ThrottledSession()
     publication_id = GOOGLE_YOUTUBE_PUBLICATION_ID
     if not publication_id:
         print("Getting Google & YouTube publication ID...")
         try:
-            publication_id = get_publication_id(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN)
+            publication_id = get_publication_id(SHOPIFY_STORE, SHOPIFY_ACCESS_TOKEN, session)
             print(f"✅ Found publication ID: {publication_id}")
         except Exception as e:
             print(f"ERROR: Could not get publication ID: {e}")
             print("Please set GOOGLE_YOUTUBE_PUBLICATION_ID manually")
             sys.exit(1)
     
-    # Extract product IDs
-    product_ids = [p['product_id'] for p in products]
-    
     # Ask for confirmation
     print(f"\n⚠️  About to unpublish {len(product_ids)} products from Google & YouTube")
     print("   This action cannot be easily undone.")
@@ -190,7 +189,10 @@ def main():
         SHOPIFY_ACCESS_TOKEN,
         publication_id,
         product_ids,
-        dry_run=dry_run
+        dry_run=dry_run,
+        concurrency=concurrency_from_argv(sys.argv),
+        session=session,
+        use_graphql='--graphql' in sys.argv
     )
     
     # Print summary
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Columnar Variant Store
+Array-backed representation of a catalog's variants with per-product
+aggregations computed across the whole catalog at once.
+
+Variants are stored in parallel arrays (inventory qty, option name/value codes,
+SKU codes) ordered by product, with `offsets[i]:offsets[i + 1]` delimiting the
+variants of product i. Option names/values and SKUs are interned into string
+tables so each variant costs a few integers. When NumPy is installed the
+group-by reductions run vectorized; otherwise the same results are computed
+with plain Python loops over the arrays.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from product_catalog import CatalogRow, ProductGroup
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Code 0 is reserved for empty strings in every string table
+EMPTY_CODE = 0
+
+
+class StringTable:
+    """Interning table mapping strings to small integer codes."""
+
+    def __init__(self):
+        self.values: List[str] = ['']
+        self.codes: Dict[str, int] = {'': EMPTY_CODE}
+
+    def code(self, value: str) -> int:
+        """Return the code for a value, adding it to the table if new."""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class VariantStore:
+    """Parallel-array variant storage grouped by product."""
+
+    def __init__(self, use_numpy: Optional[bool] = None):
+        self.use_numpy = (np is not None) if use_numpy is None else (use_numpy and np is not None)
+
+        # Per-product columns
+        self.product_ids: List[str] = []
+        self.product_rows: List[CatalogRow] = []
+        self.offsets = array('q', [0])
+
+        # Per-variant columns
+        self.variant_ids: List[str] = []
+        self.inventory_qty = array('q')
+        self.option_name_codes = (array('i'), array('i'), array('i'))
+        self.option_value_codes = (array('i'), array('i'), array('i'))
+        self.sku_codes = array('i')
+
+        self.options = StringTable()
+        self.skus = StringTable()
+
+    @classmethod
+    def from_products(cls, products: Iterable[ProductGroup], use_numpy: Optional[bool] = None) -> 'VariantStore':
+        """Build a store from grouped products (see product_catalog.iter_products)."""
+        store = cls(use_numpy)
+        for product in products:
+            store.add_product(product)
+        return store
+
+    def add_product(self, product: ProductGroup) -> None:
+        """Append one product and its variants to the store."""
+        option_code = self.options.code
+        names = self.option_name_codes
+        values = self.option_value_codes
+
+        self.product_ids.append(product.product_id)
+        self.product_rows.append(product.row)
+
+        for row in product.variants:
+            self.variant_ids.append(row.variant_id)
+            self.inventory_qty.append(row.inventory_qty)
+            self.sku_codes.append(self.skus.code(row.variant_sku))
+            names[0].append(option_code(row.option1_name))
+            names[1].append(option_code(row.option2_name))
+            names[2].append(option_code(row.option3_name))
+            values[0].append(option_code(row.option1_value))
+            values[1].append(option_code(row.option2_value))
+            values[2].append(option_code(row.option3_value))
+
+        self.offsets.append(len(self.inventory_qty))
+
+    @property
+    def num_products(self) -> int:
+        return len(self.product_ids)
+
+    @property
+    def num_variants(self) -> int:
+        return len(self.inventory_qty)
+
+    def variant_counts(self) -> List[int]:
+        """Number of variants per product."""
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in range(self.num_products)]
+
+    def in_stock_counts(self) -> List[int]:
+        """Number of variants with inventory > 0, per product."""
+        if self.num_products == 0:
+            return []
+        if self.use_numpy:
+            qty = np.frombuffer(self.inventory_qty, dtype=np.int64)
+            starts = np.frombuffer(self.offsets, dtype=np.int64)[:-1]
+            return np.add.reduceat((qty > 0).astype(np.int64), starts).tolist()
+
+        qty = self.inventory_qty
+        offsets = self.offsets
+        counts = []
+        for i in range(self.num_products):
+            counts.append(sum(1 for q in qty[offsets[i]:offsets[i + 1]] if q > 0))
+        return counts
+
+    def out_of_stock_counts(self) -> List[int]:
+        """Number of variants with inventory <= 0, per product."""
+        return [total - in_stock for total, in_stock in zip(self.variant_counts(), self.in_stock_counts())]
+
+    def inventory_percentages(self) -> List[float]:
+        """Percentage of in-stock variants per product, rounded to one decimal."""
+        return [
+            round((in_stock / total) * 100, 1) if total > 0 else 0
+            for total, in_stock in zip(self.variant_counts(), self.in_stock_counts())
+        ]
+
+    def out_of_stock_breakdown(self, option: int) -> List[Dict[str, int]]:
+        """Per product, count out-of-stock variants by value of option 1, 2 or 3.
+
+        Keys keep the order in which each value first appears among the
+        product's out-of-stock variants; empty option values are skipped.
+        """
+        codes = self.option_value_codes[option - 1]
+        breakdowns: List[Dict[str, int]] = [{} for _ in range(self.num_products)]
+        if self.num_variants == 0:
+            return breakdowns
+
+        if self.use_numpy:
+            qty = np.frombuffer(self.inventory_qty, dtype=np.int64)
+            value_codes = np.frombuffer(codes, dtype=np.int32).astype(np.int64)
+            sizes = np.diff(np.frombuffer(self.offsets, dtype=np.int64))
+            product_index = np.repeat(np.arange(self.num_products, dtype=np.int64), sizes)
+
+            mask = (qty <= 0) & (value_codes != EMPTY_CODE)
+            keys = product_index[mask] * len(self.options) + value_codes[mask]
+            unique_keys, first_seen, counts = np.unique(keys, return_index=True, return_counts=True)
+            order = np.argsort(first_seen, kind='stable')
+
+            num_codes = len(self.options)
+            for key, count in zip(unique_keys[order].tolist(), counts[order].tolist()):
+                product, code = divmod(key, num_codes)
+                breakdowns[product][self.options[code]] = count
+            return breakdowns
+
+        qty = self.inventory_qty
+        offsets = self.offsets
+        for i in range(self.num_products):
+            breakdown = breakdowns[i]
+            for j in range(offsets[i], offsets[i + 1]):
+                code = codes[j]
+                if qty[j] <= 0 and code != EMPTY_CODE:
+                    value = self.options[code]
+                    breakdown[value] = breakdown.get(value, 0) + 1
+        return breakdowns
+
+    def option_values(self, index: int, option: int) -> List[str]:
+        """Sorted distinct non-empty values of option 1, 2 or 3 for one product."""
+        codes = self.option_value_codes[option - 1][self.offsets[index]:self.offsets[index + 1]]
+        return sorted(set(self.options[code] for code in codes if code != EMPTY_CODE))
+
+    def option_name(self, index: int, option: int) -> str:
+        """Option 1, 2 or 3 name taken from a product's first variant."""
+        return self.options[self.option_name_codes[option - 1][self.offsets[index]]]
+
+    def variants(self, index: int) -> List[Dict[str, object]]:
+        """Materialize one product's variants as dicts for JSON output."""
+        names = self.option_name_codes
+        values = self.option_value_codes
+        options = self.options
+        result = []
+        for j in range(self.offsets[index], self.offsets[index + 1]):
+            inventory_qty = self.inventory_qty[j]
+            result.append({
+                'variant_id': self.variant_ids[j],
+                'variant_sku': self.skus[self.sku_codes[j]],
+                'option1_name': options[names[0][j]],
+                'option1_value': options[values[0][j]],
+                'option2_name': options[names[1][j]],
+                'option2_value': options[values[1][j]],
+                'option3_name': options[names[2][j]],
+                'option3_value': options[values[2][j]],
+                'inventory_qty': inventory_qty,
+                'is_in_stock': inventory_qty > 0,
+                'is_out_of_stock': inventory_qty <= 0
+            })
+        return result